@@ -1,7 +1,21 @@
 import os
+import time
+import logging
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
-from celery.signals import setup_logging
+from celery.signals import (
+    before_task_publish,
+    setup_logging,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+
+logger = logging.getLogger(__name__)
 
 # Set default Django settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -16,10 +30,7 @@ app.autodiscover_tasks()
 
 # Configure Celery
 app.conf.update(
-    # Task settings
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    # Task settings (serializers come from CELERY_* settings)
     timezone=settings.TIME_ZONE,
     enable_utc=True,
     
@@ -33,6 +44,10 @@ app.conf.update(
         'default': {
             'exchange': 'default',
             'routing_key': 'default'
+        },
+        'media': {
+            'exchange': 'media',
+            'routing_key': 'media'
         }
     },
     
@@ -41,10 +56,6 @@ app.conf.update(
     worker_prefetch_multiplier=1,
     task_reject_on_worker_lost=True,
     
-    # Result backend settings
-    result_backend='django-db',
-    result_expires=3600,  # 1 hour
-    
     # Rate limiting
     task_annotations={
         'downloader.tasks.process_download': {
@@ -56,7 +67,41 @@ app.conf.update(
     task_routes={
         'downloader.tasks.process_download': {
             'queue': 'downloads'
+        },
+        'downloader.tasks.generate_previews': {
+            'queue': 'media'
+        },
+        'downloader.tasks.render_profile': {
+            'queue': 'media'
         }
+    },
+    
+    # Periodic maintenance, run by the celery-beat service (scripts/start-celery-beat.sh)
+    beat_schedule={
+        'enforce-download-retention': {
+            'task': 'downloader.tasks.enforce_download_retention',
+            'schedule': crontab(minute=15, hour=3),
+        },
+        'flush-download-counts': {
+            'task': 'downloader.tasks.flush_download_counts',
+            'schedule': settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL,
+        },
+        'reap-stuck-downloads': {
+            'task': 'downloader.tasks.reap_stuck_downloads',
+            'schedule': settings.DOWNLOAD_REAPER_INTERVAL,
+        },
+        'evict-media': {
+            'task': 'downloader.tasks.evict_media',
+            'schedule': settings.DOWNLOADER['CLEANUP_INTERVAL'],
+        },
+        'demote-idle-media': {
+            'task': 'downloader.tasks.demote_idle_media',
+            'schedule': settings.MEDIA_TIERING_INTERVAL,
+        },
+        'scrub-media': {
+            'task': 'downloader.tasks.scrub_media',
+            'schedule': settings.MEDIA_SCRUB_INTERVAL,
+        },
     }
 )
 
@@ -66,4 +111,130 @@ def config_loggers(*args, **kwargs):
     from logging.config import dictConfig
     from django.conf import settings
     
-    dictConfig(settings.LOGGING)
\ No newline at end of file
+    dictConfig(settings.LOGGING)
+
+@worker_process_init.connect
+def reset_db_pools(**kwargs):
+    """Drop DB connection pools inherited from the parent worker process"""
+    from core.pooled_postgresql.pool import reset_after_fork
+    
+    reset_after_fork()
+
+@task_postrun.connect
+def release_db_connections(**kwargs):
+    """Hand DB connections back to the pool once a task finishes"""
+    from django.db import close_old_connections
+    
+    close_old_connections()
+
+@worker_process_shutdown.connect
+def close_db_pools(**kwargs):
+    """Close pooled DB connections when a worker process exits"""
+    from core.pooled_postgresql.pool import close_pools
+    
+    close_pools()
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    """Record publish time so workers can measure queue wait"""
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+@before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    """Carry the publisher's trace into the task"""
+    from downloader.services.tracing import TRACEPARENT_HEADER, current_traceparent
+    
+    traceparent = current_traceparent()
+    if headers is not None and traceparent:
+        headers.setdefault(TRACEPARENT_HEADER, traceparent)
+
+@task_prerun.connect
+def start_task_span(task=None, task_id=None, **kwargs):
+    """Open the task's span, continuing the publisher's trace"""
+    from downloader.services.tracing import continue_trace
+    
+    span = continue_trace(
+        f'task {task.name}',
+        getattr(task.request, 'traceparent', None),
+        task_id=task_id,
+        retries=task.request.retries
+    )
+    task.request.trace_span = span.__enter__()
+
+@task_failure.connect
+def record_task_error(sender=None, exception=None, **kwargs):
+    """Mark the running task's span as failed"""
+    span = getattr(sender.request, 'trace_span', None) if sender else None
+    if span is not None and exception is not None:
+        span.record_error(exception)
+
+@task_postrun.connect
+def finish_task_span(task=None, state=None, **kwargs):
+    """Close the task's span; the trace is exported from here"""
+    span = getattr(task.request, 'trace_span', None)
+    if span is not None:
+        span.set_attribute('state', state)
+        task.request.trace_span = None
+        span.__exit__(None, None, None)
+
+@task_prerun.connect
+def observe_queue_wait(task=None, **kwargs):
+    """Queue wait of the task about to run, excluding scheduled (ETA) delays"""
+    from downloader.services.metrics import QUEUE_WAIT_SECONDS
+    
+    task.request.metrics_started = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at and not task.request.eta:
+        QUEUE_WAIT_SECONDS.labels(task.name).observe(max(time.time() - published_at, 0))
+
+@task_postrun.connect
+def observe_task_duration(task=None, state=None, **kwargs):
+    """Run time of the finished task by final state"""
+    from downloader.services.metrics import TASK_SECONDS
+    
+    started = getattr(task.request, 'metrics_started', None)
+    if started is not None:
+        TASK_SECONDS.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+@task_prerun.connect
+def start_task_profiler(task=None, **kwargs):
+    """Sample opted-in tasks: PROFILING_TASKS, sampled or sent with a profile header"""
+    from downloader.services.profiling import SamplingProfiler, should_profile
+    
+    if task.name not in settings.PROFILING_TASKS:
+        return
+    if should_profile(bool(getattr(task.request, 'profile', False))):
+        task.request.profiler = SamplingProfiler().start()
+
+@task_postrun.connect
+def write_task_profile(task=None, task_id=None, **kwargs):
+    """Stop the task's profiler and write its stacks"""
+    from downloader.services.profiling import write_profile
+    
+    profiler = getattr(task.request, 'profiler', None)
+    if profiler is None:
+        return
+    task.request.profiler = None
+    try:
+        write_profile(profiler.stop(), 'task', f'{task.name}-{task_id}')
+    except OSError:
+        logger.warning("Failed to write task profile", exc_info=True)
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    """Expose the metrics of all pool processes from the main worker process"""
+    if not settings.METRICS_WORKER_PORT:
+        return
+    from prometheus_client import start_http_server
+    from downloader.services.metrics import get_registry
+    
+    start_http_server(settings.METRICS_WORKER_PORT, registry=get_registry())
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(**kwargs):
+    """Let the multiprocess collector drop this process's live samples"""
+    from downloader.services.metrics import mark_process_dead
+    
+    mark_process_dead(os.getpid())
@@ -0,0 +1,12 @@
+"""
+Gunicorn server hooks, loaded with ``--config python:core.gunicorn``
+
+Command-line flags in scripts/start-web.sh still set the server options.
+"""
+
+
+def child_exit(server, worker):
+    """Drop the Prometheus samples of a worker that exited or was recycled"""
+    from downloader.services.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
@@ -0,0 +1,155 @@
+import time
+import random
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# Whether the current request may read from replicas at all
+_replica_reads = ContextVar('replica_reads', default=False)
+# Set once the current request or replica_reads() block has written to the primary
+_pinned = ContextVar('db_pinned', default=False)
+# Set inside use_primary(); outlasts the pin reset of nested scopes
+_forced_primary = ContextVar('db_forced_primary', default=False)
+
+# alias -> (checked_at, lag_seconds)
+_lag_cache = {}
+
+
+@contextmanager
+def use_primary():
+    """Force every query in the block to the primary database."""
+    token = _forced_primary.set(True)
+    try:
+        yield
+    finally:
+        _forced_primary.reset(token)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """
+    Allow (or forbid) replica reads in the block, e.g. in a task
+
+    Like a request, the block starts unpinned and a write inside it pins
+    only the rest of the block, so a worker thread that wrote earlier does
+    not stay on the primary for good.
+    """
+    reads_token = _replica_reads.set(enabled)
+    pinned_token = _pinned.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(reads_token)
+        _pinned.reset(pinned_token)
+
+
+class ReplicaRouter:
+    """
+    Route safe reads to replicas and everything else to the primary
+
+    Reads go to a replica only when the request allows it (see
+    ``ReplicaPinningMiddleware``), nothing has been written in the same
+    request, no transaction is open on the primary and the replica's lag
+    is under ``REPLICA_MAX_LAG_SECONDS``. Code outside requests (Celery
+    tasks, management commands) always uses the primary unless it opts in
+    with :func:`replica_reads`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned.get() or _forced_primary.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in settings.REPLICA_ROUTED_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if self._is_fresh(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes: everything after a write in this context is primary
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias may relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+    def _is_fresh(self, alias: str) -> bool:
+        """Check replica lag, cached for REPLICA_LAG_CHECK_INTERVAL seconds."""
+        max_lag = settings.REPLICA_MAX_LAG_SECONDS
+        if not max_lag:
+            return True
+
+        now = time.monotonic()
+        checked_at, lag = _lag_cache.get(alias, (0.0, None))
+        if now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+            lag = self._measure_lag(alias)
+            _lag_cache[alias] = (now, lag)
+
+        return lag is not None and lag <= max_lag
+
+    def _measure_lag(self, alias: str):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )
+                row = cursor.fetchone()
+        except DatabaseError:
+            logger.warning(f"Replica {alias} unreachable, reading from primary", exc_info=True)
+            return None
+
+        return float(row[0] or 0.0)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Enable replica reads for safe requests and pin clients after writes
+
+    A request that writes sets a short-lived cookie; the same client's next
+    requests read from the primary until it expires, covering replica lag.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE
+        allow = request.method in self.SAFE_METHODS and cookie not in request.COOKIES
+
+        reads_token = _replica_reads.set(allow)
+        pinned_token = _pinned.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _pinned.get()
+        finally:
+            _replica_reads.reset(reads_token)
+            _pinned.reset(pinned_token)
+
+        if wrote:
+            response.set_cookie(
+                cookie,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
@@ -0,0 +1,39 @@
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgresDatabaseWrapper,
+    IsolationLevel,
+)
+from .pool import get_pool
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """
+    PostgreSQL backend that checks connections out of a per-process pool
+
+    Configure with ``ENGINE: 'core.pooled_postgresql'`` and an optional
+    ``POOL`` dict (MAX_SIZE, TIMEOUT, HEALTH_CHECK_AFTER, MAX_LIFETIME).
+    Keep ``CONN_MAX_AGE`` at 0 so Django hands the connection back to the
+    pool at the end of every request or task instead of holding it.
+    """
+
+    def get_new_connection(self, conn_params):
+        # Normally set while opening a connection; reused ones skip that path
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', IsolationLevel.READ_COMMITTED
+        )
+        return self._get_pool().getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._get_pool().putconn(self.connection)
+
+    def _get_pool(self):
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(
+            self.alias,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10.0),
+            health_check_after=options.get('HEALTH_CHECK_AFTER', 30.0),
+            max_lifetime=options.get('MAX_LIFETIME', 3600.0)
+        )
@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# (pid, alias) -> ConnectionPool; keyed by pid so forked children never
+# reuse sockets inherited from the parent
+_pools: Dict[tuple, 'ConnectionPool'] = {}
+_pools_lock = threading.Lock()
+# Pools inherited across fork are kept referenced but never used or closed:
+# closing them would terminate the parent's server sessions
+_inherited = []
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool timeout"""
+    pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections
+
+    Callers block for up to ``timeout`` seconds when all ``max_size``
+    connections are checked out. Idle connections are health-checked with
+    ``SELECT 1`` before reuse once they have been idle for
+    ``health_check_after`` seconds, and recycled after ``max_lifetime``.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        health_check_after: float = 30.0,
+        max_lifetime: float = 3600.0
+    ):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()  # (connection, created_at, returned_at)
+        self._in_use = {}  # id(connection) -> created_at
+
+        self._stats = {
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'checkouts': 0,
+            'saturated_checkouts': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def getconn(self, connect: Callable):
+        """
+        Check out a healthy connection, waiting if the pool is full
+
+        Args:
+            connect: Opens a new connection when no idle one is available
+        """
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self._bump('saturated_checkouts')
+            if not self._slots.acquire(timeout=self.timeout):
+                self._bump('timeouts')
+                raise PoolTimeout(
+                    f"No database connection available within {self.timeout}s "
+                    f"(pool size {self.max_size})"
+                )
+        waited = time.monotonic() - start
+
+        try:
+            connection, created_at = self._checkout_idle()
+            if connection is None:
+                connection = connect()
+                created_at = time.monotonic()
+                self._bump('connections_created')
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use[id(connection)] = created_at
+            self._stats['checkouts'] += 1
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+        return connection
+
+    def putconn(self, connection) -> None:
+        """
+        Return a connection; broken or expired ones are closed instead
+
+        Connections this pool never handed out (e.g. one inherited across
+        fork) are left alone: closing them would end the owner's session
+        and releasing a slot for them would overflow the semaphore.
+        """
+        with self._lock:
+            created_at = self._in_use.pop(id(connection), None)
+        if created_at is None:
+            logger.debug("Ignoring connection not checked out from this pool")
+            return
+
+        try:
+            expired = time.monotonic() - created_at > self.max_lifetime
+            if connection.closed or expired or not self._reset(connection):
+                self._discard(connection)
+                return
+            with self._lock:
+                self._idle.append((connection, created_at, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> Dict:
+        """Snapshot of pool usage and wait metrics."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                max_size=self.max_size,
+                in_use=len(self._in_use),
+                idle=len(self._idle),
+                saturation=len(self._in_use) / self.max_size,
+            )
+        return stats
+
+    def _checkout_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None, None
+                connection, created_at, returned_at = self._idle.pop()
+
+            now = time.monotonic()
+            if connection.closed or now - created_at > self.max_lifetime:
+                self._discard(connection)
+                continue
+            if now - returned_at > self.health_check_after and not self._ping(connection):
+                self._discard(connection)
+                continue
+            return connection, created_at
+
+    def _ping(self, connection) -> bool:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            logger.info("Discarding pooled connection that failed its health check")
+            return False
+
+    def _reset(self, connection) -> bool:
+        """Roll back anything left open so the next user starts clean."""
+        try:
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection) -> None:
+        self._bump('connections_discarded')
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+def get_pool(alias: str, **options) -> ConnectionPool:
+    """Pool for ``alias`` in the current process, created on first use."""
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(**options)
+    return pool
+
+
+def reset_after_fork() -> None:
+    """Forget pools inherited from a parent process (call in the child)."""
+    pid = os.getpid()
+    with _pools_lock:
+        for key in [key for key in _pools if key[0] != pid]:
+            _inherited.append(_pools.pop(key))
+
+
+def close_pools() -> None:
+    """Close idle connections of this process's pools (on shutdown)."""
+    pid = os.getpid()
+    for (owner, _), pool in list(_pools.items()):
+        if owner == pid:
+            pool.close()
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Per-alias pool metrics for the current process."""
+    pid = os.getpid()
+    return {
+        alias: pool.stats()
+        for (owner, alias), pool in list(_pools.items())
+        if owner == pid
+    }
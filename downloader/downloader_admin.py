@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, DownloadedMedia
+from .models import UserProfile, DownloadedMedia, DownloadRollup
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -16,4 +16,21 @@ class DownloadedMediaAdmin(admin.ModelAdmin):
     list_filter = ('status', 'media_type', 'quality')
     search_fields = ('user__username', 'url')
     readonly_fields = ('created_at', 'updated_at')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+@admin.register(DownloadRollup)
+class DownloadRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        'bucket_start', 'granularity', 'status',
+        'media_type', 'size_bucket', 'count', 'total_bytes'
+    )
+    list_filter = ('granularity', 'status', 'media_type', 'size_bucket')
+    date_hierarchy = 'bucket_start'
+    ordering = ('-bucket_start',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,235 @@
+import os
+import math
+import time
+import hashlib
+import itertools
+import logging
+from typing import Tuple
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework import status
+from .services.metrics import HTTP_REQUEST_SECONDS
+from .services.profiling import SamplingProfiler, request_wants_profile, should_profile, write_profile
+from .services.tracing import TRACEPARENT_HEADER, continue_trace
+from .utils.error_handlers import ErrorResponse
+from .utils.request import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window log in a sorted set, evaluated atomically in one round-trip.
+# KEYS[1] = window key; ARGV = limit, window in ms, unique member suffix.
+# Returns {allowed (0/1), requests in window, ms until a slot frees up}.
+SLIDING_WINDOW_LUA = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, now .. '-' .. ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, count + 1, 0}
+end
+
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local retry_after = window
+if oldest[2] then
+    retry_after = tonumber(oldest[2]) + window - now
+end
+return {0, count, retry_after}
+"""
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse a DRF-style rate such as ``10/minute`` into (limit, seconds)."""
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period[0].lower()]
+
+
+class RateLimitMiddleware:
+    """
+    Sliding-window rate limiting backed by a single Redis Lua call
+
+    Clients are identified by API key (only keys listed in
+    ``RATE_LIMIT_API_KEYS``), then authenticated user, then IP. Budgets are
+    looked up by URL name in ``RATE_LIMITS`` and fall back to the
+    ``default`` entry. Rejections are the ``RATE_LIMIT_EXCEEDED`` error
+    response with an exact ``retry_after``, built here rather than through
+    the exception handler so a flood is not logged as errors. When Redis
+    is unavailable requests are let through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._script = None
+        self._members = itertools.count()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit and 'X-RateLimit-Limit' not in response:
+            response['X-RateLimit-Limit'] = str(rate_limit[0])
+            response['X-RateLimit-Remaining'] = str(rate_limit[1])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        if any(request.path.startswith(path) for path in settings.RATE_LIMIT_EXEMPT_PATHS):
+            return None
+
+        endpoint = request.resolver_match.url_name or 'default'
+        rate = settings.RATE_LIMITS.get(endpoint)
+        if rate is None:
+            endpoint, rate = 'default', settings.RATE_LIMITS['default']
+        limit, window = parse_rate(rate)
+
+        key = f'ratelimit:{endpoint}:{self.get_identity(request)}'
+        try:
+            allowed, count, retry_after_ms = self._check(key, limit, window)
+        except RedisError:
+            logger.warning("Rate limiter unavailable, allowing request", exc_info=True)
+            return None
+
+        request.rate_limit = (limit, max(limit - count, 0))
+        if allowed:
+            return None
+
+        retry_after = max(1, math.ceil(retry_after_ms / 1000))
+        logger.info(
+            "Rate limit exceeded",
+            extra={'endpoint': endpoint, 'retry_after': retry_after}
+        )
+        response = ErrorResponse.create(
+            'RATE_LIMIT_EXCEEDED',
+            f"Rate limit of {rate} exceeded",
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            details={'retry_after': retry_after},
+            request_id=request.META.get('X-Request-ID')
+        )
+        response['Retry-After'] = str(retry_after)
+        response['X-RateLimit-Limit'] = str(limit)
+        response['X-RateLimit-Remaining'] = '0'
+        return response
+
+    def get_identity(self, request) -> str:
+        """Stable identifier of the client the budget is charged to."""
+        api_key = request.headers.get(settings.RATE_LIMIT_API_KEY_HEADER)
+        if api_key:
+            # Unknown keys would otherwise each get a fresh budget
+            digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+            if digest in settings.RATE_LIMIT_API_KEYS:
+                return 'key:' + digest[:32]
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+
+        return f'ip:{get_client_ip(request)}'
+
+    def _check(self, key: str, limit: int, window: int) -> Tuple[int, int, int]:
+        if self._script is None:
+            from django_redis import get_redis_connection
+            self._script = get_redis_connection('default').register_script(SLIDING_WINDOW_LUA)
+
+        # Unique member so concurrent requests in the same millisecond all count
+        member = f'{os.getpid()}-{next(self._members)}'
+        allowed, count, retry_after = self._script(
+            keys=[key],
+            args=[limit, window * 1000, member]
+        )
+        return int(allowed), int(count), int(retry_after)
+
+
+class MetricsMiddleware:
+    """
+    Request latency histogram labelled by URL name, method and status class
+
+    Placed first in MIDDLEWARE so the time includes every other middleware.
+    Labels stay low-cardinality: URL names rather than paths, ``2xx`` rather
+    than exact codes, and ``other`` for any non-standard method.
+    """
+
+    METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        HTTP_REQUEST_SECONDS.labels(
+            (match.url_name if match else None) or 'unmatched',
+            request.method if request.method in self.METHODS else 'other',
+            f'{response.status_code // 100}xx'
+        ).observe(time.perf_counter() - started)
+        return response
+
+
+class TracingMiddleware:
+    """
+    Root span per request, joining the caller's trace when it sends one
+
+    Tasks published while handling the request inherit the trace through
+    their headers. The caller's sampled flag is ignored unless
+    TRACING_TRUST_INCOMING_SAMPLED is set. The trace id is returned in
+    ``X-Trace-Id``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Named after the URL pattern once resolved, so names stay bounded
+        with continue_trace(
+            f'{request.method} unmatched',
+            request.headers.get(TRACEPARENT_HEADER),
+            trust_sampled=settings.TRACING_TRUST_INCOMING_SAMPLED,
+            method=request.method,
+            path=request.path
+        ) as span:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            if match and match.url_name:
+                span.name = f'{request.method} {match.url_name}'
+            span.set_attribute('status_code', response.status_code)
+            if span.trace_id:
+                response['X-Trace-Id'] = span.trace_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of opted-in requests into PROFILING_DIR
+
+    Requests are profiled when they send ``X-Profile`` with the configured
+    PROFILING_TOKEN, or at PROFILING_SAMPLE_RATE. Everything else pays one
+    settings lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request_wants_profile(request)):
+            return self.get_response(request)
+
+        with SamplingProfiler() as profiler:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        try:
+            path = write_profile(
+                profiler, 'request', f'{request.method}-{(match and match.url_name) or "unmatched"}'
+            )
+        except OSError:
+            logger.warning("Failed to write request profile", exc_info=True)
+            path = None
+        if path:
+            response['X-Profile-File'] = os.path.basename(path)
+        return response
@@ -1,10 +1,32 @@
 import os
 import uuid
+from datetime import timedelta
 from django.db import models
+from django.utils import timezone
 from django.core.validators import URLValidator, FileExtensionValidator
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
+class DownloadQuerySet(models.QuerySet):
+    """QuerySet helpers that keep queries inside the hot partitions."""
+
+    def recent(self, days=None):
+        """Restrict to rows created inside the hot window.
+
+        Filtering on ``created_at`` lets Postgres prune older monthly
+        partitions instead of probing every one of them.
+        """
+        if days is None:
+            days = settings.DOWNLOAD_HOT_WINDOW_DAYS
+        return self.filter(created_at__gte=timezone.now() - timedelta(days=days))
+
+    def expired(self, days=None):
+        """Rows older than the configured retention period."""
+        if days is None:
+            days = settings.DOWNLOAD_RETENTION_DAYS
+        return self.filter(created_at__lt=timezone.now() - timedelta(days=days))
+
+
 class Download(models.Model):
     """Model for tracking download requests and their status."""
     
@@ -21,6 +43,10 @@ class Download(models.Model):
         GALLERY = 'GALLERY', _('Gallery')
         UNKNOWN = 'UNKNOWN', _('Unknown')
 
+    class StorageTier(models.TextChoices):
+        HOT = 'HOT', _('Hot')
+        COLD = 'COLD', _('Cold')
+
     id = models.UUIDField(
         primary_key=True,
         default=uuid.uuid4,
@@ -100,12 +126,86 @@ class Download(models.Model):
         help_text=_('IP address of the requester')
     )
 
+    reaped_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text=_('Number of times the download was recovered after getting stuck')
+    )
+
+    files = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_('Every stored file of the post: path, size, crc32 and mime_type')
+    )
+
+    content_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_('SHA-256 of the stored file, computed while it streamed in')
+    )
+
+    verified_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_('Timestamp when the stored files last matched their digests')
+    )
+
+    corrupted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_('Timestamp when a stored file failed its integrity check')
+    )
+
+    thumbnail_url = models.URLField(
+        max_length=2048,
+        blank=True,
+        help_text=_('Thumbnail reported by the extractor, used for video previews')
+    )
+
+    preview_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_('SHA-256 of the preview source; previews are stored under it')
+    )
+
+    storage_tier = models.CharField(
+        max_length=4,
+        choices=StorageTier.choices,
+        default=StorageTier.HOT,
+        help_text=_('Storage tier the file currently lives in')
+    )
+
+    evicted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_('Timestamp when the file was evicted to free disk space')
+    )
+
+    objects = DownloadQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['url']),
             models.Index(fields=['media_type']),
+            models.Index(fields=['ip_address', '-created_at', '-id']),
+            # Small partial index over in-flight rows for the stuck-download reaper
+            models.Index(
+                fields=['status', 'updated_at'],
+                include=['id'],
+                condition=models.Q(status__in=['PENDING', 'DOWNLOADING', 'PROCESSING']),
+                name='download_inflight_idx'
+            ),
+            # Least recently verified files first, for the integrity scrubber
+            models.Index(
+                fields=['verified_at'],
+                condition=models.Q(
+                    status='COMPLETED',
+                    evicted_at__isnull=True,
+                    corrupted_at__isnull=True
+                ),
+                name='download_scrub_idx'
+            ),
         ]
         verbose_name = _('Download')
         verbose_name_plural = _('Downloads')
@@ -125,16 +225,49 @@ class Download(models.Model):
             return os.path.splitext(self.file_path)[1].lower()
         return None
 
+    def stored_names(self):
+        """Storage names of all files of this download, in post order."""
+        names = [entry['path'] for entry in self.files or []]
+        if self.file_path and self.file_path not in names:
+            names.append(self.file_path)
+        return names
+
+    @property
+    def total_size(self):
+        """Bytes stored for all files of this download."""
+        if self.files:
+            return sum(entry['size'] for entry in self.files)
+        return self.file_size or 0
+
+    def get_storage(self):
+        """Storage backend of the tier the file currently lives in."""
+        from .services.storage import get_cold_storage, get_storage
+        if self.storage_tier == self.StorageTier.COLD:
+            return get_cold_storage()
+        return get_storage()
+
     def get_download_path(self):
-        """Get the full path to the downloaded file."""
+        """Get the full path to the downloaded file (None if not on local disk)."""
         if self.file_path:
-            return os.path.join(settings.MEDIA_ROOT, self.file_path)
+            return self.get_storage().path(self.file_path)
+        return None
+
+    def get_download_url(self, expires=None):
+        """URL the file is served from (presigned for object storage)."""
+        if self.file_path:
+            return self.get_storage().url(self.file_path, expires=expires)
         return None
 
     def increment_download_count(self):
-        """Increment the download counter."""
-        self.download_count = models.F('download_count') + 1
-        self.save(update_fields=['download_count'])
+        """Increment the download counter (buffered, see services.counters)."""
+        from .services.counters import increment_download_count
+        increment_download_count(self.pk)
+
+    @property
+    def live_download_count(self):
+        """Stored download count plus increments not yet flushed."""
+        from .services.counters import pending_download_counts
+        return self.download_count + pending_download_counts([self.pk]).get(str(self.pk), 0)
 
     def clean(self):
         """Validate the model."""
@@ -157,6 +290,16 @@ class Download(models.Model):
         """Check if download is completed."""
         return self.status == self.Status.COMPLETED
 
+    @property
+    def is_evicted(self):
+        """Check if the file was evicted from media storage."""
+        return self.evicted_at is not None
+
+    @property
+    def is_corrupt(self):
+        """Check if a stored file failed its integrity check."""
+        return self.corrupted_at is not None
+
     @property
     def is_failed(self):
         """Check if download failed."""
@@ -175,4 +318,73 @@ class Download(models.Model):
         """Calculate download duration in seconds."""
         if self.completed_at and self.created_at:
             return (self.completed_at - self.created_at).total_seconds()
-        return None
\ No newline at end of file
+        return None
+
+class DownloadRollup(models.Model):
+    """Pre-aggregated download outcomes per time bucket."""
+
+    class Granularity(models.TextChoices):
+        HOUR = 'HOUR', _('Hour')
+        DAY = 'DAY', _('Day')
+
+    class SizeBucket(models.TextChoices):
+        UNKNOWN = 'UNKNOWN', _('Unknown')
+        SMALL = 'LT_1MB', _('Under 1 MB')
+        MEDIUM = 'LT_10MB', _('1 MB to 10 MB')
+        LARGE = 'LT_50MB', _('10 MB to 50 MB')
+        HUGE = 'GTE_50MB', _('50 MB and above')
+
+    granularity = models.CharField(
+        max_length=10,
+        choices=Granularity.choices,
+        help_text=_('Width of the time bucket')
+    )
+
+    bucket_start = models.DateTimeField(
+        help_text=_('Start of the time bucket (UTC)')
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=Download.Status.choices,
+        help_text=_('Final status of the counted downloads')
+    )
+
+    media_type = models.CharField(
+        max_length=20,
+        choices=Download.MediaType.choices,
+        help_text=_('Media type of the counted downloads')
+    )
+
+    size_bucket = models.CharField(
+        max_length=10,
+        choices=SizeBucket.choices,
+        help_text=_('File size range of the counted downloads')
+    )
+
+    count = models.PositiveBigIntegerField(
+        default=0,
+        help_text=_('Number of downloads in this bucket')
+    )
+
+    total_bytes = models.BigIntegerField(
+        default=0,
+        help_text=_('Sum of file sizes in this bucket')
+    )
+
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'status', 'media_type', 'size_bucket'],
+                name='unique_download_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', '-bucket_start']),
+        ]
+        verbose_name = _('Download rollup')
+        verbose_name_plural = _('Download rollups')
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.status}: {self.count}"
@@ -1,7 +1,74 @@
+import os
+from datetime import timezone as dt_timezone
+from typing import Any, Dict, Optional
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Download
 from .services.validator import validate_instagram_url
 
+# Columns needed to render a download without a model instance
+DOWNLOAD_ROW_FIELDS = (
+    'id', 'url', 'status', 'file_path', 'error_message',
+    'created_at', 'updated_at', 'completed_at', 'file_size'
+)
+
+def format_file_size(size: Optional[int]) -> Optional[str]:
+    """Convert a size in bytes to a human-readable string"""
+    if not size:
+        return None
+    
+    value = float(size)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if value < 1024.0:
+            return f"{value:.1f} {unit}"
+        value /= 1024.0
+    return f"{value:.1f} TB"
+
+def _aware(value):
+    """Naive datetimes (assigned in-process, not yet reloaded) are taken as UTC"""
+    if value is not None and timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+def _format_datetime(value) -> Optional[str]:
+    """Render a datetime the way DRF's DateTimeField does"""
+    if value is None:
+        return None
+    value = timezone.localtime(_aware(value)).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+def download_row(download: Download) -> Dict[str, Any]:
+    """Column dict of a model instance, as returned by ``.values()``"""
+    return {field: getattr(download, field) for field in DOWNLOAD_ROW_FIELDS}
+
+def serialize_download_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render a ``.values(*DOWNLOAD_ROW_FIELDS)`` row like DownloadSerializer
+
+    Read-only fast path for list and status responses: no model instance,
+    no field machinery, no side effects on ``row``.
+    """
+    created_at = _aware(row['created_at'])
+    completed_at = _aware(row['completed_at'])
+    file_path = row['file_path']
+    return {
+        'id': str(row['id']),
+        'url': row['url'],
+        'status': row['status'],
+        'file_name': os.path.basename(file_path) if file_path else None,
+        'error_message': row['error_message'],
+        'created_at': _format_datetime(created_at),
+        'updated_at': _format_datetime(row['updated_at']),
+        'duration': (
+            (completed_at - created_at).total_seconds()
+            if completed_at and created_at else None
+        ),
+        'file_size': row['file_size'],
+        'file_size_formatted': format_file_size(row['file_size']),
+    }
+
 class DownloadSerializer(serializers.ModelSerializer):
     file_name = serializers.CharField(source='get_file_name', read_only=True)
     duration = serializers.FloatField(read_only=True)
@@ -22,14 +89,7 @@ class DownloadSerializer(serializers.ModelSerializer):
 
     def get_file_size_formatted(self, obj):
         """Convert file size to human-readable format"""
-        if not obj.file_size:
-            return None
-        
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if obj.file_size < 1024.0:
-                return f"{obj.file_size:.1f} {unit}"
-            obj.file_size /= 1024.0
-        return f"{obj.file_size:.1f} TB"
+        return format_file_size(obj.file_size)
 
     def validate_url(self, value):
         """Validate Instagram URL"""
@@ -0,0 +1,49 @@
+import logging
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Download
+from .services.status_cache import cache_status, invalidate_status
+from .services.tracing import trace_query
+
+logger = logging.getLogger(__name__)
+
+@receiver(post_save, sender=Download)
+def refresh_cached_status(sender, instance, **kwargs):
+    """Overwrite the cached status payload once the change is committed"""
+    def _refresh():
+        try:
+            # Partially loaded rows would need extra queries to serialize
+            if instance.get_deferred_fields():
+                invalidate_status(instance.pk)
+            else:
+                cache_status(instance)
+        except Exception:
+            logger.warning(
+                "Failed to refresh cached download status",
+                exc_info=True,
+                extra={'download_id': str(instance.pk)}
+            )
+            try:
+                # A stale entry would keep its ETag for the whole TTL
+                invalidate_status(instance.pk)
+            except Exception:
+                logger.warning(
+                    "Failed to invalidate cached download status",
+                    exc_info=True,
+                    extra={'download_id': str(instance.pk)}
+                )
+
+    transaction.on_commit(_refresh)
+
+@receiver(post_delete, sender=Download)
+def drop_cached_status(sender, instance, **kwargs):
+    """Remove the cached status payload of a deleted download"""
+    transaction.on_commit(lambda: invalidate_status(instance.pk))
+
+@receiver(connection_created)
+def trace_queries(sender, connection, **kwargs):
+    """Give every SQL statement run inside a traced block its own span"""
+    if trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_query)
@@ -1,16 +1,37 @@
 import os
+import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from celery import shared_task
 from celery.signals import task_failure, task_success
 from django.conf import settings
-from datetime import datetime
+from django.utils import timezone
 import aiohttp
 import asyncio
 from .models import Download
 from .services.extractor import MediaExtractor
+from .services.analytics import record_outcome
+from .services.eviction import track_media
+from .services.integrity import remember_verified
+from .services.metrics import (
+    BYTES_TRANSFERRED,
+    CDN_CONNECT,
+    DB_UPDATE,
+    DOWNLOADS,
+    POSTPROCESS,
+    STORAGE_WRITE,
+    TRANSFER,
+    error_class,
+    observe_stage,
+    stage,
+)
+from .services.postprocess import faststart_mp4
+from .services.storage import get_storage
+from .services.tracing import annotate, start_span
 from .exceptions import DownloadError, MediaNotFoundError
-from .utils.file_handlers import sanitize_filename, ensure_unique_filename
+from .utils.file_handlers import sanitize_filename
+from .utils.sniff import SNIFF_BYTES, sniff_supported
+from .utils.digest import StreamDigest, digest_file
 from .utils.validators import validate_mime_type
 
 logger = logging.getLogger(__name__)
@@ -20,7 +41,8 @@ logger = logging.getLogger(__name__)
     max_retries=3,
     default_retry_delay=60,
     rate_limit='10/m',
-    queue='downloads'
+    queue='downloads',
+    ignore_result=True
 )
 def process_download(
     self,
@@ -37,14 +59,18 @@ def process_download(
         options: Additional download options
     
     Returns:
-        Dict containing download results
+        Dict summarising the outcome; details live on the Download row
     """
     logger.info(f"Starting download task for {url}", extra={'download_id': download_id})
+    download = None
     
     try:
         # Get or create download instance
         download = Download.objects.get(id=download_id)
         download.status = 'DOWNLOADING'
+        download.files = []
+        download.verified_at = None
+        download.corrupted_at = None
         download.save()
 
         # Initialize media extractor
@@ -52,31 +78,40 @@ def process_download(
         
         # Extract media information
         loop = asyncio.get_event_loop()
-        media_info = loop.run_until_complete(extractor.extract_media_info(url))
+        with start_span('extract', url=url):
+            media_info = loop.run_until_complete(extractor.extract_media_info(url))
         
         if not media_info:
             raise MediaNotFoundError(f"No media found at {url}")
         
+        if media_info.get('thumbnail'):
+            download.thumbnail_url = media_info['thumbnail']
+        
         # Process each media URL
-        results = []
-        for media_url in media_info['urls']:
-            result = download_media(
-                media_url,
-                download,
-                mime_type=media_info.get('type'),
-                options=options
-            )
-            results.append(result)
+        for index, media_url in enumerate(media_info['urls']):
+            with start_span('media.fetch', url=media_url, index=index):
+                download_media(
+                    media_url,
+                    download,
+                    mime_type=media_info.get('type'),
+                    options=options
+                )
         
         # Update download status
         download.status = 'COMPLETED'
-        download.completed_at = datetime.utcnow()
-        download.save()
+        download.completed_at = timezone.now()
+        with stage(DB_UPDATE):
+            download.save()
+        DOWNLOADS.labels('completed', '').inc()
+        _record_outcome(download)
+        _track_media(download)
+        _remember_verified(download)
+        _queue_previews(download)
         
         return {
             'status': 'success',
             'download_id': str(download.id),
-            'results': results
+            'files': len(media_info['urls'])
         }
         
     except Exception as exc:
@@ -92,11 +127,89 @@ def process_download(
             download.save()
         
         # Retry for specific exceptions
-        if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError)):
+        if (isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+                and self.request.retries < self.max_retries):
+            DOWNLOADS.labels('retried', error_class(exc)).inc()
             raise self.retry(exc=exc)
+        
+        DOWNLOADS.labels('failed', error_class(exc)).inc()
+        if download:
+            _record_outcome(download)
             
         raise DownloadError(f"Download failed: {str(exc)}", url=url)
 
+def enqueue_download(
+    download: Download,
+    options: Optional[Dict[str, Any]] = None,
+    store_result: bool = False
+):
+    """
+    Queue a download for processing
+    
+    Args:
+        download: Download instance to process
+        options: Additional download options
+        store_result: Keep the task result in the result backend; only
+            needed by callers that poll the AsyncResult
+    
+    Returns:
+        AsyncResult of the queued task
+    """
+    return process_download.apply_async(
+        args=[str(download.id), download.url],
+        kwargs={'options': options} if options else None,
+        ignore_result=not store_result
+    )
+
+def _track_media(download: Download) -> None:
+    """Add the file to the eviction index without failing the download"""
+    if not download.file_path:
+        return
+    try:
+        track_media(download.id, download.total_size)
+    except Exception:
+        logger.warning(
+            "Failed to index downloaded media for eviction",
+            exc_info=True,
+            extra={'download_id': str(download.id)}
+        )
+
+def _remember_verified(download: Download) -> None:
+    """Files were hashed as they streamed in; later serves only stat them"""
+    if not download.content_digest:
+        return
+    try:
+        remember_verified(download)
+        Download.objects.filter(pk=download.pk).update(verified_at=download.completed_at)
+    except Exception:
+        logger.warning(
+            "Failed to record verified media",
+            exc_info=True,
+            extra={'download_id': str(download.id)}
+        )
+
+def _queue_previews(download: Download) -> None:
+    """Queue eager previews without failing the download if publishing fails"""
+    try:
+        generate_previews.delay(str(download.id))
+    except Exception:
+        logger.warning(
+            "Failed to queue preview generation",
+            exc_info=True,
+            extra={'download_id': str(download.id)}
+        )
+
+def _record_outcome(download: Download) -> None:
+    """Update analytics rollups without failing the download on errors"""
+    try:
+        record_outcome(download)
+    except Exception:
+        logger.warning(
+            "Failed to update download rollups",
+            exc_info=True,
+            extra={'download_id': str(download.id)}
+        )
+
 def download_media(
     url: str,
     download: Download,
@@ -122,7 +235,11 @@ def download_media(
         )
         
         async with aiohttp.ClientSession(timeout=timeout) as session:
+            connect_started = time.perf_counter()
             async with session.get(url) as response:
+                connect_seconds = time.perf_counter() - connect_started
+                observe_stage(CDN_CONNECT, connect_seconds)
+                annotate(http_status=response.status, connect_seconds=connect_seconds)
                 if response.status != 200:
                     raise DownloadError(
                         f"Failed to download media: HTTP {response.status}"
@@ -135,31 +252,94 @@ def download_media(
                         f"Unsupported media type: {content_type}"
                     )
                 
+                # Refuse declared oversize bodies before reading any of them
+                if (response.content_length or 0) > settings.MAX_FILE_SIZE:
+                    raise DownloadError(
+                        f"File too large: {response.content_length} bytes declared"
+                    )
+                
+                # Judge the type from the first bytes, not the header, so a
+                # mislabelled body costs one read instead of a full transfer
+                head = b''
+                while len(head) < SNIFF_BYTES and not response.content.at_eof():
+                    data = await response.content.read(SNIFF_BYTES - len(head))
+                    if not data:
+                        break
+                    head += data
+                sniffed_type = sniff_supported(head, settings.SUPPORTED_MIME_TYPES)
+                if sniffed_type is None:
+                    raise DownloadError(
+                        f"Content does not match a supported media type: {content_type}"
+                    )
+                content_type = sniffed_type
+                
                 # Generate safe filename
                 filename = sanitize_filename(
                     os.path.basename(url.split('?')[0])
                 )
-                filename = ensure_unique_filename(
-                    os.path.join(settings.MEDIA_ROOT, 'downloads'),
-                    filename
-                )
+                storage = get_storage()
+                name = storage.generate_name(filename)
                 
-                # Download file in chunks
-                file_size = 0
-                file_path = os.path.join(settings.MEDIA_ROOT, 'downloads', filename)
+                # Stream chunks into the storage backend; an interrupted
+                # transfer leaves only a partial the reaper can clean up
+                writer = storage.open_writer(
+                    name,
+                    download_id=download.id,
+                    content_type=content_type
+                )
                 
-                with open(file_path, 'wb') as f:
+                digest = StreamDigest()
+                transfer_started = time.perf_counter()
+                write_seconds = 0.0
+                try:
+                    await writer.write(head)
+                    digest.update(head)
                     async for chunk in response.content.iter_chunked(
                         settings.DOWNLOAD_CHUNK_SIZE
                     ):
-                        if file_size + len(chunk) > settings.MAX_FILE_SIZE:
+                        # Still enforced for chunked or understated bodies
+                        if digest.size + len(chunk) > settings.MAX_FILE_SIZE:
                             raise DownloadError("File too large")
-                        f.write(chunk)
-                        file_size += len(chunk)
+                        write_started = time.perf_counter()
+                        await writer.write(chunk)
+                        write_seconds += time.perf_counter() - write_started
+                        digest.update(chunk)
+                    
+                    # A connection closed early can look like a clean end
+                    # of a body; never commit fewer bytes than were declared
+                    expected = response.content_length
+                    if (
+                        expected is not None
+                        and 'content-encoding' not in response.headers
+                        and digest.size != expected
+                    ):
+                        raise DownloadError(
+                            f"Truncated transfer: {digest.size} of {expected} bytes"
+                        )
+                    write_started = time.perf_counter()
+                    await writer.commit()
+                    write_seconds += time.perf_counter() - write_started
+                except BaseException:
+                    await writer.abort()
+                    raise
+                
+                # Network time and storage time are reported apart
+                transfer_seconds = time.perf_counter() - transfer_started - write_seconds
+                observe_stage(STORAGE_WRITE, write_seconds)
+                observe_stage(TRANSFER, transfer_seconds)
+                BYTES_TRANSFERRED.inc(digest.size)
+                annotate(
+                    bytes=digest.size,
+                    mime_type=content_type,
+                    transfer_seconds=transfer_seconds,
+                    write_seconds=write_seconds
+                )
                 
                 return {
-                    'file_path': file_path,
-                    'file_size': file_size,
+                    'file_path': name,
+                    'file_size': digest.size,
+                    'crc32': digest.crc32,
+                    'sha256': digest.sha256,
                     'mime_type': content_type
                 }
     
@@ -167,11 +347,31 @@ def download_media(
         loop = asyncio.get_event_loop()
         result = loop.run_until_complete(_download())
         
-        # Update download instance
+        # Let browsers start playback before the whole file has arrived
+        if settings.MEDIA_MP4_FASTSTART and result['mime_type'].startswith('video/mp4'):
+            with stage(POSTPROCESS), start_span('postprocess.faststart'):
+                if faststart_mp4(result['file_path']):
+                    with get_storage().open(result['file_path']) as content:
+                        digest = digest_file(content)
+                    result['file_size'] = digest.size
+                    result['crc32'] = digest.crc32
+                    result['sha256'] = digest.sha256
+        
+        # Update download instance; sizes and checksums are kept per file
+        # for exact-length bundles and for integrity verification
+        download.files = list(download.files or []) + [{
+            'path': result['file_path'],
+            'size': result['file_size'],
+            'crc32': result['crc32'],
+            'sha256': result['sha256'],
+            'mime_type': result['mime_type'],
+        }]
         download.file_path = result['file_path']
         download.file_size = result['file_size']
+        download.content_digest = result['sha256']
         download.mime_type = result['mime_type']
-        download.save()
+        with stage(DB_UPDATE):
+            download.save()
         
         return {
             'status': 'success',
@@ -184,6 +384,185 @@ def download_media(
         logger.error(f"Media download failed: {str(exc)}", exc_info=True)
         raise
 
+@shared_task(queue='default', ignore_result=True)
+def enforce_download_retention(days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Drop expired download partitions and purge old rows in batches
+    
+    Args:
+        days: Retention period override, defaults to DOWNLOAD_RETENTION_DAYS
+    
+    Returns:
+        Dict describing what was removed
+    """
+    from .services.retention import enforce_retention
+
+    result = enforce_retention(days)
+    logger.info(
+        f"Retention removed {result['rows_deleted']} rows and "
+        f"{len(result['partitions_retired'])} partitions"
+    )
+    return result
+
+@shared_task(queue='default', ignore_result=True)
+def flush_download_counts() -> int:
+    """
+    Write Redis-buffered download counts to the database
+    
+    Returns:
+        Number of increments flushed
+    """
+    from .services.counters import flush_download_counts as flush
+
+    flushed = flush()
+    if flushed:
+        logger.debug(f"Flushed {flushed} buffered download count increments")
+    return flushed
+
+@shared_task(queue='default', ignore_result=True)
+def reap_stuck_downloads() -> Dict[str, int]:
+    """
+    Recover downloads stuck in an in-flight status past their deadline
+    
+    Returns:
+        Dict with the number of requeued and failed downloads
+    """
+    from .services.reaper import reap_stuck_downloads as reap
+
+    result = reap()
+    if result['requeued'] or result['failed']:
+        logger.warning(
+            f"Reaped stuck downloads: {result['requeued']} requeued, "
+            f"{result['failed']} failed"
+        )
+    return result
+
+@shared_task(queue='default', ignore_result=True)
+def evict_media() -> Dict[str, int]:
+    """
+    Evict least-recently-used media while usage is over MEDIA_QUOTA_BYTES
+    
+    Returns:
+        Dict with usage, bytes freed and files evicted
+    """
+    from .services.eviction import evict_media as evict
+
+    result = evict()
+    if result['evicted']:
+        logger.info(
+            f"Evicted {result['evicted']} files, freed {result['freed']} bytes"
+        )
+    return result
+
+@shared_task(queue='media', ignore_result=True)
+def generate_previews(download_id: str, variants: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Render preview variants of a finished download
+    
+    Decoding runs in a bounded process pool on the media queue's worker,
+    away from the download workers and the web processes.
+    
+    Args:
+        download_id: UUID of the download
+        variants: Variants to render; defaults to MEDIA_PREVIEW_EAGER
+    
+    Returns:
+        Dict of variant name to storage name
+    """
+    from .services.previews import generate_previews as generate
+
+    try:
+        return generate(download_id, variants)
+    except Exception:
+        logger.warning(
+            "Preview generation failed",
+            exc_info=True,
+            extra={'download_id': download_id}
+        )
+        return {}
+
+@shared_task(queue='media', ignore_result=True)
+def render_profile(download_id: str, profile: str) -> Optional[str]:
+    """
+    Re-encode a downloaded image for a delivery profile
+    
+    Args:
+        download_id: UUID of the download
+        profile: Key of MEDIA_DELIVERY_PROFILES
+    
+    Returns:
+        Storage name of the rendered file, or None
+    """
+    from .services.profiles import render_profile as render
+
+    return render(download_id, profile)
+
+@shared_task(queue='default', ignore_result=True)
+def demote_idle_media() -> Dict[str, int]:
+    """
+    Move media not served for MEDIA_DEMOTE_AFTER_DAYS to the cold tier
+
+    Also refreshes the per-tier residency served by /api/stats/storage/.
+    
+    Returns:
+        Dict with demoted and skipped counts
+    """
+    from .services.tiering import demote_idle_media as demote, refresh_residency
+
+    result = demote()
+    refresh_residency()
+    if result['demoted']:
+        logger.info(f"Demoted {result['demoted']} files to cold storage")
+    return result
+
+@shared_task(queue='default', ignore_result=True)
+def promote_media(download_id: str) -> bool:
+    """
+    Bring a cold file back to the hot tier after it was served
+    
+    Args:
+        download_id: UUID of the download
+    
+    Returns:
+        Whether the file was moved
+    """
+    from .services.tiering import promote_media as promote
+
+    return promote(download_id)
+
+@shared_task(queue='default', ignore_result=True)
+def verify_media(download_id: str) -> Optional[bool]:
+    """
+    Rehash a download's files after a serve found them changed on disk
+    
+    Args:
+        download_id: UUID of the download
+    
+    Returns:
+        True if intact, False if flagged corrupt, None if not verifiable
+    """
+    from .services.integrity import verify_media as verify
+
+    return verify(download_id)
+
+@shared_task(queue='default', ignore_result=True)
+def scrub_media() -> Dict[str, int]:
+    """
+    Re-verify a rate-limited batch of the least recently verified files
+    
+    Returns:
+        Dict with checked, corrupt and bytes counts
+    """
+    from .services.integrity import scrub_media as scrub
+
+    result = scrub()
+    if result['corrupt']:
+        logger.error(
+            f"Integrity scrub found {result['corrupt']} corrupt downloads "
+            f"out of {result['checked']} checked"
+        )
+    return result
+
 @task_success.connect(sender=process_download)
 def handle_successful_download(sender=None, **kwargs):
     """Handle successful download completion"""
@@ -199,4 +578,4 @@ def handle_failed_download(sender=None, task_id=None, exception=None, **kwargs):
         f"Download task failed: {str(exception)}",
         extra={'task_id': task_id},
         exc_info=exception
-    )
\ No newline at end of file
+    )
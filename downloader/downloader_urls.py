@@ -9,6 +9,13 @@ from .views import (
     UserProfileView,
     MediaDownloadView,
     DownloadHistoryViewSet,
+    DownloadStatusView,
+    DownloadFileView,
+    DownloadBundleView,
+    DownloadPreviewView,
+    download_stats,
+    storage_stats,
+    delivery_profile_stats,
 )
 
 router = DefaultRouter()
@@ -20,4 +27,15 @@ urlpatterns = [
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('download/', MediaDownloadView.as_view(), name='download'),
+    path('downloads/<uuid:pk>/', DownloadStatusView.as_view(), name='download-detail'),
+    path('downloads/<uuid:pk>/file/', DownloadFileView.as_view(), name='download-file'),
+    path('downloads/<uuid:pk>/bundle/', DownloadBundleView.as_view(), name='download-bundle'),
+    path(
+        'downloads/<uuid:pk>/preview/<str:variant>/',
+        DownloadPreviewView.as_view(),
+        name='download-preview'
+    ),
+    path('stats/', download_stats, name='stats'),
+    path('stats/storage/', storage_stats, name='storage-stats'),
+    path('stats/profiles/', delivery_profile_stats, name='profile-stats'),
 ] + router.urls
\ No newline at end of file
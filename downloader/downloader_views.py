@@ -1,45 +1,346 @@
-from django.http import JsonResponse
-from django.db import connections
-from django.db.utils import OperationalError
-from redis import Redis
-from redis.exceptions import RedisError
+import hmac
+import logging
+from functools import partial
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.conf import settings
-import os
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status, viewsets
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Download, DownloadRollup
+from .services.analytics import get_stats
+from .services.bundles import bundle_entries, stream_bundle
+from .services.eviction import MediaLease, touch_media
+from .services.health import get_readiness
+from .services.integrity import check_integrity, claim_verification, release_verification
+from .services.metrics import render_metrics
+from .services.previews import cached_preview, claim_preview, has_source
+from .services.profiles import (
+    cached_profile,
+    claim_profile,
+    profile_skipped,
+    profile_stats,
+    release_profile,
+    select_profile,
+)
+from .services.status_cache import get_status, status_cache_stats
+from .services.storage import get_storage
+from .services.tiering import claim_promotion, record_tier_hit, release_promotion, tier_stats
+from .tasks import generate_previews, promote_media, render_profile, verify_media
+from .serializers import DOWNLOAD_ROW_FIELDS, DownloadSerializer, serialize_download_row
+from .utils.pagination import KeysetPagination
+from .utils.renderers import FastJSONRenderer
+from .utils.request import get_client_ip
+from .utils.zipstream import MAX_ZIP32, zip_size
+
+logger = logging.getLogger(__name__)
+
+def liveness(request):
+    """
+    Liveness probe: the process is up and serving; does no I/O
+    """
+    return JsonResponse({'status': 'alive'})
 
 def health_check(request):
     """
-    Health check endpoint for monitoring system status
+    Readiness probe: dependencies checked concurrently, cached briefly
+    """
+    health = dict(get_readiness())
+    health['status_cache'] = status_cache_stats()
+
+    # Connection pool usage of this worker process
+    if getattr(settings, 'DB_POOL_ENABLED', False):
+        from core.pooled_postgresql.pool import pool_stats
+        health['db_pool'] = pool_stats()
+
+    status_code = 200 if health['status'] == 'healthy' else 503
+    return JsonResponse(health, status=status_code)
+
+readiness = health_check
+
+def metrics(request):
     """
-    health = {
-        'status': 'healthy',
-        'database': True,
-        'redis': True,
-        'media_writable': True
-    }
-    
-    # Check database connection
+    Prometheus metrics of every worker process of this server
+
+    Not routed by nginx; scraped on the backend network. With METRICS_TOKEN
+    set, scrapes must also send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return HttpResponse(status=403)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+def download_stats(request):
+    """
+    Download analytics read from the hourly or daily rollups
+    """
+    granularity = request.GET.get('granularity', DownloadRollup.Granularity.HOUR).upper()
+    if granularity not in DownloadRollup.Granularity.values:
+        return JsonResponse({'error': 'Invalid granularity'}, status=400)
+
+    default_days = 2 if granularity == DownloadRollup.Granularity.HOUR else 30
     try:
-        connections['default'].cursor()
-    except OperationalError:
-        health['database'] = False
-        health['status'] = 'unhealthy'
+        days = min(int(request.GET.get('days', default_days)), 366)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid days'}, status=400)
+
+    since = timezone.now() - timedelta(days=days)
+    return JsonResponse({
+        'granularity': granularity,
+        'since': since.isoformat(),
+        'buckets': get_stats(granularity, since)
+    })
+
+def storage_stats(request):
+    """
+    Tier residency and hit ratio of downloaded media
+    """
+    return JsonResponse(tier_stats())
+
+def delivery_profile_stats(request):
+    """
+    Size reduction and CPU cost of each image delivery profile
+    """
+    return JsonResponse(profile_stats())
+
+class DownloadHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Download history of the requesting client, newest first
+    """
+    serializer_class = DownloadSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = [FastJSONRenderer]
+
+    def get_queryset(self):
+        return Download.objects.filter(ip_address=get_client_ip(self.request))
+
+    def list(self, request, *args, **kwargs):
+        # Read-only fast path: plain rows, no model instances or field objects
+        rows = self.get_queryset().values(*DOWNLOAD_ROW_FIELDS)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response([serialize_download_row(row) for row in page])
+
+    def retrieve(self, request, *args, **kwargs):
+        row = self.get_queryset().filter(pk=kwargs['pk']).values(*DOWNLOAD_ROW_FIELDS).first()
+        if row is None:
+            raise NotFound('Download not found')
+        return Response(serialize_download_row(row))
+
+
+class DownloadStatusView(APIView):
+    """
+    Status of a single download, served from the status cache
+
+    Responses carry an ETag; a poll with a matching If-None-Match gets an
+    empty 304 without touching the database.
+    """
+    renderer_classes = [FastJSONRenderer]
+
+    def get(self, request, pk):
+        entry = get_status(pk)
+        if entry is None:
+            raise NotFound('Download not found')
+
+        headers = {'ETag': entry['etag'], 'Cache-Control': 'no-cache'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or entry['etag'] in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(entry['data'], headers=headers)
 
-    # Check Redis connection
+
+def _queue(task, download_id, *args, release=None) -> None:
+    """
+    Publish background work for a download without failing the request
+
+    The file can still be served while the broker is down. ``release``
+    drops the claim taken for the task, so a later request queues it again.
+    """
     try:
-        redis_client = Redis.from_url(settings.REDIS_URL)
-        redis_client.ping()
-    except RedisError:
-        health['redis'] = False
-        health['status'] = 'unhealthy'
-
-    # Check media directory is writable
-    media_path = os.path.join(settings.MEDIA_ROOT, 'downloads')
-    if not os.path.exists(media_path):
-        try:
-            os.makedirs(media_path)
-        except OSError:
-            health['media_writable'] = False
-            health['status'] = 'unhealthy'
+        task.delay(str(download_id), *args)
+    except Exception:
+        logger.warning(
+            f"Failed to queue {task.name}",
+            exc_info=True,
+            extra={'download_id': str(download_id)}
+        )
+        if release is not None:
+            release()
 
-    status_code = 200 if health['status'] == 'healthy' else 503
-    return JsonResponse(health, status=status_code)
\ No newline at end of file
+
+def _check_integrity(download):
+    """
+    Error response for a corrupt download, or None to go ahead and serve
+
+    Only file metadata is checked here; files changed since they were
+    last hashed are rehashed in the background.
+    """
+    intact = False if download.is_corrupt else check_integrity(download)
+    if intact is False:
+        return Response(
+            {'error': 'File failed an integrity check; request the download again'},
+            status=status.HTTP_410_GONE
+        )
+    if intact is None and claim_verification(download.pk):
+        _queue(verify_media, download.pk, release=partial(release_verification, download.pk))
+    return None
+
+
+class DownloadFileView(APIView):
+    """
+    Redirect to the downloaded file
+
+    Files are never proxied through the app: local storage redirects to
+    its base URL, object storage to a short-lived presigned URL. Cold
+    files are served from the cold tier and promoted in the background.
+    Images can be delivered re-encoded for a profile (``?profile=`` or a
+    WebP Accept header) once it has been rendered.
+    """
+
+    def get(self, request, pk):
+        download = (
+            Download.objects
+            .filter(pk=pk, status=Download.Status.COMPLETED)
+            .only(
+                'id', 'file_path', 'files', 'evicted_at', 'corrupted_at',
+                'storage_tier', 'mime_type', 'preview_hash'
+            )
+            .first()
+        )
+        if download is None or not download.file_path:
+            raise NotFound('File not found')
+        if download.is_evicted:
+            return Response(
+                {'error': 'File was removed to free space; request the download again'},
+                status=status.HTTP_410_GONE
+            )
+        integrity_error = _check_integrity(download)
+        if integrity_error:
+            return integrity_error
+
+        record_tier_hit(download.storage_tier)
+        if download.storage_tier == Download.StorageTier.COLD:
+            # Served from the cold tier this time, promoted in the background
+            if claim_promotion(download.pk):
+                _queue(promote_media, download.pk, release=partial(release_promotion, download.pk))
+        else:
+            touch_media(download.pk)
+        download.increment_download_count()
+
+        url = download.get_download_url()
+        profile = select_profile(request, download.mime_type)
+        if profile:
+            name = cached_profile(download, profile)
+            if name:
+                url = get_storage().url(name)
+            elif not profile_skipped(download, profile) and claim_profile(download.pk, profile):
+                # Original this time; the re-encode is rendered off the request
+                _queue(
+                    render_profile, download.pk, profile,
+                    release=partial(release_profile, download.pk, profile)
+                )
+
+        response = HttpResponseRedirect(url)
+        response['Vary'] = 'Accept'
+        return response
+
+
+class DownloadBundleView(APIView):
+    """
+    Stream a ZIP of every file of a download
+
+    Entries are stored uncompressed (media is already compressed) with
+    sizes and CRCs recorded at download time, so the archive is produced
+    on the fly with an exact Content-Length and no temporary file.
+    """
+
+    def get(self, request, pk):
+        download = (
+            Download.objects
+            .filter(pk=pk, status=Download.Status.COMPLETED)
+            .only(
+                'id', 'file_path', 'files', 'mime_type', 'evicted_at',
+                'corrupted_at', 'storage_tier', 'completed_at'
+            )
+            .first()
+        )
+        if download is None or not download.stored_names():
+            raise NotFound('File not found')
+        if download.is_evicted:
+            return Response(
+                {'error': 'File was removed to free space; request the download again'},
+                status=status.HTTP_410_GONE
+            )
+        integrity_error = _check_integrity(download)
+        if integrity_error:
+            return integrity_error
+
+        entries = bundle_entries(download)
+        length = zip_size(entries)
+        if length > MAX_ZIP32 or len(entries) > 0xFFFF:
+            return Response(
+                {'error': 'Bundle is too large for a ZIP archive; download the files individually'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Held for the whole stream; released by stream_bundle when it ends
+        lease = MediaLease(download.pk)
+        if not lease.acquire():
+            lease.release()
+            return Response(
+                {'error': 'File was removed to free space; request the download again'},
+                status=status.HTTP_410_GONE
+            )
+
+        record_tier_hit(download.storage_tier)
+        if download.storage_tier == Download.StorageTier.HOT:
+            touch_media(download.pk)
+        download.increment_download_count()
+
+        response = StreamingHttpResponse(
+            stream_bundle(download, entries, lease),
+            content_type='application/zip'
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Disposition'] = f'attachment; filename="{download.pk}.zip"'
+        return response
+
+
+class DownloadPreviewView(APIView):
+    """
+    Redirect to a preview variant
+
+    Variants not rendered yet are queued on the media workers and answered
+    with 202 and Retry-After; images are never decoded in the web process.
+    """
+
+    def get(self, request, pk, variant):
+        if variant not in settings.MEDIA_PREVIEW_SIZES:
+            raise NotFound('Unknown preview size')
+
+        download = (
+            Download.objects
+            .filter(pk=pk, status=Download.Status.COMPLETED)
+            .only('id', 'preview_hash', 'file_path', 'mime_type', 'thumbnail_url')
+            .first()
+        )
+        if download is None or not has_source(download):
+            raise NotFound('Preview not available')
+
+        name = cached_preview(download, variant)
+        if name is None:
+            if claim_preview(download.pk, variant):
+                generate_previews.delay(str(download.pk), [variant])
+            response = Response({'status': 'rendering'}, status=status.HTTP_202_ACCEPTED)
+            response['Retry-After'] = '2'
+            return response
+
+        return HttpResponseRedirect(get_storage().url(name))
@@ -0,0 +1,96 @@
+import time
+import uuid
+import statistics
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from downloader.models import Download
+from downloader.utils.pagination import Cursor, KeysetPagination
+
+BENCH_IP = '198.51.100.27'
+
+class Command(BaseCommand):
+    """Compare OFFSET and keyset page latency at increasing history depths."""
+
+    help = 'Benchmark download history pagination on a large fixture'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--depths',
+            default='0,1000,10000,100000,500000,990000',
+            help='Comma separated row offsets to measure'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the fixture rows after the run'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Download.objects.filter(ip_address=BENCH_IP)
+        existing = queryset.count()
+        if existing < options['rows']:
+            self._seed(options['rows'] - existing)
+
+        paginator = KeysetPagination()
+        page_size = options['page_size']
+        ordered = queryset.order_by('-created_at', '-id')
+
+        self.stdout.write(f"{'depth':>10} {'offset ms':>12} {'keyset ms':>12}")
+        for depth in [int(d) for d in options['depths'].split(',')]:
+            if depth >= options['rows']:
+                continue
+
+            offset_ms = self._time(
+                lambda: list(ordered[depth:depth + page_size]),
+                options['repeat']
+            )
+
+            cursor = None
+            if depth:
+                anchor = ordered.values('created_at', 'pk')[depth - 1]
+                cursor = Cursor(anchor['created_at'], anchor['pk'], False)
+            keyset_ms = self._time(
+                lambda: list(paginator.page_queryset(queryset, cursor)[:page_size]),
+                options['repeat']
+            )
+
+            self.stdout.write(f"{depth:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+
+        if not options['keep']:
+            queryset.delete()
+
+    def _time(self, fn, repeat: int) -> float:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def _seed(self, count: int, batch_size: int = 10_000):
+        """Bulk insert fixture rows spread one second apart."""
+        self.stdout.write(f"Seeding {count} rows...")
+        field = Download._meta.get_field('created_at')
+        auto_now_add = field.auto_now_add
+        # bulk_create would otherwise stamp every row with the same time
+        field.auto_now_add = False
+        start = timezone.now() - timedelta(seconds=count)
+        try:
+            for offset in range(0, count, batch_size):
+                Download.objects.bulk_create([
+                    Download(
+                        id=uuid.uuid4(),
+                        url=f'https://www.instagram.com/p/bench{offset + i}/',
+                        status=Download.Status.COMPLETED,
+                        ip_address=BENCH_IP,
+                        created_at=start + timedelta(seconds=offset + i),
+                        file_size=1024,
+                    )
+                    for i in range(min(batch_size, count - offset))
+                ])
+        finally:
+            field.auto_now_add = auto_now_add
@@ -0,0 +1,51 @@
+import time
+import statistics
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+from downloader.middleware import MetricsMiddleware
+from downloader.services.metrics import render_metrics, stage
+
+class Command(BaseCommand):
+    """Measure the cost of the Prometheus instrumentation."""
+
+    help = 'Benchmark metric observation, MetricsMiddleware and scrape overhead'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100_000)
+        parser.add_argument('--path', default='/api/stats/')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with stage('bench'):
+                pass
+        stage_us = (time.perf_counter() - start) / iterations * 1e6
+
+        request = RequestFactory().get(options['path'])
+        request.resolver_match = resolve(options['path'])
+        bare = lambda request: HttpResponse()
+        middleware = MetricsMiddleware(bare)
+        baseline = self._per_call(bare, request, iterations)
+        instrumented = self._per_call(middleware, request, iterations)
+
+        scrapes = []
+        for _ in range(20):
+            start = time.perf_counter()
+            body, _ = render_metrics()
+            scrapes.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f"stage={stage_us:.2f}us/observation "
+            f"middleware={instrumented - baseline:.2f}us/request "
+            f"scrape p50={statistics.median(scrapes):.2f}ms ({len(body)} bytes)"
+        )
+
+    def _per_call(self, handler, request, iterations) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            handler(request)
+        return (time.perf_counter() - start) / iterations * 1e6
@@ -0,0 +1,43 @@
+import io
+import statistics
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from downloader.services.previews import render_preview
+
+class Command(BaseCommand):
+    """Time decode and resize per image for each preview size, with and without draft mode."""
+
+    help = 'Benchmark preview rendering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Images to render; synthetic JPEGs when omitted')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sources = [(path, open(path, 'rb').read()) for path in options['files']]
+        if not sources:
+            sources = [
+                (f'synthetic {w}x{h}', self._synthetic(w, h))
+                for w, h in ((1080, 1350), (3024, 4032))
+            ]
+
+        self.stdout.write(f"{'source':<24} {'variant':<8} {'mode':<8} {'decode ms':>10} {'resize ms':>10}")
+        for label, data in sources:
+            for variant, size in settings.MEDIA_PREVIEW_SIZES.items():
+                for draft in (True, False):
+                    decode, resize = [], []
+                    for _ in range(options['iterations']):
+                        _, decode_s, resize_s = render_preview(data, size, timings=True, draft=draft)
+                        decode.append(decode_s * 1000)
+                        resize.append(resize_s * 1000)
+                    self.stdout.write(
+                        f"{label:<24} {variant:<8} {'draft' if draft else 'full':<8} "
+                        f"{statistics.median(decode):>10.2f} {statistics.median(resize):>10.2f}"
+                    )
+
+    def _synthetic(self, width, height):
+        from PIL import Image
+        image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=90)
+        return output.getvalue()
@@ -0,0 +1,45 @@
+import time
+import statistics
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+from downloader.middleware import RateLimitMiddleware
+
+class Command(BaseCommand):
+    """Measure per-request overhead of the Redis rate-limit middleware."""
+
+    help = 'Benchmark RateLimitMiddleware latency against the configured Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10_000)
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--path', default='/api/stats/')
+
+    def handle(self, *args, **options):
+        middleware = RateLimitMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        match = resolve(options['path'])
+
+        samples = []
+        rejected = 0
+        for i in range(options['requests']):
+            request = factory.get(
+                options['path'],
+                REMOTE_ADDR=f"10.0.{(i % options['clients']) // 256}.{i % 256}"
+            )
+            request.resolver_match = match
+
+            start = time.perf_counter()
+            response = middleware.process_view(request, match.func, match.args, match.kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response is not None:
+                rejected += 1
+
+        samples.sort()
+        self.stdout.write(
+            f"requests={len(samples)} rejected={rejected} "
+            f"p50={statistics.median(samples):.3f}ms "
+            f"p99={samples[int(len(samples) * 0.99) - 1]:.3f}ms "
+            f"max={samples[-1]:.3f}ms"
+        )
@@ -0,0 +1,56 @@
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from downloader.models import Download
+from downloader.serializers import (
+    DownloadSerializer,
+    download_row,
+    serialize_download_row,
+)
+from downloader.utils.renderers import FastJSONRenderer
+
+class Command(BaseCommand):
+    """Compare DownloadSerializer with the .values() fast path in rows/s."""
+
+    help = 'Benchmark list/status serialization paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        instances = [
+            Download(
+                id=uuid.uuid4(),
+                url=f'https://www.instagram.com/p/bench{i}/',
+                status=Download.Status.COMPLETED,
+                file_path=f'downloads/bench{i}.jpg',
+                file_size=1024 * (i + 1),
+                created_at=now - timedelta(seconds=i + 5),
+                updated_at=now,
+                completed_at=now,
+            )
+            for i in range(options['rows'])
+        ]
+        rows = [download_row(instance) for instance in instances]
+
+        results = [
+            ('DownloadSerializer + JSONRenderer', lambda: JSONRenderer().render(
+                DownloadSerializer(instances, many=True).data
+            )),
+            ('fast path + JSONRenderer', lambda: JSONRenderer().render(
+                [serialize_download_row(row) for row in rows]
+            )),
+            ('fast path + FastJSONRenderer', lambda: FastJSONRenderer().render(
+                [serialize_download_row(row) for row in rows]
+            )),
+        ]
+
+        for label, fn in results:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:<36} {len(rows) / elapsed:>12,.0f} rows/s")
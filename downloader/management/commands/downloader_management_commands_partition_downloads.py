@@ -0,0 +1,57 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from downloader.services.retention import (
+    add_months,
+    convert_to_partitioned,
+    ensure_partitions,
+    is_partitioned,
+    month_start,
+)
+
+class Command(BaseCommand):
+    """Convert the downloads table to monthly partitions and maintain them."""
+
+    help = 'Partition the Download table by month on created_at'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--step',
+            choices=['prepare', 'validate', 'swap', 'all', 'ensure'],
+            default='all',
+            help='Conversion step to run; "ensure" only pre-creates partitions'
+        )
+        parser.add_argument(
+            '--cutover',
+            help='First day of the month (YYYY-MM-DD) where new partitions start; '
+                 'defaults to next month'
+        )
+
+    def handle(self, *args, **options):
+        if options['step'] == 'ensure':
+            if not is_partitioned():
+                raise CommandError('Download table is not partitioned yet')
+            created = ensure_partitions()
+            self.stdout.write(self.style.SUCCESS(
+                f"Created partitions: {', '.join(created) or 'none'}"
+            ))
+            return
+
+        if options['cutover']:
+            try:
+                cutover = datetime.strptime(options['cutover'], '%Y-%m-%d').date()
+            except ValueError as exc:
+                raise CommandError(f"Invalid cutover date: {exc}")
+        else:
+            cutover = add_months(month_start(timezone.now()), 1)
+
+        try:
+            convert_to_partitioned(
+                cutover,
+                step=options['step'],
+                log=self.stdout.write
+            )
+        except (RuntimeError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"Step '{options['step']}' finished"))
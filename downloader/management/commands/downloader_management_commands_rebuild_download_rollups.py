@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from downloader.models import Download
+from downloader.services.analytics import rebuild_rollups
+
+class Command(BaseCommand):
+    """Backfill hourly and daily download rollups from the Download table."""
+
+    help = 'Rebuild download analytics rollups for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='First day to rebuild (YYYY-MM-DD); defaults to the oldest download'
+        )
+        parser.add_argument(
+            '--until',
+            help='Day after the last day to rebuild (YYYY-MM-DD); defaults to tomorrow'
+        )
+
+    def handle(self, *args, **options):
+        since = self._parse(options['since'])
+        until = self._parse(options['until'])
+
+        if since is None:
+            oldest = Download.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if oldest is None:
+                self.stdout.write('No downloads to aggregate')
+                return
+            since = oldest
+        if until is None:
+            until = timezone.now() + timedelta(days=1)
+        if since >= until:
+            raise CommandError('--since must be before --until')
+
+        # Rollups for days whose downloads were removed by retention are
+        # replaced with empty buckets, so only rebuild retained ranges
+        written = rebuild_rollups(since, until, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} hourly rollup rows"))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
@@ -0,0 +1,30 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from downloader.services.storage import shard_flat_files
+
+class Command(BaseCommand):
+    """Move downloads from the legacy flat directory into hashed shards."""
+
+    help = 'Migrate flat MEDIA_ROOT/downloads files to the sharded layout (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per batch')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Report without moving files')
+
+    def handle(self, *args, **options):
+        try:
+            result = shard_flat_files(
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                dry_run=options['dry_run'],
+                log=self.stdout.write
+            )
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        prefix = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result['moved']} files, relinked {result['relinked']}, "
+            f"{result['missing']} missing"
+        ))
@@ -0,0 +1,78 @@
+import json
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    """Explain the slowest traces written by FileSpanExporter, span by span."""
+
+    help = 'Print the span trees of the slowest traces in a trace file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Trace file (default TRACING_FILE)')
+        parser.add_argument(
+            '--root', default='task downloader.tasks.process_download',
+            help='Only traces containing a span with this name'
+        )
+        parser.add_argument('--percentile', type=float, default=99, help='Show traces at or above this')
+        parser.add_argument('--limit', type=int, default=10, help='Maximum traces to print')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.TRACING_EXPORTER.get('OPTIONS', {}).get('path')
+        if not path:
+            raise CommandError('No trace file given and TRACING_EXPORTER has no path')
+
+        traces = defaultdict(list)
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        span = json.loads(line)
+                        traces[span['trace_id']].append(span)
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist')
+
+        durations = []
+        for trace_id, spans in traces.items():
+            roots = [s for s in spans if s['name'] == options['root']]
+            if roots:
+                durations.append((max(s['duration'] for s in roots), trace_id))
+        if not durations:
+            self.stdout.write(f"No traces with a {options['root']!r} span")
+            return
+
+        durations.sort(reverse=True)
+        cutoff = durations[int(len(durations) * (100 - options['percentile']) / 100)][0]
+        slowest = [d for d in durations if d[0] >= cutoff][:options['limit']]
+        self.stdout.write(
+            f"{len(durations)} traces, p{options['percentile']:g}={cutoff * 1000:.0f}ms, "
+            f"showing {len(slowest)}"
+        )
+        for duration, trace_id in slowest:
+            self.stdout.write(f"\ntrace {trace_id} {duration * 1000:.0f}ms")
+            self._print_tree(traces[trace_id])
+
+    def _print_tree(self, spans):
+        ids = {span['span_id'] for span in spans}
+        children = defaultdict(list)
+        for span in spans:
+            # Parents in other processes may not have been exported
+            parent = span['parent_id'] if span['parent_id'] in ids else None
+            children[parent].append(span)
+
+        def walk(parent, depth):
+            for span in sorted(children[parent], key=lambda s: s['start']):
+                child_time = sum(c['duration'] for c in children[span['span_id']])
+                error = f"  ERROR {span['error']}" if span['error'] else ''
+                attributes = ' '.join(
+                    f'{k}={v}' for k, v in span['attributes'].items() if k != 'statement'
+                )
+                self.stdout.write(
+                    f"{'  ' * depth}{span['name']} {span['duration'] * 1000:.1f}ms "
+                    f"(self {(span['duration'] - child_time) * 1000:.1f}ms) {attributes}{error}"
+                )
+                if span['attributes'].get('statement'):
+                    self.stdout.write(f"{'  ' * (depth + 1)}{span['attributes']['statement'][:120]}")
+                walk(span['span_id'], depth + 1)
+
+        walk(None, 0)
@@ -0,0 +1,231 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from ..models import Download, DownloadRollup
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Terminal statuses that are counted in the rollups
+COUNTED_STATUSES = (Download.Status.COMPLETED, Download.Status.FAILED)
+
+SIZE_BUCKET_EXPRESSION = Case(
+    When(file_size__isnull=True, then=Value(DownloadRollup.SizeBucket.UNKNOWN)),
+    When(file_size__lt=MB, then=Value(DownloadRollup.SizeBucket.SMALL)),
+    When(file_size__lt=10 * MB, then=Value(DownloadRollup.SizeBucket.MEDIUM)),
+    When(file_size__lt=50 * MB, then=Value(DownloadRollup.SizeBucket.LARGE)),
+    default=Value(DownloadRollup.SizeBucket.HUGE),
+)
+
+# The moment a download reached its final status
+OUTCOME_TIME_EXPRESSION = Coalesce('completed_at', 'updated_at')
+
+
+def size_bucket(file_size: Optional[int]) -> str:
+    """Map a file size in bytes to its rollup size bucket."""
+    if file_size is None:
+        return DownloadRollup.SizeBucket.UNKNOWN
+    if file_size < MB:
+        return DownloadRollup.SizeBucket.SMALL
+    if file_size < 10 * MB:
+        return DownloadRollup.SizeBucket.MEDIUM
+    if file_size < 50 * MB:
+        return DownloadRollup.SizeBucket.LARGE
+    return DownloadRollup.SizeBucket.HUGE
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Truncate ``moment`` to the start of its hour or day in UTC."""
+    moment = moment.astimezone(dt_timezone.utc)
+    if granularity == DownloadRollup.Granularity.DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_outcome(download: Download) -> None:
+    """
+    Add a finished download to its hourly and daily rollups
+
+    Called once per download when its task reaches a final outcome.
+    """
+    if download.status not in COUNTED_STATUSES:
+        return
+
+    moment = download.completed_at or download.updated_at
+    size = size_bucket(download.file_size)
+
+    for granularity in DownloadRollup.Granularity.values:
+        _increment(
+            granularity=granularity,
+            bucket=bucket_start(moment, granularity),
+            status=download.status,
+            media_type=download.media_type,
+            size=size,
+            count=1,
+            total_bytes=download.file_size or 0
+        )
+
+
+def rebuild_rollups(since: datetime, until: datetime, log=logger.info) -> int:
+    """
+    Recompute rollups for ``[since, until)`` from the Download table
+
+    Works one day at a time so each GROUP BY stays within a single day's
+    rows (and a single partition). Daily rollups are derived from the
+    freshly built hourly ones.
+
+    Returns:
+        Number of hourly rollup rows written
+    """
+    written = 0
+    day = bucket_start(since, DownloadRollup.Granularity.DAY)
+
+    while day < until:
+        next_day = day + timedelta(days=1)
+
+        rows = (
+            Download.objects
+            .filter(status__in=COUNTED_STATUSES)
+            .annotate(outcome_at=OUTCOME_TIME_EXPRESSION)
+            .filter(outcome_at__gte=day, outcome_at__lt=next_day)
+            .annotate(
+                bucket=TruncHour('outcome_at', tzinfo=dt_timezone.utc),
+                size_bucket=SIZE_BUCKET_EXPRESSION
+            )
+            .values('bucket', 'status', 'media_type', 'size_bucket')
+            .annotate(count=Count('pk'), total_bytes=Coalesce(Sum('file_size'), 0))
+            .order_by()
+        )
+
+        hourly = [
+            DownloadRollup(
+                granularity=DownloadRollup.Granularity.HOUR,
+                bucket_start=row['bucket'],
+                status=row['status'],
+                media_type=row['media_type'],
+                size_bucket=row['size_bucket'],
+                count=row['count'],
+                total_bytes=row['total_bytes']
+            )
+            for row in rows
+        ]
+
+        with transaction.atomic():
+            DownloadRollup.objects.filter(
+                bucket_start__gte=day,
+                bucket_start__lt=next_day
+            ).delete()
+            DownloadRollup.objects.bulk_create(hourly)
+            DownloadRollup.objects.bulk_create(_daily_from_hourly(day, next_day))
+
+        written += len(hourly)
+        log(f"Rebuilt {day:%Y-%m-%d}: {len(hourly)} hourly buckets")
+        day = next_day
+
+    return written
+
+
+def get_stats(
+    granularity: str,
+    since: datetime,
+    until: Optional[datetime] = None
+) -> List[Dict]:
+    """
+    Read download totals per bucket from the rollups
+
+    Cost depends on the number of buckets in range, not on the number of
+    downloads.
+    """
+    queryset = DownloadRollup.objects.filter(
+        granularity=granularity,
+        bucket_start__gte=since
+    )
+    if until:
+        queryset = queryset.filter(bucket_start__lt=until)
+
+    series = {}
+    for rollup in queryset.order_by('bucket_start'):
+        bucket = series.setdefault(rollup.bucket_start, {
+            'bucket_start': rollup.bucket_start.isoformat(),
+            'total': 0,
+            'total_bytes': 0,
+            'by_status': {},
+            'by_media_type': {},
+            'by_size': {},
+        })
+        bucket['total'] += rollup.count
+        bucket['total_bytes'] += rollup.total_bytes
+        for key, value in (
+            ('by_status', rollup.status),
+            ('by_media_type', rollup.media_type),
+            ('by_size', rollup.size_bucket),
+        ):
+            bucket[key][value] = bucket[key].get(value, 0) + rollup.count
+
+    return list(series.values())
+
+
+def _daily_from_hourly(day: datetime, next_day: datetime) -> List[DownloadRollup]:
+    """Collapse one day's hourly rollups into daily rows."""
+    rows = (
+        DownloadRollup.objects
+        .filter(
+            granularity=DownloadRollup.Granularity.HOUR,
+            bucket_start__gte=day,
+            bucket_start__lt=next_day
+        )
+        .annotate(bucket=TruncDay('bucket_start', tzinfo=dt_timezone.utc))
+        .values('bucket', 'status', 'media_type', 'size_bucket')
+        .annotate(day_count=Sum('count'), day_bytes=Sum('total_bytes'))
+        .order_by()
+    )
+    return [
+        DownloadRollup(
+            granularity=DownloadRollup.Granularity.DAY,
+            bucket_start=row['bucket'],
+            status=row['status'],
+            media_type=row['media_type'],
+            size_bucket=row['size_bucket'],
+            count=row['day_count'],
+            total_bytes=row['day_bytes']
+        )
+        for row in rows
+    ]
+
+
+def _increment(granularity, bucket, status, media_type, size, count, total_bytes):
+    """Atomically add to a rollup row, creating it if needed."""
+    if connection.vendor == 'postgresql':
+        table = DownloadRollup._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (granularity, bucket_start, status, media_type, size_bucket, count, total_bytes)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (granularity, bucket_start, status, media_type, size_bucket)
+                DO UPDATE SET count = {table}.count + EXCLUDED.count,
+                              total_bytes = {table}.total_bytes + EXCLUDED.total_bytes
+                """,
+                [granularity, bucket, status, media_type, size, count, total_bytes]
+            )
+        return
+
+    with transaction.atomic():
+        rollup, created = DownloadRollup.objects.select_for_update().get_or_create(
+            granularity=granularity,
+            bucket_start=bucket,
+            status=status,
+            media_type=media_type,
+            size_bucket=size,
+            defaults={'count': count, 'total_bytes': total_bytes}
+        )
+        if not created:
+            DownloadRollup.objects.filter(pk=rollup.pk).update(
+                count=F('count') + count,
+                total_bytes=F('total_bytes') + total_bytes
+            )
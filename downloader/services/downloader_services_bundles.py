@@ -0,0 +1,71 @@
+import logging
+import posixpath
+from typing import Iterator, List
+from ..models import Download
+from ..utils.zipstream import ZipEntry, file_crc32, iter_zip
+from .eviction import MediaLease
+from .storage import SHARDED_NAME_RE
+
+logger = logging.getLogger(__name__)
+
+
+def bundle_entries(download: Download) -> List[ZipEntry]:
+    """
+    ZIP entries for every file of a download, in post order
+
+    Sizes and CRCs recorded at download time are used as is. Rows from
+    before they were recorded are read once to compute them, and the
+    result is saved so later bundles need no extra pass.
+    """
+    if not download.files and download.file_path:
+        storage = download.get_storage()
+        content = storage.open(download.file_path)
+        try:
+            crc = file_crc32(content)
+        finally:
+            content.close()
+        download.files = [{
+            'path': download.file_path,
+            'size': storage.size(download.file_path),
+            'crc32': crc,
+            'mime_type': download.mime_type,
+        }]
+        Download.objects.filter(pk=download.pk).update(files=download.files)
+
+    mtime = download.completed_at.timestamp() if download.completed_at else 0.0
+    return [
+        ZipEntry(
+            name=f'{index:02d}-{entry_filename(entry["path"])}',
+            size=entry['size'],
+            crc32=entry['crc32'],
+            mtime=mtime,
+        )
+        for index, entry in enumerate(download.files, start=1)
+    ]
+
+
+def entry_filename(name: str) -> str:
+    """Original filename of a stored file, without its shard key."""
+    if SHARDED_NAME_RE.match(name):
+        return SHARDED_NAME_RE.sub('', name)
+    return posixpath.basename(name)
+
+
+def stream_bundle(download: Download, entries: List[ZipEntry], lease: MediaLease) -> Iterator[bytes]:
+    """
+    Stream the bundle of ``entries`` and release ``lease`` when done
+
+    The lease is taken by the caller before any response is committed and
+    renewed as chunks go out, so a slow client cannot outlive it. Files are
+    opened one at a time as the archive reaches them, so memory stays at
+    one read chunk whatever the size of the post.
+    """
+    storage = download.get_storage()
+    paths = {entry.name: file['path'] for entry, file in zip(entries, download.files)}
+
+    try:
+        for chunk in iter_zip(entries, lambda entry: storage.open(paths[entry.name])):
+            lease.renew()
+            yield chunk
+    finally:
+        lease.release()
@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, Iterable
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, When
+from redis.exceptions import RedisError
+from ..models import Download
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'downloader:download_counts'
+FLUSHING_KEY = 'downloader:download_counts:flushing'
+LOCK_KEY = 'downloader:download_counts:lock'
+
+
+def get_redis():
+    """Raw Redis client from the default django-redis cache pool."""
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def increment_download_count(download_id) -> None:
+    """
+    Count one serve of a download
+
+    The increment lands in a Redis hash and is written to Postgres by
+    :func:`flush_download_counts`, so hot rows are not updated per serve.
+    Falls back to a direct UPDATE when Redis is unavailable.
+    """
+    if settings.DOWNLOAD_COUNTER_BUFFERED:
+        try:
+            get_redis().hincrby(PENDING_KEY, str(download_id), 1)
+            return
+        except RedisError:
+            logger.warning("Redis unavailable, counting download in the database", exc_info=True)
+
+    Download.objects.filter(pk=download_id).update(download_count=F('download_count') + 1)
+
+
+def pending_download_counts(download_ids: Iterable) -> Dict[str, int]:
+    """
+    Increments not yet flushed to the database, per download id
+
+    Includes a flush that is in flight so counts never appear to drop.
+    """
+    keys = [str(download_id) for download_id in download_ids]
+    if not keys or not settings.DOWNLOAD_COUNTER_BUFFERED:
+        return {}
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hmget(PENDING_KEY, keys)
+        pipe.hmget(FLUSHING_KEY, keys)
+        pending, flushing = pipe.execute()
+    except RedisError:
+        logger.warning("Redis unavailable, returning stored download counts", exc_info=True)
+        return {}
+
+    return {
+        key: int(a or 0) + int(b or 0)
+        for key, a, b in zip(keys, pending, flushing)
+        if a or b
+    }
+
+
+def live_download_counts(downloads: Iterable[Download]) -> Dict[str, int]:
+    """Stored download counts merged with pending increments."""
+    downloads = list(downloads)
+    pending = pending_download_counts(d.pk for d in downloads)
+    return {
+        str(d.pk): d.download_count + pending.get(str(d.pk), 0)
+        for d in downloads
+    }
+
+
+def flush_download_counts(batch_size: int = 1000) -> int:
+    """
+    Move buffered increments from Redis into the Download table
+
+    The pending hash is atomically renamed, applied with one bulk UPDATE
+    per batch and deleted after commit. A crash mid-flush loses at most one
+    interval of increments: a leftover hash is dropped by the next flush
+    rather than applied twice or reported on top of the stored counts.
+
+    Returns:
+        Number of increments written
+    """
+    redis = get_redis()
+    lock = redis.lock(LOCK_KEY, timeout=60, blocking_timeout=0)
+    if not lock.acquire():
+        return 0
+
+    try:
+        # Left by a flusher that died after (or during) its commit
+        redis.delete(FLUSHING_KEY)
+        if not redis.exists(PENDING_KEY):
+            return 0
+        redis.rename(PENDING_KEY, FLUSHING_KEY)
+
+        deltas = {
+            key.decode(): int(value)
+            for key, value in redis.hgetall(FLUSHING_KEY).items()
+        }
+
+        try:
+            items = list(deltas.items())
+            with transaction.atomic():
+                for start in range(0, len(items), batch_size):
+                    _apply_deltas(items[start:start + batch_size])
+        except Exception:
+            # Put the increments back so the next flush retries them
+            pipe = redis.pipeline()
+            for key, value in deltas.items():
+                pipe.hincrby(PENDING_KEY, key, value)
+            if lock.owned():
+                pipe.delete(FLUSHING_KEY)
+            pipe.execute()
+            raise
+
+        # Past the lock timeout the hash may be another flusher's by now;
+        # ours was dropped by that flusher before it renamed
+        if lock.owned():
+            redis.delete(FLUSHING_KEY)
+        else:
+            logger.warning("Download count flush outlived its lock")
+        return sum(deltas.values())
+    finally:
+        try:
+            lock.release()
+        except RedisError:
+            pass
+
+
+def _apply_deltas(items) -> None:
+    """Add each delta to its row's download_count in a single UPDATE."""
+    if not items:
+        return
+
+    if connection.vendor == 'postgresql':
+        table = Download._meta.db_table
+        values = ', '.join(['(%s::uuid, %s::integer)'] * len(items))
+        params = [value for item in items for value in item]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {table} AS d
+                SET download_count = d.download_count + v.delta
+                FROM (VALUES {values}) AS v(id, delta)
+                WHERE d.id = v.id
+                """,
+                params
+            )
+        return
+
+    Download.objects.filter(pk__in=[key for key, _ in items]).update(
+        download_count=Case(
+            *[When(pk=key, then=F('download_count') + delta) for key, delta in items],
+            default=F('download_count')
+        )
+    )
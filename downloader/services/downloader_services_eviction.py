@@ -0,0 +1,285 @@
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import Download
+from .counters import get_redis
+from .status_cache import invalidate_status
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Access-recency index: member = download id, score = last access (epoch)
+LRU_KEY = 'downloader:media_lru'
+SIZES_KEY = 'downloader:media_lru:sizes'
+BYTES_KEY = 'downloader:media_lru:bytes'
+# Sorted set per download: member = holder token, score = lease expiry (epoch)
+LEASE_KEY = 'downloader:media_lease:{}'
+
+# Add or resize an entry and keep the byte total in step, atomically.
+# KEYS = lru, sizes, bytes; ARGV = score, member, size.
+TRACK_LUA = """
+local old = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or 0)
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('INCRBY', KEYS[3], tonumber(ARGV[3]) - old)
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+"""
+
+# Take a lease and keep the set alive as long as its longest holder.
+# KEYS[1] = lease key; ARGV = ttl seconds, holder token.
+ACQUIRE_LEASE_LUA = """
+local expires = tonumber(redis.call('TIME')[1]) + tonumber(ARGV[1])
+redis.call('ZADD', KEYS[1], expires, ARGV[2])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('EXPIREAT', KEYS[1], tonumber(last[2]))
+"""
+
+# Unexpired holders per lease key. KEYS = lease keys.
+COUNT_LEASES_LUA = """
+local now = tonumber(redis.call('TIME')[1])
+local counts = {}
+for i, key in ipairs(KEYS) do
+    counts[i] = redis.call('ZCOUNT', key, '(' .. now, '+inf')
+end
+return counts
+"""
+
+# Drop entries and subtract their sizes. KEYS = lru, sizes, bytes; ARGV = members.
+UNTRACK_LUA = """
+local freed = 0
+for _, member in ipairs(ARGV) do
+    if redis.call('ZREM', KEYS[1], member) == 1 then
+        freed = freed + tonumber(redis.call('HGET', KEYS[2], member) or 0)
+        redis.call('HDEL', KEYS[2], member)
+    end
+end
+redis.call('DECRBY', KEYS[3], freed)
+return freed
+"""
+
+
+def track_media(download_id, size: int) -> None:
+    """Add a freshly written file to the recency index."""
+    get_redis().eval(TRACK_LUA, 3, LRU_KEY, SIZES_KEY, BYTES_KEY, time.time(), str(download_id), size or 0)
+
+
+def touch_media(download_id) -> None:
+    """Mark a file as just served; unknown ids are ignored."""
+    get_redis().zadd(LRU_KEY, {str(download_id): time.time()}, xx=True)
+
+
+def untrack_media(download_ids: Iterable) -> int:
+    """Remove entries from the index; returns the bytes they accounted for."""
+    members = [str(download_id) for download_id in download_ids]
+    if not members:
+        return 0
+    return int(get_redis().eval(UNTRACK_LUA, 3, LRU_KEY, SIZES_KEY, BYTES_KEY, *members))
+
+
+class MediaLease:
+    """
+    Eviction lease on one download's files, held by a single reader
+
+    Each holder has its own entry that expires after ``ttl`` seconds, so a
+    crashed holder cannot pin a file forever and a holder that outlives its
+    lease cannot release anyone else's. Long readers call :meth:`renew`.
+    """
+
+    def __init__(self, download_id, ttl: Optional[int] = None):
+        self.download_id = download_id
+        self.ttl = ttl or settings.MEDIA_LEASE_SECONDS
+        self.key = LEASE_KEY.format(download_id)
+        self.token = uuid.uuid4().hex
+        self._renewed_at = 0.0
+
+    def acquire(self) -> bool:
+        """Take the lease; False if the file was already evicted."""
+        self._take()
+        # Checked after taking the lease; see _evict_batch for the other half
+        return not Download.objects.filter(pk=self.download_id, evicted_at__isnull=False).exists()
+
+    def renew(self) -> None:
+        """Push the expiry out again once a third of the TTL has passed."""
+        if time.monotonic() - self._renewed_at >= self.ttl / 3:
+            self._take()
+
+    def release(self) -> None:
+        get_redis().zrem(self.key, self.token)
+
+    def _take(self) -> None:
+        get_redis().eval(ACQUIRE_LEASE_LUA, 1, self.key, self.ttl, self.token)
+        self._renewed_at = time.monotonic()
+
+
+@contextmanager
+def media_lease(download_id, ttl: Optional[int] = None):
+    """
+    Protect a file from eviction while it is read or rewritten in-process
+
+    Yields False if the file was already evicted. See :class:`MediaLease`.
+    """
+    lease = MediaLease(download_id, ttl)
+    try:
+        yield lease.acquire()
+    finally:
+        lease.release()
+
+
+def leased_media(download_ids: Iterable) -> Set[str]:
+    """Ids among ``download_ids`` that currently have a live lease."""
+    members = [str(download_id) for download_id in download_ids]
+    if not members:
+        return set()
+    counts = get_redis().eval(
+        COUNT_LEASES_LUA, len(members), *[LEASE_KEY.format(m) for m in members]
+    )
+    return {m for m, count in zip(members, counts) if int(count)}
+
+
+def usage_bytes() -> int:
+    """Bytes of media accounted for by the index, rebuilding it if lost."""
+    redis = get_redis()
+    value = redis.get(BYTES_KEY)
+    if value is None:
+        rebuild_index()
+        value = redis.get(BYTES_KEY)
+    return int(value or 0)
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """
+    Seed the recency index from the database
+
+    Used when Redis lost the index. Rows are scored by completion time,
+    so previously served files lose their recency but order stays sane.
+    """
+    redis = get_redis()
+    redis.delete(LRU_KEY, SIZES_KEY)
+    redis.set(BYTES_KEY, 0)
+
+    rows = (
+        Download.objects
+        .filter(
+            status=Download.Status.COMPLETED,
+            storage_tier=Download.StorageTier.HOT,
+            evicted_at__isnull=True
+        )
+        .exclude(file_path='')
+        .only('id', 'file_size', 'files', 'completed_at')
+    )
+    indexed = 0
+    pipe = redis.pipeline(transaction=False)
+    for download in rows.iterator(chunk_size=batch_size):
+        score = download.completed_at.timestamp() if download.completed_at else 0
+        pipe.eval(TRACK_LUA, 3, LRU_KEY, SIZES_KEY, BYTES_KEY, score, str(download.pk), download.total_size)
+        indexed += 1
+        if indexed % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+    return indexed
+
+
+def evict_media(quota: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Evict least-recently-used files until usage is under the low watermark
+
+    Nothing happens until usage exceeds the high watermark. Candidates are
+    read from the head of the recency index, so no directory is walked.
+    Files touched within ``MEDIA_EVICTION_MIN_IDLE`` seconds (which covers
+    serves in progress and files just written) and files under a lease
+    are skipped.
+
+    Returns:
+        Dict with usage before, bytes freed and files evicted
+    """
+    quota = settings.MEDIA_QUOTA_BYTES if quota is None else quota
+    usage = usage_bytes()
+    result = {'usage': usage, 'freed': 0, 'evicted': 0}
+    if not quota or usage <= quota * settings.MEDIA_QUOTA_HIGH_WATERMARK:
+        return result
+
+    target = quota * settings.MEDIA_QUOTA_LOW_WATERMARK
+    idle_before = time.time() - settings.MEDIA_EVICTION_MIN_IDLE
+    batch_size = settings.MEDIA_EVICTION_BATCH_SIZE
+    redis = get_redis()
+    offset = 0
+
+    while usage - result['freed'] > target:
+        members = redis.zrangebyscore(LRU_KEY, '-inf', idle_before, start=offset, num=batch_size)
+        if not members:
+            break
+        members = [m.decode() if isinstance(m, bytes) else m for m in members]
+
+        evicted, skipped = _evict_batch(members, dry_run)
+        if dry_run:
+            freed = sum(int(size or 0) for size in redis.hmget(SIZES_KEY, evicted)) if evicted else 0
+            offset += len(members)
+        else:
+            # Evicted and stale entries left the index; skipped ones stay ahead
+            freed = untrack_media(evicted)
+            offset += len(skipped)
+        result['freed'] += freed
+        result['evicted'] += len(evicted)
+
+    logger.info(f"Media eviction freed {result['freed']} bytes from {result['evicted']} files")
+    return result
+
+
+def _evict_batch(members: List[str], dry_run: bool):
+    """
+    Evict one batch of candidates; returns (evicted ids, skipped ids)
+
+    A row is first marked evicted, then leases are checked again: a reader
+    either sees the mark when it takes its lease or its lease is seen here
+    and the mark is undone, so a leased file is never deleted.
+    """
+    leased = leased_media(members)
+    candidates = [m for m in members if m not in leased]
+    skipped = [m for m in members if m in leased]
+
+    valid = set(
+        str(pk) for pk in Download.objects
+        .filter(
+            pk__in=candidates,
+            status=Download.Status.COMPLETED,
+            storage_tier=Download.StorageTier.HOT,
+            evicted_at__isnull=True
+        )
+        .values_list('pk', flat=True)
+    )
+    stale = [m for m in candidates if m not in valid]
+    if stale and not dry_run:
+        untrack_media(stale)
+    if dry_run:
+        return [m for m in candidates if m in valid], skipped + stale
+
+    with transaction.atomic():
+        rows = list(
+            Download.objects
+            .filter(pk__in=valid, evicted_at__isnull=True)
+            .select_for_update(skip_locked=True)
+            .only('id', 'file_path', 'files')
+        )
+        Download.objects.filter(pk__in=[row.pk for row in rows]).update(evicted_at=timezone.now())
+
+    claimed = [str(row.pk) for row in rows]
+    locked = [m for m in valid if m not in claimed]
+    leased_now = leased_media(claimed)
+    if leased_now:
+        Download.objects.filter(pk__in=leased_now).update(evicted_at=None)
+
+    storage = get_storage()
+    evicted = []
+    for row in rows:
+        if str(row.pk) in leased_now:
+            continue
+        for name in row.stored_names():
+            storage.delete(name)
+        invalidate_status(row.pk)
+        evicted.append(str(row.pk))
+
+    return evicted, skipped + locked + list(leased_now)
@@ -5,6 +5,7 @@ import logging
 from typing import Dict, Optional, List
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+from .metrics import PAGE_FETCH, PARSE, stage
 
 logger = logging.getLogger(__name__)
 
@@ -42,27 +43,29 @@ class MediaExtractor:
             Dict: Media information including URLs and metadata
         """
         try:
-            async with self.session.get(url, headers=self.headers) as response:
-                if response.status != 200:
-                    raise ValueError(f"Failed to fetch URL: {response.status}")
+            with stage(PAGE_FETCH):
+                async with self.session.get(url, headers=self.headers) as response:
+                    if response.status != 200:
+                        raise ValueError(f"Failed to fetch URL: {response.status}")
 
-                html = await response.text()
-                
+                    html = await response.text()
+
+            with stage(PARSE):
                 # Parse page content
                 soup = BeautifulSoup(html, 'html.parser')
-                
+
                 # Try to find media data in page
                 media_data = self._extract_media_data(soup)
-                if not media_data:
-                    raise ValueError("No media data found")
-
-                return {
-                    'type': media_data.get('type', 'image'),
-                    'urls': media_data.get('urls', []),
-                    'thumbnail': media_data.get('thumbnail'),
-                    'caption': media_data.get('caption'),
-                    'timestamp': media_data.get('timestamp')
-                }
+            if not media_data:
+                raise ValueError("No media data found")
+
+            return {
+                'type': media_data.get('type', 'image'),
+                'urls': media_data.get('urls', []),
+                'thumbnail': media_data.get('thumbnail'),
+                'caption': media_data.get('caption'),
+                'timestamp': media_data.get('timestamp')
+            }
 
         except Exception as e:
             logger.error(f"Error extracting media info: {str(e)}")
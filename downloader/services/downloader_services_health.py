@@ -0,0 +1,147 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Tuple
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Long-lived threads keep their own pooled DB connection between probes
+_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix='readiness')
+# Last submission per check; a hung check keeps its thread until it returns
+_running: Dict[str, Future] = {}
+# Redis URL -> client with socket timeouts bounded by HEALTH_CHECK_TIMEOUT
+_redis_clients = {}
+_cache_lock = threading.Lock()
+_cached: Tuple[float, Dict] = (0.0, {})
+
+
+def check_database() -> Dict:
+    connection = connections['default']
+    timeout_ms = int(settings.HEALTH_CHECK_TIMEOUT * 1000)
+    # SET LOCAL, so a pooled connection goes back with its usual timeout
+    with transaction.atomic(using='default'), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL statement_timeout = %s', [timeout_ms])
+        cursor.execute('SELECT 1')
+    connection.close_if_unusable_or_obsolete()
+    return {'ok': True}
+
+
+def check_redis() -> Dict:
+    _redis_client(settings.CACHES['default']['LOCATION']).ping()
+    return {'ok': True}
+
+
+def check_media() -> Dict:
+    media_path = os.path.join(settings.MEDIA_ROOT, 'downloads')
+    os.makedirs(media_path, exist_ok=True)
+    writable = os.access(media_path, os.W_OK)
+    free = shutil.disk_usage(media_path).free
+    return {
+        'ok': writable and free >= settings.HEALTH_MIN_DISK_FREE_BYTES,
+        'writable': writable,
+        'disk_free_bytes': free,
+    }
+
+
+def queue_depth(queue: str = 'downloads') -> int:
+    """Messages waiting in a broker queue (not yet prefetched by a worker)."""
+    return _redis_client(settings.CELERY_BROKER_URL).llen(queue)
+
+
+def check_queue() -> Dict:
+    depth = queue_depth()
+    limit = settings.HEALTH_MAX_QUEUE_DEPTH
+    return {'ok': not limit or depth <= limit, 'depth': depth}
+
+
+CHECKS: Dict[str, Callable[[], Dict]] = {
+    'database': check_database,
+    'redis': check_redis,
+    'media': check_media,
+    'queue': check_queue,
+}
+
+
+def run_checks() -> Dict:
+    """
+    Run every readiness check concurrently, each bounded by a timeout
+
+    A check that raises or does not finish in time is reported as failed
+    with the reason instead of delaying the probe. A check still stuck
+    from an earlier run is not submitted again, so one hung dependency
+    holds at most one thread and cannot starve the other checks.
+    """
+    timeout = settings.HEALTH_CHECK_TIMEOUT
+    started = time.monotonic()
+    futures = {}
+    results = {}
+    for name, check in CHECKS.items():
+        previous = _running.get(name)
+        if previous is not None and not previous.done():
+            results[name] = {'ok': False, 'error': 'still running from an earlier probe'}
+            continue
+        futures[name] = _running[name] = _executor.submit(_timed, check)
+    wait(futures.values(), timeout=timeout)
+
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = {'ok': False, 'error': f'timed out after {timeout}s'}
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as exc:
+            logger.warning(f"Readiness check {name} failed: {exc}")
+            results[name] = {'ok': False, 'error': str(exc)}
+
+    return {
+        'status': 'healthy' if all(r['ok'] for r in results.values()) else 'unhealthy',
+        'checks': {name: results[name] for name in CHECKS},
+        'duration_ms': round((time.monotonic() - started) * 1000, 2),
+    }
+
+
+def get_readiness() -> Dict:
+    """
+    Readiness report, recomputed at most once per HEALTH_CHECK_CACHE_TTL
+
+    Concurrent probes that arrive while a run is in progress wait for it
+    and share its result rather than starting their own.
+    """
+    global _cached
+    ttl = settings.HEALTH_CHECK_CACHE_TTL
+
+    checked_at, report = _cached
+    if report and time.monotonic() - checked_at < ttl:
+        return report
+
+    with _cache_lock:
+        checked_at, report = _cached
+        if report and time.monotonic() - checked_at < ttl:
+            return report
+        report = run_checks()
+        _cached = (time.monotonic(), report)
+        return report
+
+
+def _redis_client(url: str):
+    client = _redis_clients.get(url)
+    if client is None:
+        from redis import Redis
+        client = _redis_clients[url] = Redis.from_url(
+            url,
+            socket_timeout=settings.HEALTH_CHECK_TIMEOUT,
+            socket_connect_timeout=settings.HEALTH_CHECK_TIMEOUT
+        )
+    return client
+
+
+def _timed(check: Callable[[], Dict]) -> Dict:
+    start = time.monotonic()
+    result = check()
+    result['latency_ms'] = round((time.monotonic() - start) * 1000, 2)
+    return result
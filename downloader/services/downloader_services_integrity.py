@@ -0,0 +1,217 @@
+import logging
+from typing import Dict, Optional
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..models import Download
+from ..utils.digest import digest_file
+from .counters import get_redis
+from .eviction import media_lease
+from .status_cache import invalidate_status
+
+logger = logging.getLogger(__name__)
+
+# download id -> "size:mtime|..." of its files when their digests last matched
+VERIFIED_KEY = 'downloader:verified'
+SCRUB_STATS_KEY = 'downloader:scrub_stats'
+VERIFY_QUEUED_KEY = 'downloader:verify_queued:{}'
+
+
+def digested_files(download: Download):
+    """File entries that carry a digest; older entries have none."""
+    return [entry for entry in download.files or [] if 'sha256' in entry]
+
+
+def fingerprint(download: Download) -> str:
+    """Size and mtime of every digested file, from storage metadata only."""
+    storage = download.get_storage()
+    parts = []
+    for entry in digested_files(download):
+        size, mtime = storage.stat(entry['path'])
+        parts.append(f'{size}:{mtime:.6f}')
+    return '|'.join(parts)
+
+
+def remember_verified(download: Download) -> None:
+    """Record that the files as they are now match their digests."""
+    get_redis().hset(VERIFIED_KEY, str(download.pk), fingerprint(download))
+
+
+def check_integrity(download: Download) -> Optional[bool]:
+    """
+    Cheap serve-time integrity check
+
+    Stats the files instead of hashing them: a size other than the
+    recorded one is flagged as corrupt at once. Unchanged size and mtime
+    since the last verification means the digest still holds. Anything
+    else (a moved or touched file, a lost cache) needs a full
+    :func:`verify_media`, which callers run in the background while the
+    file keeps being served. So does a missing file: ``download`` may have
+    been loaded just before a tier move or an eviction, so only
+    :func:`verify_media` decides that under a lease.
+
+    Returns:
+        True if verified, None if it needs rehashing, False if corrupt
+    """
+    entries = digested_files(download)
+    if not entries:
+        # Downloaded before digests were kept; nothing to check against
+        return True
+
+    storage = download.get_storage()
+    parts = []
+    for entry in entries:
+        try:
+            size, mtime = storage.stat(entry['path'])
+        except FileNotFoundError:
+            return None
+        if size != entry['size']:
+            flag_corrupt(download, f"{entry['path']} is {size} bytes, expected {entry['size']}")
+            return False
+        parts.append(f'{size}:{mtime:.6f}')
+
+    cached = get_redis().hget(VERIFIED_KEY, str(download.pk))
+    if cached is not None and (cached.decode() if isinstance(cached, bytes) else cached) == '|'.join(parts):
+        return True
+    return None
+
+
+def claim_verification(download_id) -> bool:
+    """True for the first caller to ask for a rehash while none is pending."""
+    return bool(get_redis().set(
+        VERIFY_QUEUED_KEY.format(download_id), 1, nx=True, ex=settings.MEDIA_LEASE_SECONDS
+    ))
+
+
+def release_verification(download_id) -> None:
+    """Drop a claim whose rehash could not be queued, so it is asked again."""
+    get_redis().delete(VERIFY_QUEUED_KEY.format(download_id))
+
+
+def verify_media(download_id) -> Optional[bool]:
+    """
+    Rehash every file of a download and compare size and SHA-256
+
+    The files are leased so eviction and tier moves cannot remove them
+    mid-read. A missing file is only flagged if the row still points at
+    it; otherwise it was moved or evicted since the row was loaded.
+
+    Returns:
+        True if intact, False if flagged corrupt, None if not verifiable
+    """
+    download = (
+        Download.objects
+        .filter(
+            pk=download_id,
+            status=Download.Status.COMPLETED,
+            evicted_at__isnull=True,
+            corrupted_at__isnull=True
+        )
+        .only('id', 'files', 'file_path', 'storage_tier')
+        .first()
+    )
+    entries = digested_files(download) if download else []
+    if not entries:
+        return None
+
+    storage = download.get_storage()
+    with media_lease(download.pk) as available:
+        if not available:
+            return None
+        for entry in entries:
+            try:
+                content = storage.open(entry['path'])
+            except FileNotFoundError:
+                if not _still_stored(download):
+                    return None
+                flag_corrupt(download, f"{entry['path']} is missing")
+                return False
+            try:
+                digest = digest_file(content)
+            finally:
+                content.close()
+            if digest.size != entry['size'] or digest.sha256 != entry['sha256']:
+                flag_corrupt(download, f"{entry['path']} does not match its digest")
+                return False
+
+        remember_verified(download)
+
+    Download.objects.filter(pk=download.pk).update(verified_at=timezone.now())
+    get_redis().delete(VERIFY_QUEUED_KEY.format(download.pk))
+    return True
+
+
+def _still_stored(download: Download) -> bool:
+    """True if the row still names the same files in the same tier, unevicted."""
+    return Download.objects.filter(
+        pk=download.pk,
+        storage_tier=download.storage_tier,
+        file_path=download.file_path,
+        evicted_at__isnull=True
+    ).exists()
+
+
+def flag_corrupt(download: Download, reason: str) -> None:
+    """Mark a download's files as corrupt so they are no longer served."""
+    flagged = Download.objects.filter(
+        pk=download.pk, corrupted_at__isnull=True
+    ).update(corrupted_at=timezone.now())
+    if not flagged:
+        return
+
+    get_redis().hdel(VERIFIED_KEY, str(download.pk))
+    get_redis().hincrby(SCRUB_STATS_KEY, 'corrupt', 1)
+    invalidate_status(download.pk)
+    logger.error(
+        "Stored media failed its integrity check: %s",
+        reason,
+        extra={'download_id': str(download.pk)}
+    )
+
+
+def scrub_media(
+    batch_size: Optional[int] = None,
+    max_bytes: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Re-verify the files that have gone longest without a check
+
+    Each run rehashes at most ``batch_size`` downloads and stops once
+    ``max_bytes`` have been read, so the scrubber's I/O is bounded per
+    MEDIA_SCRUB_INTERVAL. Never-verified rows go first; repeated runs
+    sweep the whole store.
+
+    Returns:
+        Dict with checked, corrupt and bytes counts
+    """
+    batch_size = batch_size or settings.MEDIA_SCRUB_BATCH_SIZE
+    max_bytes = settings.MEDIA_SCRUB_MAX_BYTES if max_bytes is None else max_bytes
+    result = {'checked': 0, 'corrupt': 0, 'bytes': 0}
+
+    candidates = (
+        Download.objects
+        .filter(
+            status=Download.Status.COMPLETED,
+            evicted_at__isnull=True,
+            corrupted_at__isnull=True
+        )
+        .exclude(content_digest='')
+        .order_by(F('verified_at').asc(nulls_first=True))
+        .only('id', 'files', 'file_size')[:batch_size]
+    )
+    for download in candidates:
+        if max_bytes and result['bytes'] >= max_bytes:
+            break
+        outcome = verify_media(download.pk)
+        if outcome is None:
+            continue
+        result['checked'] += 1
+        result['bytes'] += download.total_size
+        if outcome is False:
+            result['corrupt'] += 1
+
+    pipe = get_redis().pipeline()
+    pipe.hincrby(SCRUB_STATS_KEY, 'checked', result['checked'])
+    pipe.hincrby(SCRUB_STATS_KEY, 'bytes', result['bytes'])
+    pipe.execute()
+    return result
@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a cached API hit (ms) up to a slow 100 MB transfer
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+STAGE_SECONDS = Histogram(
+    'downloader_stage_seconds',
+    'Time spent per pipeline stage',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    'downloader_stage_errors_total',
+    'Pipeline stages that raised, by exception class',
+    ['stage', 'error_class']
+)
+BYTES_TRANSFERRED = Counter(
+    'downloader_bytes_transferred_total',
+    'Media bytes fetched from the CDN and stored'
+)
+DOWNLOADS = Counter(
+    'downloader_downloads_total',
+    'Finished downloads by outcome and exception class',
+    ['outcome', 'error_class']
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    'downloader_queue_wait_seconds',
+    'Time from publishing a task to a worker starting it',
+    ['task'],
+    buckets=LATENCY_BUCKETS
+)
+TASK_SECONDS = Histogram(
+    'downloader_task_seconds',
+    'Task run time by final state',
+    ['task', 'state'],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'downloader_http_request_seconds',
+    'API request latency by URL name, method and status class',
+    ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+
+# Stage names, so dashboards and code agree
+PAGE_FETCH = 'page_fetch'
+PARSE = 'parse'
+CDN_CONNECT = 'cdn_connect'
+TRANSFER = 'transfer'
+STORAGE_WRITE = 'storage_write'
+POSTPROCESS = 'postprocess'
+DB_UPDATE = 'db_update'
+
+
+def error_class(exc: Optional[BaseException]) -> str:
+    return type(exc).__name__ if exc is not None else ''
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as pipeline stage ``name``; exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as exc:
+        STAGE_ERRORS.labels(name, error_class(exc)).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Record a stage timed by the caller, e.g. summed over many chunks."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Registry to export from
+
+    With PROMETHEUS_MULTIPROC_DIR set (Gunicorn and Celery prefork), every
+    process writes its samples to memory-mapped files in that directory
+    and a fresh registry aggregates all of them on each scrape; otherwise
+    the in-process default registry is used.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, and its content type."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop live gauges of an exited worker process (multiprocess mode only)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
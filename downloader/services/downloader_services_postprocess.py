@@ -0,0 +1,47 @@
+import os
+import uuid
+import logging
+from ..utils.faststart import FaststartError, faststart, needs_faststart
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def faststart_mp4(name: str) -> bool:
+    """
+    Move the ``moov`` atom of a stored MP4 to the front, in place
+
+    The remuxed copy is written next to the partial transfers and swapped
+    in with ``os.replace``, so readers see either the old or new file.
+    Only local storage is rewritten; files that cannot be parsed are kept
+    as they are.
+
+    Returns:
+        Whether the file was rewritten
+    """
+    storage = get_storage()
+    path = storage.path(name)
+    if path is None:
+        return False
+
+    with open(path, 'rb') as src:
+        try:
+            if not needs_faststart(src):
+                return False
+        except FaststartError as exc:
+            logger.warning(f"Skipping faststart for {name}: {exc}")
+            return False
+
+        tmp_path = os.path.join(storage.partial_dir(), f'{uuid.uuid4().hex}.part')
+        try:
+            with open(tmp_path, 'wb') as dst:
+                faststart(src, dst)
+            os.replace(tmp_path, path)
+        except FaststartError as exc:
+            logger.warning(f"Skipping faststart for {name}: {exc}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return True
@@ -0,0 +1,192 @@
+import io
+import time
+import hashlib
+import logging
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+import requests
+from django.conf import settings
+from ..models import Download
+from .counters import get_redis
+from .eviction import media_lease
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_PREFIX = 'previews'
+PREVIEW_FORMAT = 'JPEG'
+PREVIEW_QUALITY = 82
+PREVIEW_QUEUED_KEY = 'downloader:preview_queued:{}:{}'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_preview(
+    data: bytes,
+    size: Tuple[int, int],
+    timings: bool = False,
+    draft: bool = True
+):
+    """
+    Decode an image and scale it to fit ``size``; runs in a pool process
+
+    For JPEGs ``draft`` makes libjpeg decode at the smallest DCT scale
+    (1/2, 1/4 or 1/8) that still covers ``size``, so a 4000px photo is
+    never fully decoded to produce a 320px preview.
+
+    Returns:
+        The encoded preview, or (preview, decode seconds, resize seconds)
+        when ``timings`` is set
+    """
+    from PIL import Image, ImageOps
+
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    if draft and image.format == 'JPEG':
+        image.draft('RGB', size)
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    decoded = time.perf_counter()
+
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+    output = io.BytesIO()
+    image.save(output, PREVIEW_FORMAT, quality=PREVIEW_QUALITY, optimize=True)
+    resized = time.perf_counter()
+
+    if timings:
+        return output.getvalue(), decoded - started, resized - decoded
+    return output.getvalue()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Per-process pool of at most MEDIA_PREVIEW_WORKERS decoder processes."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=settings.MEDIA_PREVIEW_WORKERS)
+    return _pool
+
+
+def run_in_pool(fn, *args):
+    """
+    Run ``fn(*args)`` in the decoder pool and wait up to MEDIA_PREVIEW_TIMEOUT
+
+    A pool whose child died (OOM on a huge image, a decoder crash) refuses
+    all further work, so it is replaced and the call retried once.
+    """
+    global _pool
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            return pool.submit(fn, *args).result(timeout=settings.MEDIA_PREVIEW_TIMEOUT)
+        except BrokenProcessPool:
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            pool.shutdown(wait=False)
+            if attempt:
+                raise
+            logger.warning("Preview pool broke, starting a new one")
+
+
+def preview_name(content_hash: str, variant: str) -> str:
+    """Previews are keyed by source content, so duplicates share them."""
+    return posixpath.join(PREVIEW_PREFIX, content_hash[:2], content_hash, f'{variant}.jpg')
+
+
+def generate_previews(download_id, variants=None) -> Dict[str, str]:
+    """
+    Render ``variants`` (default MEDIA_PREVIEW_EAGER) for a download
+
+    The source is the downloaded image, or the thumbnail the extractor
+    reported for videos. Previews are stored under the SHA-256 of that
+    source, so variants already cached for the same content are reused.
+
+    Returns:
+        Dict of variant name to storage name
+    """
+    download = Download.objects.filter(pk=download_id).only(
+        'id', 'file_path', 'mime_type', 'thumbnail_url', 'preview_hash',
+        'storage_tier', 'evicted_at'
+    ).first()
+    if download is None:
+        return {}
+
+    variants = settings.MEDIA_PREVIEW_EAGER if variants is None else variants
+    source: Optional[bytes] = None
+    if not download.preview_hash:
+        source = read_source(download)
+        if source is None:
+            return {}
+        download.preview_hash = hashlib.sha256(source).hexdigest()
+        Download.objects.filter(pk=download.pk).update(preview_hash=download.preview_hash)
+
+    storage = get_storage()
+    result = {}
+    for variant in variants:
+        name = preview_name(download.preview_hash, variant)
+        if not storage.exists(name):
+            if source is None:
+                source = read_source(download)
+                if source is None:
+                    break
+            data = run_in_pool(render_preview, source, settings.MEDIA_PREVIEW_SIZES[variant])
+            storage.save(name, io.BytesIO(data))
+        result[variant] = name
+    return result
+
+
+def cached_preview(download: Download, variant: str) -> Optional[str]:
+    """Storage name of an already rendered preview variant, if any."""
+    if not download.preview_hash:
+        return None
+    name = preview_name(download.preview_hash, variant)
+    return name if get_storage().exists(name) else None
+
+
+def claim_preview(download_id, variant: str) -> bool:
+    """True for the first caller to ask for a variant while none is queued."""
+    return bool(get_redis().set(
+        PREVIEW_QUEUED_KEY.format(download_id, variant), 1, nx=True, ex=settings.MEDIA_PREVIEW_TIMEOUT
+    ))
+
+
+def has_source(download: Download) -> bool:
+    """True when there is an image or a thumbnail to render previews from."""
+    return bool(
+        (download.file_path and (download.mime_type or '').startswith('image/'))
+        or download.thumbnail_url
+    )
+
+
+def read_source(download: Download) -> Optional[bytes]:
+    """Bytes to render previews from; None when there is nothing to render."""
+    if download.file_path and (download.mime_type or '').startswith('image/'):
+        with media_lease(download.pk) as available:
+            if not available:
+                return None
+            content = download.get_storage().open(download.file_path)
+            try:
+                return content.read()
+            finally:
+                content.close()
+
+    if download.thumbnail_url:
+        try:
+            response = requests.get(download.thumbnail_url, timeout=settings.DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        except requests.RequestException:
+            logger.warning(
+                "Failed to fetch thumbnail for previews",
+                exc_info=True,
+                extra={'download_id': str(download.pk)}
+            )
+    return None
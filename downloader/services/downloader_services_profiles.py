@@ -0,0 +1,192 @@
+import io
+import time
+import hashlib
+import logging
+import posixpath
+from typing import Dict, Optional
+from django.conf import settings
+from ..models import Download
+from .counters import get_redis
+from .previews import read_source, run_in_pool
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PREFIX = 'profiles'
+STATS_KEY = 'downloader:profile_stats:{}'
+# (content hash, profile) pairs whose re-encode was not smaller than the original
+SKIPPED_KEY = 'downloader:profile_skipped'
+PROFILE_QUEUED_KEY = 'downloader:profile_queued:{}:{}'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def encode_profile(data: bytes, profile: Dict):
+    """
+    Re-encode an image for a delivery profile; runs in a pool process
+
+    Animated images are not re-encoded: saving one frame would drop the
+    animation.
+
+    Returns:
+        (encoded bytes or None if animated, CPU seconds spent in this process)
+    """
+    from PIL import Image, ImageOps
+
+    started = time.process_time()
+    image = Image.open(io.BytesIO(data))
+    if getattr(image, 'n_frames', 1) > 1:
+        return None, time.process_time() - started
+    max_edge = profile.get('max_edge')
+    if max_edge and image.format == 'JPEG':
+        image.draft('RGB', (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+
+    fmt = profile['format']
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if max_edge and max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+
+    output = io.BytesIO()
+    options = {'quality': profile['quality']} if 'quality' in profile else {}
+    if fmt == 'WEBP':
+        options['method'] = profile.get('method', 4)
+    else:
+        options['optimize'] = True
+    image.save(output, fmt, **options)
+    return output.getvalue(), time.process_time() - started
+
+
+def select_profile(request, mime_type: str) -> Optional[str]:
+    """
+    Delivery profile requested by ``?profile=`` or, failing that, by Accept
+
+    Clients that accept WebP get ``MEDIA_WEBP_ACCEPT_PROFILE`` when one is
+    configured. ``?profile=original`` opts out. Only still images are
+    re-encoded; GIFs keep their animation.
+    """
+    if not profile_supported(mime_type):
+        return None
+    requested = request.GET.get('profile')
+    if requested:
+        return requested if requested in settings.MEDIA_DELIVERY_PROFILES else None
+
+    accept_profile = settings.MEDIA_WEBP_ACCEPT_PROFILE
+    if accept_profile and 'image/webp' in request.headers.get('Accept', ''):
+        return accept_profile
+    return None
+
+
+def profile_supported(mime_type: Optional[str]) -> bool:
+    mime_type = mime_type or ''
+    return mime_type.startswith('image/') and mime_type != 'image/gif'
+
+
+def profile_name(content_hash: str, profile: str) -> str:
+    fmt = settings.MEDIA_DELIVERY_PROFILES[profile]['format']
+    return posixpath.join(
+        PROFILE_PREFIX, content_hash[:2], content_hash, f'{profile}.{EXTENSIONS[fmt]}'
+    )
+
+
+def cached_profile(download: Download, profile: str) -> Optional[str]:
+    """Storage name of an already rendered profile, if any."""
+    if not download.preview_hash:
+        return None
+    name = profile_name(download.preview_hash, profile)
+    return name if get_storage().exists(name) else None
+
+
+def profile_skipped(download: Download, profile: str) -> bool:
+    """True when re-encoding this content was tried and did not pay off."""
+    if not download.preview_hash:
+        return False
+    return bool(get_redis().sismember(SKIPPED_KEY, f'{download.preview_hash}:{profile}'))
+
+
+def claim_profile(download_id, profile: str) -> bool:
+    """True for the first caller to ask for a profile while none is queued."""
+    return bool(get_redis().set(
+        PROFILE_QUEUED_KEY.format(download_id, profile), 1, nx=True, ex=settings.MEDIA_PREVIEW_TIMEOUT
+    ))
+
+
+def release_profile(download_id, profile: str) -> None:
+    """Drop a claim whose render could not be queued, so it is asked again."""
+    get_redis().delete(PROFILE_QUEUED_KEY.format(download_id, profile))
+
+
+def render_profile(download_id, profile: str) -> Optional[str]:
+    """
+    Render and cache ``profile`` for a downloaded image
+
+    Output is stored per (content hash, profile), so identical content is
+    encoded once. Input and output bytes and CPU time are accumulated per
+    profile for :func:`profile_stats`. When the re-encode would be larger
+    than the original, or the image is animated, nothing is stored and the
+    original keeps being served.
+
+    Returns:
+        Storage name of the rendered file, or None
+    """
+    download = Download.objects.filter(pk=download_id).only(
+        'id', 'file_path', 'mime_type', 'thumbnail_url', 'preview_hash',
+        'storage_tier', 'evicted_at'
+    ).first()
+    if download is None or not profile_supported(download.mime_type):
+        return None
+
+    if download.preview_hash:
+        name = profile_name(download.preview_hash, profile)
+        if get_storage().exists(name):
+            return name
+
+    source = read_source(download)
+    if source is None:
+        return None
+    if not download.preview_hash:
+        download.preview_hash = hashlib.sha256(source).hexdigest()
+        Download.objects.filter(pk=download.pk).update(preview_hash=download.preview_hash)
+
+    data, cpu_seconds = run_in_pool(encode_profile, source, settings.MEDIA_DELIVERY_PROFILES[profile])
+    if data is None:
+        # Animated; the original is always served
+        get_redis().sadd(SKIPPED_KEY, f'{download.preview_hash}:{profile}')
+        return None
+
+    pipe = get_redis().pipeline()
+    key = STATS_KEY.format(profile)
+    pipe.hincrby(key, 'renders', 1)
+    pipe.hincrby(key, 'bytes_in', len(source))
+    pipe.hincrby(key, 'bytes_out', min(len(data), len(source)))
+    pipe.hincrbyfloat(key, 'cpu_seconds', cpu_seconds)
+    pipe.execute()
+
+    if len(data) >= len(source):
+        get_redis().sadd(SKIPPED_KEY, f'{download.preview_hash}:{profile}')
+        return None
+
+    name = profile_name(download.preview_hash, profile)
+    get_storage().save(name, io.BytesIO(data))
+    return name
+
+
+def profile_stats() -> Dict[str, Dict]:
+    """Per profile: renders, size reduction and mean CPU time per render."""
+    redis = get_redis()
+    stats = {}
+    for profile in settings.MEDIA_DELIVERY_PROFILES:
+        raw = {
+            (k.decode() if isinstance(k, bytes) else k): float(v)
+            for k, v in redis.hgetall(STATS_KEY.format(profile)).items()
+        }
+        renders = int(raw.get('renders', 0))
+        bytes_in = raw.get('bytes_in', 0)
+        stats[profile] = {
+            'renders': renders,
+            'bytes_in': int(bytes_in),
+            'bytes_out': int(raw.get('bytes_out', 0)),
+            'size_reduction': 1 - raw.get('bytes_out', 0) / bytes_in if bytes_in else None,
+            'cpu_ms_per_render': raw.get('cpu_seconds', 0) * 1000 / renders if renders else None,
+        }
+    return stats
@@ -0,0 +1,150 @@
+import os
+import sys
+import hmac
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread
+
+    A daemon thread reads the target thread's current frame every
+    ``interval`` seconds and counts the stack it is in; the profiled code
+    itself runs uninstrumented, so the cost is the sampler's own wake-ups
+    (well under 1% of a core at the default 100 Hz). Stacks are kept in
+    the collapsed format (``outer;inner;leaf count``) that flamegraph.pl,
+    speedscope and similar tools read directly.
+    """
+
+    def __init__(self, interval: Optional[float] = None, thread_id: Optional[int] = None):
+        self.interval = interval or settings.PROFILING_INTERVAL
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self) -> 'SamplingProfiler':
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self) -> 'SamplingProfiler':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def collapse(frame) -> str:
+    """``outer;...;leaf`` for the stack ending at ``frame``."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def should_profile(requested: bool = False) -> bool:
+    """Profile this unit of work: explicitly asked for, or sampled at PROFILING_SAMPLE_RATE."""
+    if not settings.PROFILING_ENABLED:
+        return False
+    return requested or random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def request_wants_profile(request) -> bool:
+    """True when the request carries the configured PROFILING_TOKEN in X-Profile."""
+    token = settings.PROFILING_TOKEN
+    if not token:
+        return False
+    # Bytes, since compare_digest rejects non-ASCII str from a hostile header
+    supplied = request.headers.get(PROFILE_HEADER, '').encode()
+    return hmac.compare_digest(supplied, token.encode())
+
+
+def write_profile(profiler: SamplingProfiler, kind: str, name: str) -> Optional[str]:
+    """
+    Write collapsed stacks to PROFILING_DIR and prune old files
+
+    Only the newest PROFILING_MAX_FILES profiles are kept, so leaving
+    sampling on cannot fill the disk.
+
+    Returns:
+        Path of the written file, or None if nothing was sampled
+    """
+    if not profiler.samples:
+        return None
+
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)[:80]
+    path = os.path.join(
+        directory,
+        f'{kind}-{safe_name}-{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{threading.get_ident()}.collapsed'
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(profiler.collapsed())
+
+    prune_profiles(directory, settings.PROFILING_MAX_FILES)
+    logger.info(
+        "Wrote profile: %d samples over %.2fs",
+        profiler.samples,
+        profiler.duration,
+        extra={'profile': path}
+    )
+    return path
+
+
+def prune_profiles(directory: str, keep: int) -> int:
+    """Delete all but the ``keep`` newest profiles; returns the count deleted."""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith('.collapsed') and entry.is_file():
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+    entries.sort(reverse=True)
+
+    removed = 0
+    for _, path in entries[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            # Pruned concurrently by another process
+            pass
+    return removed
@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+from ..models import Download
+from .analytics import record_outcome
+from .health import queue_depth
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def reap_stuck_downloads(
+    batch_size: Optional[int] = None,
+    max_batches: int = 10
+) -> Dict[str, int]:
+    """
+    Requeue or fail downloads stuck in an in-flight status
+
+    Rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    reapers (or a reaper racing a live task update) never handle the same
+    row twice. Candidates come from the partial ``download_inflight_idx``
+    index on ``(status, updated_at)``, which only holds in-flight rows and
+    stays small however large the table grows. PENDING rows get extra time
+    while the download queue has a backlog (see :func:`pending_deadline`).
+
+    Args:
+        batch_size: Rows claimed per transaction
+        max_batches: Upper bound on batches per status per run
+
+    Returns:
+        Dict with the number of requeued and failed downloads
+    """
+    if batch_size is None:
+        batch_size = settings.DOWNLOAD_REAPER_BATCH_SIZE
+
+    result = {'requeued': 0, 'failed': 0, 'partials_removed': 0}
+    now = timezone.now()
+
+    for status, deadline in settings.DOWNLOAD_STUCK_DEADLINES.items():
+        if status == Download.Status.PENDING:
+            deadline = pending_deadline(deadline)
+            if deadline is None:
+                continue
+        cutoff = now - timedelta(seconds=deadline)
+        for _ in range(max_batches):
+            claimed = _reap_batch(status, cutoff, batch_size, result)
+            if claimed < batch_size:
+                break
+
+    return result
+
+
+def pending_deadline(configured: int) -> Optional[int]:
+    """
+    PENDING deadline stretched by the time the download queue needs to drain
+
+    ``process_download`` is rate limited, so with a backlog a row can stay
+    PENDING far longer than ``configured`` while its task is still queued;
+    requeueing it then would download it twice. The drain time assumes a
+    single worker, which errs towards waiting longer.
+
+    Returns:
+        Deadline in seconds, or None if the queue depth is unknown
+    """
+    from celery.utils.time import rate
+    from ..tasks import process_download
+
+    per_second = rate(process_download.rate_limit) if process_download.rate_limit else 0
+    if not per_second:
+        return configured
+    try:
+        depth = queue_depth()
+    except RedisError:
+        logger.warning("Broker unavailable, not reaping PENDING downloads", exc_info=True)
+        return None
+    return configured + int(depth / per_second)
+
+
+def _reap_batch(status: str, cutoff, batch_size: int, result: Dict[str, int]) -> int:
+    """Claim and recover one batch of stuck rows; returns the claim count."""
+    from ..tasks import enqueue_download
+
+    with transaction.atomic():
+        stuck: List[Download] = list(
+            Download.objects
+            .filter(status=status, updated_at__lt=cutoff)
+            .order_by('updated_at')
+            .select_for_update(skip_locked=True)
+            .only('id', 'url', 'status', 'reaped_count')[:batch_size]
+        )
+
+        for download in stuck:
+            result['partials_removed'] += get_storage().remove_partials(download.id)
+
+            if download.reaped_count >= settings.DOWNLOAD_REAPER_MAX_REQUEUES:
+                download.status = Download.Status.FAILED
+                download.error_message = (
+                    f"Download stuck in {status} and was abandoned after "
+                    f"{download.reaped_count} recoveries"
+                )
+                download.save(update_fields=['status', 'error_message', 'updated_at'])
+                record_outcome(download)
+                result['failed'] += 1
+                continue
+
+            download.status = Download.Status.PENDING
+            download.reaped_count += 1
+            download.save(update_fields=['status', 'reaped_count', 'updated_at'])
+            transaction.on_commit(lambda download=download: enqueue_download(download))
+            result['requeued'] += 1
+
+    if stuck:
+        logger.info(f"Reaped {len(stuck)} downloads stuck in {status}")
+    return len(stuck)
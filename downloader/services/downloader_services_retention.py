@@ -0,0 +1,345 @@
+import time
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import Download
+
+logger = logging.getLogger(__name__)
+
+TABLE = Download._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+LOCK_TIMEOUT = '2s'
+
+
+def month_start(value) -> date:
+    """Return the first day of the month containing ``value``."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Shift a month-start date by ``months`` (may be negative)."""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the monthly partition holding rows of ``month``."""
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned() -> bool:
+    """Check whether the downloads table is a partitioned parent table."""
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s
+            """,
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def ensure_partitions(months_ahead: Optional[int] = None) -> List[str]:
+    """
+    Create monthly partitions from the current month onwards
+
+    Args:
+        months_ahead: Number of future months to pre-create
+
+    Returns:
+        Names of the partitions that were created
+    """
+    if months_ahead is None:
+        months_ahead = settings.DOWNLOAD_PARTITION_MONTHS_AHEAD
+
+    created = []
+    current = month_start(timezone.now())
+    existing = set(_list_partitions())
+
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month.isoformat(), add_months(month, 1).isoformat()]
+            )
+        created.append(name)
+        logger.info(f"Created download partition {name}")
+
+    return created
+
+
+def expired_partitions(cutoff: datetime) -> List[Tuple[str, date]]:
+    """
+    List monthly partitions whose whole range lies before ``cutoff``
+
+    The legacy partition is never returned; its rows are purged in batches.
+    """
+    expired = []
+    for name in _list_partitions():
+        month = _partition_month(name)
+        if month and add_months(month, 1) <= cutoff.date():
+            expired.append((name, month))
+    return sorted(expired, key=lambda item: item[1])
+
+
+def retire_partition(name: str, archive: bool = False) -> None:
+    """
+    Detach an expired partition without blocking writers and drop it
+
+    ``DETACH ... CONCURRENTLY`` only takes a SHARE UPDATE EXCLUSIVE lock on
+    the parent, so inserts into the hot partitions keep flowing. When
+    ``archive`` is set the detached table is kept as a standalone archive.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}" CONCURRENTLY'
+        )
+        if archive:
+            cursor.execute(f'ALTER TABLE "{name}" RENAME TO "{name}_archive"')
+        else:
+            cursor.execute(f'DROP TABLE "{name}"')
+
+    logger.info(f"{'Archived' if archive else 'Dropped'} download partition {name}")
+
+
+def purge_expired_rows(
+    cutoff: datetime,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """
+    Delete rows created before ``cutoff`` in small, short-lived batches
+
+    Each batch runs in its own transaction and skips rows locked by a
+    running task, so no lock is held longer than one batch.
+
+    Args:
+        cutoff: Delete rows created before this instant
+        batch_size: Rows per batch
+        pause: Seconds to sleep between batches
+        max_batches: Stop after this many batches
+
+    Returns:
+        Number of deleted rows
+    """
+    if batch_size is None:
+        batch_size = settings.DOWNLOAD_RETENTION_BATCH_SIZE
+    if pause is None:
+        pause = settings.DOWNLOAD_RETENTION_BATCH_PAUSE
+
+    deleted_total = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            pks = list(
+                Download.objects
+                .filter(created_at__lt=cutoff)
+                .order_by('created_at')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            deleted, _ = Download.objects.filter(
+                pk__in=pks,
+                created_at__lt=cutoff
+            ).delete()
+
+        deleted_total += deleted
+        batches += 1
+
+        if len(pks) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return deleted_total
+
+
+def enforce_retention(days: Optional[int] = None) -> dict:
+    """
+    Apply the retention policy to the downloads table
+
+    Whole expired partitions are detached and dropped (or archived); any
+    remaining expired rows, e.g. in the legacy partition or on a
+    non-partitioned table, are deleted in batches.
+    """
+    if days is None:
+        days = settings.DOWNLOAD_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+
+    retired = []
+    if is_partitioned():
+        ensure_partitions()
+        for name, _ in expired_partitions(cutoff):
+            retire_partition(name, archive=settings.DOWNLOAD_RETENTION_ARCHIVE)
+            retired.append(name)
+
+    deleted = purge_expired_rows(cutoff)
+
+    return {
+        'cutoff': cutoff.isoformat(),
+        'partitions_retired': retired,
+        'rows_deleted': deleted,
+    }
+
+
+def convert_to_partitioned(cutover: date, step: str = 'all', log=logger.info) -> None:
+    """
+    Convert the plain downloads table into a monthly partitioned table online
+
+    The existing table becomes the ``legacy`` partition covering everything
+    before ``cutover``; new monthly partitions hold rows from ``cutover``
+    onwards. Steps can be run one at a time:
+
+    - ``prepare``: build the (id, created_at) unique index concurrently and
+      add a NOT VALID range check (no long locks)
+    - ``validate``: validate the check constraint (SHARE UPDATE EXCLUSIVE)
+    - ``swap``: rename, create the parent and attach the legacy table in a
+      single short transaction bounded by ``lock_timeout``
+
+    Args:
+        cutover: First day of a future month; must be reached after ``swap``
+        step: One of ``prepare``, ``validate``, ``swap`` or ``all``
+        log: Progress callback
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError("Partitioning requires PostgreSQL")
+    if cutover != month_start(cutover):
+        raise ValueError("Cutover must be the first day of a month")
+
+    check_name = f'{TABLE}_legacy_range'
+    unique_index = f'{TABLE}_id_created_uniq'
+
+    if step in ('prepare', 'all'):
+        if is_partitioned():
+            raise RuntimeError(f"{TABLE} is already partitioned")
+        with connection.cursor() as cursor:
+            log("Building unique index on (id, created_at) concurrently")
+            cursor.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{unique_index}" '
+                f'ON "{TABLE}" (id, created_at)'
+            )
+            log(f"Adding NOT VALID range check created_at < {cutover}")
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{check_name}" '
+                f'CHECK (created_at < %s) NOT VALID',
+                [cutover.isoformat()]
+            )
+
+    if step in ('validate', 'all'):
+        with connection.cursor() as cursor:
+            log("Validating range check")
+            cursor.execute(f'ALTER TABLE "{TABLE}" VALIDATE CONSTRAINT "{check_name}"')
+
+    if step in ('swap', 'all'):
+        if timezone.now().date() >= cutover:
+            raise RuntimeError("Cutover has passed; prepare again with a later month")
+
+        index_statements = parent_index_statements()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            log(f"Renaming {TABLE} to {LEGACY_TABLE}")
+            cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" '
+                f'INCLUDING DEFAULTS INCLUDING STORAGE) '
+                f'PARTITION BY RANGE (created_at)'
+            )
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey_part" '
+                f'PRIMARY KEY (id, created_at)'
+            )
+            log("Attaching legacy table as the pre-cutover partition")
+            # The validated check constraint lets ATTACH skip the full scan
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{LEGACY_TABLE}" '
+                f'FOR VALUES FROM (MINVALUE) TO (%s)',
+                [cutover.isoformat()]
+            )
+            # Matching indexes already exist on the legacy table and are
+            # attached rather than rebuilt; the legacy copies give up their
+            # names since index names are unique per schema
+            for index in Download._meta.indexes:
+                cursor.execute(
+                    f'ALTER INDEX IF EXISTS "{index.name}" RENAME TO "{index.name}_legacy"'
+                )
+            for statement in index_statements:
+                cursor.execute(statement)
+            for offset in range(settings.DOWNLOAD_PARTITION_MONTHS_AHEAD + 1):
+                month = add_months(cutover, offset)
+                cursor.execute(
+                    f'CREATE TABLE "{partition_name(month)}" PARTITION OF "{TABLE}" '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    [month.isoformat(), add_months(month, 1).isoformat()]
+                )
+        log("Partitioned table is live")
+
+
+def parent_index_statements() -> List[str]:
+    """
+    CREATE INDEX statements for the partitioned parent, taken from the model
+
+    Covers single-column ``db_index`` fields and every ``Meta.indexes``
+    entry with its ordering, INCLUDE columns and condition, so partitions
+    created after the cutover get the same indexes as the legacy table.
+    """
+    statements = [
+        f'CREATE INDEX ON "{TABLE}" ("{field.column}")'
+        for field in Download._meta.local_fields
+        if field.db_index and not field.unique
+    ]
+    with connection.schema_editor(atomic=False) as editor:
+        statements.extend(
+            str(index.create_sql(Download, editor))
+            for index in Download._meta.indexes
+        )
+    return statements
+
+
+def _list_partitions() -> List[str]:
+    """Names of the partitions attached to the downloads table."""
+    if connection.vendor != 'postgresql':
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _partition_month(name: str) -> Optional[date]:
+    """Parse the month out of a ``<table>_pYYYYMM`` partition name."""
+    prefix = f'{TABLE}_p'
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], '%Y%m').date()
+    except ValueError:
+        return None
@@ -0,0 +1,91 @@
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Download
+from ..serializers import DOWNLOAD_ROW_FIELDS, download_row, serialize_download_row
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'download:status:'
+
+_stats = {'hits': 0, 'misses': 0, 'not_found': 0, 'writes': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def status_cache_key(download_id) -> str:
+    return f'{KEY_PREFIX}{download_id}'
+
+
+def build_entry(row: Dict) -> Dict:
+    """Serialize a download row and tag the payload with a content ETag."""
+    data = serialize_download_row(row)
+    digest = hashlib.sha1(
+        json.dumps(data, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:20]
+    return {'etag': f'"{digest}"', 'data': data}
+
+
+def cache_status(download: Download) -> Dict:
+    """Write (or overwrite) the cached status payload of a download."""
+    return _store(download_row(download))
+
+
+def invalidate_status(download_id) -> None:
+    """Drop the cached status payload of a download."""
+    cache.delete(status_cache_key(download_id))
+    _bump('invalidations')
+
+
+def get_status(download_id) -> Optional[Dict]:
+    """
+    Cached status payload and ETag of a download
+
+    A hit costs one cache round-trip and no database query; a miss loads
+    the row, serializes it and caches the result.
+
+    Returns:
+        Dict with ``etag`` and ``data`` keys, or None if no such download
+    """
+    entry = cache.get(status_cache_key(download_id))
+    if entry is not None:
+        _bump('hits')
+        return entry
+
+    _bump('misses')
+    row = Download.objects.filter(pk=download_id).values(*DOWNLOAD_ROW_FIELDS).first()
+    if row is None:
+        _bump('not_found')
+        return None
+    return _store(row)
+
+
+def status_cache_stats() -> Dict:
+    """Hit/miss counters of this process and the resulting hit ratio."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+    return stats
+
+
+def _store(row: Dict) -> Dict:
+    entry = build_entry(row)
+    cache.set(status_cache_key(row['id']), entry, _ttl(row['status']))
+    _bump('writes')
+    return entry
+
+
+def _ttl(status: str) -> int:
+    # Finished downloads no longer change, so they can stay cached longer
+    if status in (Download.Status.COMPLETED, Download.Status.FAILED):
+        return settings.DOWNLOAD_STATUS_CACHE_TTL_FINAL
+    return settings.DOWNLOAD_STATUS_CACHE_TTL
+
+
+def _bump(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
@@ -0,0 +1,504 @@
+import os
+import re
+import glob
+import time
+import uuid
+import shutil
+import hashlib
+import asyncio
+import logging
+import posixpath
+from abc import ABC, abstractmethod
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_DIR = '.partial'
+MEDIA_PREFIX = 'downloads'
+
+# downloads/<2 hex>/<2 hex>/<32 hex>-<filename>
+SHARDED_NAME_RE = re.compile(r'^downloads/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}-')
+
+
+def shard_name(key: str, filename: str) -> str:
+    """
+    Sharded storage name for ``filename`` under the hex ``key``
+
+    Two levels of 256 directories keep every directory small (about 15
+    entries per leaf at a million files), and the key makes the name
+    unique without probing for collisions.
+    """
+    return posixpath.join(MEDIA_PREFIX, key[:2], key[2:4], f'{key}-{filename}')
+
+
+def is_sharded(name: str) -> bool:
+    return bool(SHARDED_NAME_RE.match(name or ''))
+
+
+class MediaStorage(ABC):
+    """
+    Where downloaded media lives
+
+    Writers are async and accept the body chunk by chunk, so a transfer is
+    streamed straight into the backend without buffering the whole file.
+    Names are relative, POSIX-style keys such as ``downloads/abc.jpg``.
+    """
+
+    @abstractmethod
+    def open_writer(self, name: str, download_id=None, content_type: str = None):
+        """Start writing ``name``; returns an object with async write/commit/abort."""
+        raise NotImplementedError
+
+    def generate_name(self, filename: str) -> str:
+        """New, collision-free sharded name for an incoming ``filename``."""
+        return shard_name(uuid.uuid4().hex, filename)
+
+    @abstractmethod
+    def url(self, name: str, expires: Optional[int] = None) -> str:
+        """URL clients fetch the file from."""
+        raise NotImplementedError
+
+    def path(self, name: str) -> Optional[str]:
+        """Local filesystem path, or None for remote backends."""
+        return None
+
+    @abstractmethod
+    def open(self, name: str):
+        """Open a stored file for binary reading; FileNotFoundError if missing."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, name: str, content) -> None:
+        """Store a readable binary file object under ``name``, atomically."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self, name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stat(self, name: str) -> Tuple[int, float]:
+        """Size and modification time from metadata; FileNotFoundError if missing."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        raise NotImplementedError
+
+    def remove_partials(self, download_id) -> int:
+        """Delete leftovers of an interrupted transfer; returns the count."""
+        return 0
+
+
+class LocalFileWriter:
+    """Writes to a per-download partial file and renames it on commit."""
+
+    def __init__(self, final_path: str, part_path: str):
+        self.final_path = final_path
+        self.part_path = part_path
+        self._file = open(part_path, 'wb')
+
+    async def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    async def commit(self) -> None:
+        self._file.close()
+        os.makedirs(os.path.dirname(self.final_path), exist_ok=True)
+        os.replace(self.part_path, self.final_path)
+
+    async def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+class LocalMediaStorage(MediaStorage):
+    """Files under MEDIA_ROOT, served by the web server at MEDIA_URL."""
+
+    def __init__(self, location: Optional[str] = None, base_url: Optional[str] = None):
+        self._location = location
+        self._base_url = base_url
+
+    # Resolved lazily so overridden settings (e.g. in tests) are honoured
+    @property
+    def location(self) -> str:
+        return str(self._location or settings.MEDIA_ROOT)
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url or settings.MEDIA_URL
+
+    def path(self, name: str) -> str:
+        # Rows from before storage names were relative hold absolute paths
+        return os.path.join(self.location, name)
+
+    def partial_dir(self) -> str:
+        """Directory holding in-progress transfers, created on demand."""
+        path = os.path.join(self.location, 'downloads', PARTIAL_DIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def partial_path(self, download_id, name: str) -> str:
+        """Path of the partial file a transfer writes before it is complete."""
+        return os.path.join(self.partial_dir(), f'{download_id}-{posixpath.basename(name)}.part')
+
+    def open_writer(self, name: str, download_id=None, content_type: str = None):
+        return LocalFileWriter(
+            self.path(name),
+            self.partial_path(download_id or uuid.uuid4(), name)
+        )
+
+    def open(self, name: str):
+        return open(self.path(name), 'rb')
+
+    def save(self, name: str, content) -> None:
+        final_path = self.path(name)
+        part_path = os.path.join(self.partial_dir(), f'{uuid.uuid4().hex}.part')
+        try:
+            with open(part_path, 'wb') as f:
+                shutil.copyfileobj(content, f)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(part_path, final_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    def url(self, name: str, expires: Optional[int] = None) -> str:
+        return f"{self.base_url.rstrip('/')}/{name}"
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def size(self, name: str) -> int:
+        return os.path.getsize(self.path(name))
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        result = os.stat(self.path(name))
+        return result.st_size, result.st_mtime
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def remove_partials(self, download_id) -> int:
+        removed = 0
+        pattern = os.path.join(self.partial_dir(), f'{glob.escape(str(download_id))}-*.part')
+        for path in glob.glob(pattern):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+class S3MultipartWriter:
+    """
+    Streams a body into S3 with a multipart upload
+
+    Chunks are buffered up to ``part_size`` and each full part is uploaded
+    on a worker thread while the transfer continues. At most
+    ``max_concurrency`` parts are in flight, which bounds memory to about
+    ``(max_concurrency + 1) * part_size``. Bodies smaller than one part are
+    sent with a single PUT on commit.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int,
+                 max_concurrency: int, content_type: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.content_type = content_type
+
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._part_number = 0
+        self._parts: List[Dict] = []
+        self._pending = set()
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def write(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        while len(self._buffer) >= self.part_size:
+            data = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._submit(data)
+
+    async def commit(self) -> None:
+        if self._upload_id is None:
+            await self._call(
+                self.client.put_object,
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self._buffer),
+                **self._extra_args()
+            )
+            self._buffer.clear()
+            return
+
+        if self._buffer:
+            await self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        await asyncio.gather(*self._pending)
+
+        await self._call(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={'Parts': sorted(self._parts, key=lambda p: p['PartNumber'])}
+        )
+
+    async def abort(self) -> None:
+        for task in self._pending:
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._buffer.clear()
+
+        if self._upload_id is not None:
+            try:
+                await self._call(
+                    self.client.abort_multipart_upload,
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id
+                )
+            except Exception:
+                logger.warning(f"Failed to abort multipart upload of {self.key}", exc_info=True)
+
+    async def _submit(self, data: bytes) -> None:
+        # Fail fast if an earlier part already failed
+        for task in [t for t in self._pending if t.done()]:
+            self._pending.discard(task)
+            task.result()
+
+        if self._upload_id is None:
+            response = await self._call(
+                self.client.create_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                **self._extra_args()
+            )
+            self._upload_id = response['UploadId']
+
+        await self._slots.acquire()
+        self._part_number += 1
+        task = asyncio.ensure_future(self._upload_part(self._part_number, data))
+        self._pending.add(task)
+
+    async def _upload_part(self, number: int, data: bytes) -> None:
+        try:
+            response = await self._call(
+                self.client.upload_part,
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                PartNumber=number,
+                Body=data
+            )
+            self._parts.append({'PartNumber': number, 'ETag': response['ETag']})
+        finally:
+            self._slots.release()
+
+    def _extra_args(self) -> Dict:
+        return {'ContentType': self.content_type} if self.content_type else {}
+
+    async def _call(self, fn, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(fn, **kwargs))
+
+
+class S3MediaStorage(MediaStorage):
+    """
+    Files in an S3-compatible bucket (AWS S3, MinIO, ...)
+
+    Requires ``boto3``. Clients download through presigned URLs.
+    """
+
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None,
+                 region_name: Optional[str] = None, access_key: Optional[str] = None,
+                 secret_key: Optional[str] = None, part_size: int = 8 * 1024 * 1024,
+                 max_concurrency: int = 4, url_expires: int = 3600):
+        try:
+            import boto3
+        except ImportError:
+            raise ImproperlyConfigured("S3MediaStorage requires the boto3 package")
+
+        if not bucket:
+            raise ImproperlyConfigured("S3MediaStorage requires a bucket name")
+
+        self.bucket = bucket
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.url_expires = url_expires
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+    def open_writer(self, name: str, download_id=None, content_type: str = None):
+        return S3MultipartWriter(
+            self.client,
+            self.bucket,
+            name,
+            self.part_size,
+            self.max_concurrency,
+            content_type
+        )
+
+    def open(self, name: str):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=name)['Body']
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                raise FileNotFoundError(name) from exc
+            raise
+
+    def save(self, name: str, content) -> None:
+        from boto3.s3.transfer import TransferConfig
+        self.client.upload_fileobj(
+            content,
+            self.bucket,
+            name,
+            Config=TransferConfig(
+                multipart_chunksize=self.part_size,
+                max_concurrency=self.max_concurrency
+            )
+        )
+
+    def url(self, name: str, expires: Optional[int] = None) -> str:
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': name},
+            ExpiresIn=expires or self.url_expires
+        )
+
+    def exists(self, name: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=name)
+            return True
+        except ClientError:
+            return False
+
+    def size(self, name: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=name)['ContentLength']
+
+    def stat(self, name: str) -> Tuple[int, float]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=name)
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                raise FileNotFoundError(name) from exc
+            raise
+        return head['ContentLength'], head['LastModified'].timestamp()
+
+    def delete(self, name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    # Interrupted multipart uploads are not tied to a download id; configure
+    # an AbortIncompleteMultipartUpload lifecycle rule on the bucket instead.
+
+
+@lru_cache(maxsize=None)
+def get_storage() -> MediaStorage:
+    """The media storage configured by ``MEDIA_STORAGE`` (the hot tier)."""
+    config = settings.MEDIA_STORAGE
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+@lru_cache(maxsize=None)
+def get_cold_storage() -> MediaStorage:
+    """The cheaper tier idle media is demoted to, see ``MEDIA_COLD_STORAGE``."""
+    config = settings.MEDIA_COLD_STORAGE
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def shard_flat_files(
+    batch_size: int = 500,
+    pause: float = 0.0,
+    dry_run: bool = False,
+    log: Callable[[str], None] = logger.info
+) -> Dict[str, int]:
+    """
+    Move files of the legacy flat ``downloads/`` layout into shards
+
+    Each file's shard key is derived from its old name, so an interrupted
+    run can simply be restarted: a file already moved whose row was not
+    yet updated is found at its target and only the row is fixed. Rows
+    are walked in primary-key order, one batch at a time.
+
+    Returns:
+        Dict with moved, already-moved and missing file counts
+    """
+    from ..models import Download
+    from .status_cache import invalidate_status
+
+    storage = get_storage()
+    if not isinstance(storage, LocalMediaStorage):
+        raise ImproperlyConfigured("Only local media storage uses the flat layout")
+
+    result = {'moved': 0, 'relinked': 0, 'missing': 0}
+    last_pk = None
+
+    while True:
+        rows = Download.objects.exclude(file_path__isnull=True).exclude(file_path='')
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        batch = list(rows.order_by('pk').values_list('pk', 'file_path')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+
+        for pk, old_name in batch:
+            if is_sharded(old_name):
+                continue
+
+            old_path = storage.path(old_name)
+            relative = os.path.relpath(old_path, storage.location).replace(os.sep, '/')
+            key = hashlib.sha1(relative.encode('utf-8')).hexdigest()[:32]
+            new_name = shard_name(key, posixpath.basename(relative))
+            new_path = storage.path(new_name)
+
+            if os.path.exists(old_path):
+                outcome = 'moved'
+            elif os.path.exists(new_path):
+                outcome = 'relinked'
+            else:
+                result['missing'] += 1
+                continue
+
+            result[outcome] += 1
+            if dry_run:
+                continue
+
+            if outcome == 'moved':
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                os.replace(old_path, new_path)
+            Download.objects.filter(pk=pk, file_path=old_name).update(file_path=new_name)
+            invalidate_status(pk)
+
+        log(f"Processed up to {last_pk}: {result}")
+        if pause:
+            time.sleep(pause)
+
+    return result
@@ -0,0 +1,260 @@
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from ..models import Download
+from .counters import get_redis
+from .eviction import LRU_KEY, leased_media, track_media, untrack_media
+from .storage import get_cold_storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = 'downloader:tier_hits'
+MOVE_LOCK_KEY = 'downloader:tier_move:{}'
+PROMOTE_QUEUED_KEY = 'downloader:tier_promote_queued:{}'
+# JSON residency per tier, refreshed by the tiering beat task
+RESIDENCY_KEY = 'downloader:tier_residency'
+# Source copies left behind because a reader leased them mid-move:
+# field = "<download id>|<tier>", value = JSON list of stored names
+PENDING_DELETE_KEY = 'downloader:tier_pending_delete'
+
+HOT = Download.StorageTier.HOT
+COLD = Download.StorageTier.COLD
+
+
+def record_tier_hit(tier: str) -> None:
+    """Count a serve from ``tier`` for the hit ratio."""
+    get_redis().hincrby(HITS_KEY, tier, 1)
+
+
+def demote_idle_media(
+    days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: int = 10
+) -> Dict[str, int]:
+    """
+    Move hot files not served for ``days`` days to the cold tier
+
+    Candidates come from the head of the eviction recency index, which
+    only holds hot files, so nothing is scanned. Leased files are skipped.
+    Source copies kept back by earlier moves are removed first once their
+    leases are gone.
+
+    Returns:
+        Dict with demoted and skipped counts
+    """
+    days = settings.MEDIA_DEMOTE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.MEDIA_TIERING_BATCH_SIZE
+    result = {'demoted': 0, 'skipped': 0}
+    purge_released_sources()
+    if not days:
+        return result
+
+    redis = get_redis()
+    idle_before = time.time() - days * 86400
+    offset = 0
+
+    for _ in range(max_batches):
+        members = redis.zrangebyscore(LRU_KEY, '-inf', idle_before, start=offset, num=batch_size)
+        if not members:
+            break
+        members = [m.decode() if isinstance(m, bytes) else m for m in members]
+        leased = leased_media(members)
+
+        skipped = []
+        for download_id in members:
+            if download_id not in leased and move_media(download_id, COLD):
+                result['demoted'] += 1
+            else:
+                skipped.append(download_id)
+        result['skipped'] += len(skipped)
+
+        # Rows found gone were untracked; only entries still indexed stay ahead
+        pipe = redis.pipeline(transaction=False)
+        for download_id in skipped:
+            pipe.zscore(LRU_KEY, download_id)
+        offset += sum(1 for score in pipe.execute() if score is not None)
+
+    return result
+
+
+def claim_promotion(download_id) -> bool:
+    """True for the first cold serve to ask for a promotion while none is queued."""
+    return bool(get_redis().set(
+        PROMOTE_QUEUED_KEY.format(download_id), 1, nx=True, ex=settings.MEDIA_LEASE_SECONDS
+    ))
+
+
+def release_promotion(download_id) -> None:
+    """Drop a claim whose promotion could not be queued, so it is asked again."""
+    get_redis().delete(PROMOTE_QUEUED_KEY.format(download_id))
+
+
+def promote_media(download_id) -> bool:
+    """Move a cold file back to the hot tier; returns whether it moved."""
+    return move_media(download_id, HOT)
+
+
+def move_media(download_id, target_tier: str) -> bool:
+    """
+    Copy a file to ``target_tier`` and repoint its row, atomically
+
+    The row only switches tier if it still names the same file in the
+    source tier, checked in the same UPDATE; otherwise the copy is thrown
+    away. The source copy is removed after the switch commits, so a reader
+    of either the old or the new row state always finds the file. As in
+    eviction, leases are checked again after the switch: a reader that
+    took one in between keeps the source copy, which is deleted by a later
+    :func:`purge_released_sources`. A per-download lock keeps a promotion
+    and a demotion from interleaving.
+    """
+    source_tier = COLD if target_tier == HOT else HOT
+    lock = get_redis().lock(MOVE_LOCK_KEY.format(download_id), timeout=settings.MEDIA_LEASE_SECONDS)
+    if not lock.acquire(blocking=False):
+        return False
+
+    try:
+        download = (
+            Download.objects
+            .filter(
+                pk=download_id,
+                storage_tier=source_tier,
+                status=Download.Status.COMPLETED,
+                evicted_at__isnull=True
+            )
+            .exclude(file_path='')
+            .only('id', 'file_path', 'file_size', 'files', 'storage_tier')
+            .first()
+        )
+        if download is None:
+            if target_tier == COLD:
+                # Gone or evicted since it was indexed
+                untrack_media([download_id])
+            return False
+
+        source = download.get_storage()
+        target = get_storage() if target_tier == HOT else get_cold_storage()
+        name = download.file_path
+        names = download.stored_names()
+
+        for stored in names:
+            content = source.open(stored)
+            try:
+                target.save(stored, content)
+            finally:
+                content.close()
+
+        with transaction.atomic():
+            switched = Download.objects.filter(
+                pk=download.pk,
+                storage_tier=source_tier,
+                file_path=name,
+                evicted_at__isnull=True
+            ).update(storage_tier=target_tier)
+
+        if not switched:
+            for stored in names:
+                target.delete(stored)
+            return False
+
+        if leased_media([download.pk]):
+            get_redis().hset(
+                PENDING_DELETE_KEY, f'{download.pk}|{source_tier}', json.dumps(names)
+            )
+        else:
+            for stored in names:
+                source.delete(stored)
+        if target_tier == HOT:
+            track_media(download.pk, download.total_size)
+        else:
+            untrack_media([download.pk])
+        return True
+    finally:
+        lock.release()
+
+
+def purge_released_sources() -> int:
+    """
+    Delete source copies kept back by :func:`move_media` once unleased
+
+    A copy is only deleted while its row still lives in the other tier;
+    if the file has since moved back, the copy is live again and the
+    entry is just dropped.
+
+    Returns:
+        Number of entries resolved
+    """
+    redis = get_redis()
+    pending = {
+        (field.decode() if isinstance(field, bytes) else field): json.loads(value)
+        for field, value in redis.hgetall(PENDING_DELETE_KEY).items()
+    }
+    if not pending:
+        return 0
+
+    leased = leased_media(field.split('|', 1)[0] for field in pending)
+    resolved = 0
+    for field, names in pending.items():
+        download_id, tier = field.split('|', 1)
+        if download_id in leased:
+            continue
+        lock = redis.lock(MOVE_LOCK_KEY.format(download_id), timeout=settings.MEDIA_LEASE_SECONDS)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            current = Download.objects.filter(pk=download_id).values_list('storage_tier', flat=True).first()
+            if current != tier:
+                _delete_names(tier, names)
+            redis.hdel(PENDING_DELETE_KEY, field)
+            resolved += 1
+        finally:
+            lock.release()
+    return resolved
+
+
+def _delete_names(tier: str, names: List[str]) -> None:
+    storage = get_storage() if tier == HOT else get_cold_storage()
+    for stored in names:
+        storage.delete(stored)
+
+
+def refresh_residency() -> Dict[str, Dict[str, int]]:
+    """
+    Count files and bytes per tier and cache the result
+
+    Bytes cover every file of a post (``total_size``), not just the last
+    one. This reads every stored row, so it runs in the tiering beat task
+    rather than per request.
+    """
+    residency = {tier: {'files': 0, 'bytes': 0} for tier in (HOT, COLD)}
+    rows = (
+        Download.objects
+        .filter(status=Download.Status.COMPLETED, evicted_at__isnull=True)
+        .exclude(file_path='')
+        .only('id', 'storage_tier', 'files', 'file_size')
+    )
+    for download in rows.iterator(chunk_size=2000):
+        tier = residency.setdefault(download.storage_tier, {'files': 0, 'bytes': 0})
+        tier['files'] += 1
+        tier['bytes'] += download.total_size
+
+    get_redis().set(RESIDENCY_KEY, json.dumps(residency), ex=2 * settings.MEDIA_TIERING_INTERVAL)
+    return residency
+
+
+def tier_stats() -> Dict:
+    """Residency (files and bytes) per tier and the hot-tier hit ratio."""
+    cached = get_redis().get(RESIDENCY_KEY)
+    residency = json.loads(cached) if cached else refresh_residency()
+    hits = {
+        (key.decode() if isinstance(key, bytes) else key): int(value)
+        for key, value in get_redis().hgetall(HITS_KEY).items()
+    }
+    served = sum(hits.values())
+    return {
+        'residency': {tier: residency.get(tier, {'files': 0, 'bytes': 0}) for tier in (HOT, COLD)},
+        'hits': {tier: hits.get(tier, 0) for tier in (HOT, COLD)},
+        'hot_hit_ratio': hits.get(HOT, 0) / served if served else None,
+    }
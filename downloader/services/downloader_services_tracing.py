@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import random
+import bisect
+import logging
+import secrets
+import threading
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+
+_current: ContextVar[Optional['Span']] = ContextVar('downloader_span', default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace
+
+    Spans finished in this process are collected on their local root (the
+    request or task span that started here). When the local root ends the
+    whole batch is exported, or dropped if the trace was not sampled and
+    was not among the slowest (see :func:`_keep`).
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 sampled: bool, local_root: Optional['Span'] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.local_root = local_root or self
+        self.attributes = attributes
+        self.error = None
+        self.start = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+        self._token = None
+        if self.local_root is self:
+            self.finished: List['Span'] = []
+            self.dropped = 0
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context of this span, for outgoing requests and tasks."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f'{type(exc).__name__}: {exc}'
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and self.error is None:
+            self.record_error(exc)
+        self.finish()
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._started
+        root = self.local_root
+        if root is self or len(root.finished) < settings.TRACING_MAX_SPANS:
+            root.finished.append(self)
+        else:
+            root.dropped += 1
+        if root is self:
+            _flush(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class NoopSpan:
+    """Stands in for a span while tracing is disabled."""
+
+    trace_id = span_id = traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def __enter__(self) -> 'NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def start_span(name: str, **attributes):
+    """
+    Child of the current span, or the root of a new trace
+
+    New traces are sampled at TRACING_SAMPLE_RATE; the decision travels
+    with the trace context so every process agrees on it.
+    """
+    if not settings.TRACING_ENABLED:
+        return NOOP_SPAN
+    parent = _current.get()
+    if parent is None:
+        return Span(
+            name,
+            secrets.token_hex(16),
+            None,
+            random.random() < settings.TRACING_SAMPLE_RATE,
+            **attributes
+        )
+    return Span(name, parent.trace_id, parent.span_id, parent.sampled, parent.local_root, **attributes)
+
+
+def continue_trace(name: str, traceparent: Optional[str], trust_sampled: bool = True, **attributes):
+    """
+    Local root span joining the trace of an incoming ``traceparent``
+
+    With ``trust_sampled`` off (context sent by clients outside the trust
+    boundary) the trace id is kept but the sampling decision is made here,
+    so callers cannot force every request to be exported.
+    """
+    if not settings.TRACING_ENABLED:
+        return NOOP_SPAN
+    context = parse_traceparent(traceparent)
+    if context is None:
+        return start_span(name, **attributes)
+    trace_id, parent_id, sampled = context
+    if not trust_sampled:
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    return Span(name, trace_id, parent_id, sampled, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace id, parent span id, sampled) of a W3C header, or None if invalid."""
+    parts = (value or '').strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def trace_query(execute, sql, params, many, context):
+    """
+    Django execute wrapper: a span per SQL statement inside a traced block
+
+    Statements outside any span (most management and shell work) cost one
+    context variable lookup.
+    """
+    if _current.get() is None or not settings.TRACING_ENABLED:
+        return execute(sql, params, many, context)
+    verb = sql.lstrip().split(None, 1)[0].upper() if sql else 'SQL'
+    name = 'db.write' if verb in ('INSERT', 'UPDATE', 'DELETE') else 'db.query'
+    with start_span(name, statement=sql[:500], many=many):
+        return execute(sql, params, many, context)
+
+
+# Root span durations per name, to recognise the slowest traces without
+# shipping all of them
+_durations: Dict[str, deque] = {}
+_sorted: Dict[str, List[float]] = {}
+_durations_lock = threading.Lock()
+
+
+def _keep(root: Span) -> bool:
+    """
+    Export sampled traces, plus any in the slowest TRACING_TAIL_PERCENTILE
+
+    The percentile is estimated per root span name over the last
+    TRACING_TAIL_WINDOW traces seen by this process, so the slowest
+    downloads are kept with every span even at a low sample rate.
+    """
+    slow_after = settings.TRACING_SLOW_SECONDS
+    slow = bool(slow_after) and root.duration >= slow_after
+
+    window = settings.TRACING_TAIL_WINDOW
+    if window:
+        with _durations_lock:
+            recent = _durations.setdefault(root.name, deque())
+            ordered = _sorted.setdefault(root.name, [])
+            if len(ordered) >= min(window, 100):
+                rank = int(len(ordered) * settings.TRACING_TAIL_PERCENTILE / 100)
+                slow = slow or root.duration >= ordered[min(rank, len(ordered) - 1)]
+            recent.append(root.duration)
+            bisect.insort(ordered, root.duration)
+            if len(recent) > window:
+                ordered.pop(bisect.bisect_left(ordered, recent.popleft()))
+    return root.sampled or slow
+
+
+def _flush(root: Span) -> None:
+    try:
+        if not _keep(root):
+            return
+        spans = [span.to_dict() for span in root.finished]
+        if root.dropped:
+            spans[-1]['attributes']['dropped_spans'] = root.dropped
+        get_exporter().export(spans)
+    except Exception:
+        logger.warning("Failed to export trace", exc_info=True, extra={'trace_id': root.trace_id})
+
+
+class SpanExporter:
+    """Where finished traces go; one call per local root with all its spans."""
+
+    def export(self, spans: List[Dict]) -> None:
+        raise NotImplementedError
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends spans as JSON lines to a local file, for offline analysis
+
+    Each batch goes out in one unbuffered O_APPEND write, so processes
+    sharing the file do not interleave within a trace. Once the file
+    reaches ``max_bytes`` it is rotated to ``path.1`` .. ``path.<backups>``
+    and the oldest is dropped, so the disk use stays bounded. See the
+    ``trace_report`` command.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def export(self, spans: List[Dict]) -> None:
+        data = ''.join(json.dumps(span, default=str) + '\n' for span in spans)
+        if self.max_bytes:
+            self._rotate()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def _rotate(self) -> None:
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        # Another process may be rotating at the same time; missing files are fine
+        for index in range(self.backups - 1, 0, -1):
+            try:
+                os.replace(f'{self.path}.{index}', f'{self.path}.{index + 1}')
+            except FileNotFoundError:
+                pass
+        try:
+            if self.backups:
+                os.replace(self.path, f'{self.path}.1')
+            else:
+                os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LoggingSpanExporter(SpanExporter):
+    """Logs each trace as one structured record, for log-based pipelines."""
+
+    def export(self, spans: List[Dict]) -> None:
+        logger.info("trace", extra={'trace_id': spans[0]['trace_id'], 'spans': spans})
+
+
+class NullSpanExporter(SpanExporter):
+    def export(self, spans: List[Dict]) -> None:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_exporter() -> SpanExporter:
+    """The exporter configured by ``TRACING_EXPORTER``."""
+    config = settings.TRACING_EXPORTER
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
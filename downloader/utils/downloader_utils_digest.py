@@ -0,0 +1,36 @@
+import zlib
+import hashlib
+from typing import BinaryIO
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamDigest:
+    """
+    Length, SHA-256 and CRC-32 of a byte stream, fed chunk by chunk
+
+    The SHA-256 verifies integrity; the CRC-32 is what ZIP bundles need.
+    Both are computed in the same pass so neither costs an extra read.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.crc32 = 0
+        self._sha256 = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self.crc32 = zlib.crc32(chunk, self.crc32)
+        self._sha256.update(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def digest_file(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> StreamDigest:
+    """Digest a file object, read in chunks."""
+    digest = StreamDigest()
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest
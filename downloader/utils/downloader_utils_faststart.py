@@ -0,0 +1,180 @@
+import struct
+from typing import BinaryIO, List, NamedTuple, Optional
+
+# Atoms whose payload is a list of child atoms, on the path to stco/co64
+CONTAINER_ATOMS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'mvex'}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+MAX_32BIT_OFFSET = 0xFFFFFFFF
+
+
+class FaststartError(ValueError):
+    """The file is not an MP4 this module can rewrite."""
+
+
+class Atom(NamedTuple):
+    type: bytes
+    offset: int
+    size: int  # including header
+
+
+def iter_atoms(f: BinaryIO, end: Optional[int] = None) -> List[Atom]:
+    """Top-level atoms of a file, read from headers only."""
+    f.seek(0, 2)
+    end = f.tell() if end is None else end
+    atoms = []
+    offset = 0
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - offset
+        if size < 8 or offset + size > end:
+            raise FaststartError(f"Invalid {kind!r} atom at offset {offset}")
+        atoms.append(Atom(kind, offset, size))
+        offset += size
+    return atoms
+
+
+def needs_faststart(f: BinaryIO) -> bool:
+    """True when ``moov`` comes after the media data."""
+    kinds = [atom.type for atom in iter_atoms(f)]
+    if b'moov' not in kinds or b'mdat' not in kinds or b'moof' in kinds:
+        return False
+    return kinds.index(b'moov') > kinds.index(b'mdat')
+
+
+def faststart(src: BinaryIO, dst: BinaryIO) -> bool:
+    """
+    Copy an MP4 from ``src`` to ``dst`` with ``moov`` moved to the front
+
+    Only the ``moov`` atom is held in memory; media data is copied in
+    fixed-size chunks. Sample offsets in every ``stco``/``co64`` table are
+    shifted by the size of the relocated ``moov``, and ``stco`` tables are
+    upgraded to ``co64`` when a shifted offset no longer fits in 32 bits.
+    Fragmented files (``moof``) are already streamable and left alone.
+
+    Returns:
+        False, writing nothing, when the file needs no rewrite
+    """
+    if not needs_faststart(src):
+        return False
+
+    atoms = iter_atoms(src)
+    moov = next(atom for atom in atoms if atom.type == b'moov')
+    insert_at = next(atom for atom in atoms if atom.type == b'mdat').offset
+
+    src.seek(moov.offset)
+    moov_data = src.read(moov.size)
+    if _find(moov_data, b'cmov'):
+        raise FaststartError("Compressed moov atoms are not supported")
+
+    # The new moov can grow if stco has to become co64, which moves the
+    # data further; repeat until the size is stable (at most twice).
+    new_moov = moov_data
+    for _ in range(3):
+        shift = len(new_moov)
+        patched = _patch_offsets(moov_data, lambda o: o + shift if insert_at <= o < moov.offset else o)
+        if len(patched) == len(new_moov):
+            new_moov = patched
+            break
+        new_moov = patched
+    else:
+        raise FaststartError("Could not stabilise moov size")
+
+    _copy_range(src, dst, 0, insert_at)
+    dst.write(new_moov)
+    _copy_range(src, dst, insert_at, moov.offset)
+    src.seek(0, 2)
+    _copy_range(src, dst, moov.offset + moov.size, src.tell())
+    return True
+
+
+def read_chunk_offsets(moov_data: bytes) -> List[List[int]]:
+    """Chunk offsets of every track, in track order."""
+    tracks = []
+    for kind, payload in _walk(moov_data):
+        if kind in (b'stco', b'co64'):
+            tracks.append(_decode_offsets(kind, payload))
+    return tracks
+
+
+def _walk(data: bytes):
+    """Yield (type, payload) of every atom under the containers in ``data``."""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, kind, header = _header(data, offset)
+        payload = data[offset + header:offset + size]
+        yield kind, payload
+        if kind in CONTAINER_ATOMS:
+            yield from _walk(payload)
+        offset += size
+
+
+def _patch_offsets(atom_data: bytes, relocate) -> bytes:
+    """Rebuild an atom with every chunk offset passed through ``relocate``."""
+    size, kind, header = _header(atom_data, 0)
+    payload = atom_data[header:size]
+
+    if kind in CONTAINER_ATOMS:
+        children = []
+        offset = 0
+        while offset + 8 <= len(payload):
+            child_size = _header(payload, offset)[0]
+            children.append(_patch_offsets(payload[offset:offset + child_size], relocate))
+            offset += child_size
+        return _atom(kind, b''.join(children))
+
+    if kind in (b'stco', b'co64'):
+        offsets = [relocate(o) for o in _decode_offsets(kind, payload)]
+        if kind == b'stco' and max(offsets, default=0) > MAX_32BIT_OFFSET:
+            kind = b'co64'
+        fmt = '>%dI' if kind == b'stco' else '>%dQ'
+        return _atom(kind, payload[:8] + struct.pack(fmt % len(offsets), *offsets))
+
+    return atom_data[:size]
+
+
+def _decode_offsets(kind: bytes, payload: bytes) -> List[int]:
+    # version/flags (4 bytes), entry count (4 bytes), then the table
+    count = struct.unpack('>I', payload[4:8])[0]
+    fmt = '>%dI' if kind == b'stco' else '>%dQ'
+    width = 4 if kind == b'stco' else 8
+    return list(struct.unpack(fmt % count, payload[8:8 + count * width]))
+
+
+def _header(data: bytes, offset: int):
+    size, kind = struct.unpack('>I4s', data[offset:offset + 8])
+    header = 8
+    if size == 1:
+        size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+        header = 16
+    elif size == 0:
+        size = len(data) - offset
+    if size < header or offset + size > len(data):
+        raise FaststartError(f"Invalid {kind!r} atom in moov")
+    return size, kind, header
+
+
+def _atom(kind: bytes, payload: bytes) -> bytes:
+    size = len(payload) + 8
+    if size > MAX_32BIT_OFFSET:
+        return struct.pack('>I4sQ', 1, kind, size + 8) + payload
+    return struct.pack('>I4s', size, kind) + payload
+
+
+def _find(data: bytes, kind: bytes) -> bool:
+    return any(k == kind for k, _ in _walk(data))
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int) -> None:
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise FaststartError("Unexpected end of file")
+        dst.write(chunk)
+        remaining -= len(chunk)
@@ -0,0 +1,153 @@
+import uuid
+import base64
+import binascii
+from collections import namedtuple
+from datetime import datetime
+from typing import List, Optional
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['created_at', 'pk', 'reverse'])
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first
+
+    Every page is a bounded index range scan starting right after the
+    previous page's last row, so latency does not grow with depth the way
+    OFFSET scans do. Cursors are opaque to clients.
+    """
+
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        rows = list(self.page_queryset(queryset, cursor)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if cursor and cursor.reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def page_queryset(self, queryset, cursor: Optional[Cursor]):
+        """
+        Build the ordered queryset for the page after (or before) ``cursor``
+
+        ``created_at <= ts`` bounds the index scan; the exclude drops the
+        rows of the same timestamp already returned on the previous page.
+        """
+        if cursor is None:
+            return queryset.order_by('-created_at', '-id')
+
+        if cursor.reverse:
+            return (
+                queryset
+                .filter(created_at__gte=cursor.created_at)
+                .exclude(created_at=cursor.created_at, id__lte=cursor.pk)
+                .order_by('created_at', 'id')
+            )
+
+        return (
+            queryset
+            .filter(created_at__lte=cursor.created_at)
+            .exclude(created_at=cursor.created_at, id__gte=cursor.pk)
+            .order_by('-created_at', '-id')
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(Cursor(*self._row_key(self.page[-1]), False))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(Cursor(*self._row_key(self.page[0]), True))
+
+    def decode_cursor(self, request) -> Optional[Cursor]:
+        """Decode the opaque cursor query parameter."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            direction, timestamp, pk = raw.split('|', 2)
+            created_at = parse_datetime(timestamp)
+            pk = uuid.UUID(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if direction not in ('n', 'p') or created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(created_at, pk, direction == 'p')
+
+    @staticmethod
+    def encode_cursor(cursor: Cursor) -> str:
+        """Encode a cursor into an opaque URL-safe token."""
+        created_at = cursor.created_at
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        raw = f"{'p' if cursor.reverse else 'n'}|{created_at}|{cursor.pk}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _row_key(row):
+        """(created_at, pk) of a model instance or a ``.values()`` dict."""
+        if isinstance(row, dict):
+            return row['created_at'], row['id']
+        return row.created_at, row.pk
+
+    def _link(self, cursor: Cursor) -> str:
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(cursor)
+        )
@@ -0,0 +1,25 @@
+from typing import Optional
+from django.conf import settings
+
+def get_client_ip(request) -> Optional[str]:
+    """
+    Get the client IP address as seen by the trusted reverse proxy
+
+    nginx appends the address it accepted the connection from to
+    X-Forwarded-For, so only the last TRUSTED_PROXY_COUNT entries were
+    written by our own proxies; anything to their left is whatever the
+    client sent and must not be trusted.
+
+    Args:
+        request: Django or DRF request
+
+    Returns:
+        Optional[str]: Client IP address if known
+    """
+    hops = settings.TRUSTED_PROXY_COUNT
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if hops and forwarded_for:
+        entries = [entry.strip() for entry in forwarded_for.split(',')]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return request.META.get('REMOTE_ADDR')
@@ -0,0 +1,22 @@
+from typing import Iterable, Optional
+import magic
+
+# Enough for libmagic to tell JPEG, PNG, GIF, WebM and MP4 (ftyp) apart
+SNIFF_BYTES = 2048
+
+
+def sniff_mime_type(head: bytes) -> str:
+    """MIME type of a file judged from its first bytes."""
+    return magic.from_buffer(head, mime=True)
+
+
+def sniff_supported(head: bytes, supported: Iterable[str]) -> Optional[str]:
+    """
+    Sniffed MIME type of ``head`` when it is one of ``supported``
+
+    Returns:
+        The sniffed type, or None when the content is not supported
+        whatever its Content-Type header claimed
+    """
+    mime_type = sniff_mime_type(head)
+    return mime_type if mime_type in supported else None
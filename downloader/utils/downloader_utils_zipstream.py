@@ -0,0 +1,101 @@
+import time
+import zlib
+import struct
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple
+
+CHUNK_SIZE = 64 * 1024
+MAX_ZIP32 = 0xFFFFFFFF
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_OF_CENTRAL_DIR = struct.Struct('<IHHHHIIH')
+
+UTF8_FLAG = 0x0800
+VERSION = 20  # 2.0, stored entries
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    size: int
+    crc32: int
+    mtime: float = 0.0
+
+
+class ZipTooLarge(ValueError):
+    """The archive would need ZIP64 extensions."""
+
+
+def file_crc32(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> int:
+    """CRC-32 of a file object, read in chunks."""
+    crc = 0
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def zip_size(entries: Iterable[ZipEntry]) -> int:
+    """Exact byte size of the stored (uncompressed) archive."""
+    total = END_OF_CENTRAL_DIR.size
+    for entry in entries:
+        name_length = len(entry.name.encode('utf-8'))
+        total += LOCAL_HEADER.size + CENTRAL_HEADER.size + 2 * name_length + entry.size
+    return total
+
+
+def iter_zip(
+    entries: List[ZipEntry],
+    open_entry: Callable[[ZipEntry], BinaryIO],
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Stream a store-only ZIP of ``entries``
+
+    Sizes and CRCs are known upfront, so every local header is final when
+    written and no data descriptors are needed. Memory use is one chunk
+    plus a few bytes of central directory per entry, regardless of the
+    number or size of files.
+    """
+    if zip_size(entries) > MAX_ZIP32 or len(entries) > 0xFFFF:
+        raise ZipTooLarge("Bundle exceeds the 4 GiB / 65535 entry ZIP limit")
+
+    central = []
+    offset = 0
+    for entry in entries:
+        name = entry.name.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        header = LOCAL_HEADER.pack(
+            0x04034b50, VERSION, UTF8_FLAG, 0, dos_time, dos_date,
+            entry.crc32, entry.size, entry.size, len(name), 0
+        ) + name
+        yield header
+
+        written = 0
+        content = open_entry(entry)
+        try:
+            for chunk in iter(lambda: content.read(chunk_size), b''):
+                written += len(chunk)
+                yield chunk
+        finally:
+            content.close()
+        if written != entry.size:
+            raise ValueError(f"{entry.name} changed size while streaming")
+
+        central.append(CENTRAL_HEADER.pack(
+            0x02014b50, VERSION, VERSION, UTF8_FLAG, 0, dos_time, dos_date,
+            entry.crc32, entry.size, entry.size, len(name), 0, 0, 0, 0, 0, offset
+        ) + name)
+        offset += len(header) + entry.size
+
+    directory = b''.join(central)
+    yield directory
+    yield END_OF_CENTRAL_DIR.pack(
+        0x06054b50, 0, 0, len(entries), len(entries), len(directory), offset, 0
+    )
+
+
+def _dos_datetime(timestamp: float):
+    t = time.gmtime(max(timestamp, 315532800))  # DOS dates start in 1980
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
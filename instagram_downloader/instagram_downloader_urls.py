@@ -3,10 +3,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from downloader.views import health_check, liveness, metrics, readiness
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('downloader.urls')),
+    path('health/', health_check, name='health'),
+    path('health/live/', liveness, name='health-live'),
+    path('health/ready/', readiness, name='health-ready'),
+    path('metrics/', metrics, name='metrics'),
     path('', RedirectView.as_view(url='/api/', permanent=False)),
 ]
 
@@ -0,0 +1,10 @@
+#!/bin/sh
+set -e
+
+# Exactly one beat process may run per deployment, or periodic tasks
+# (retention, count flushes, reaper, eviction, tiering, scrub) run twice
+echo "Starting Celery beat..."
+exec celery -A core beat \
+    --loglevel=info \
+    --schedule=${CELERY_BEAT_SCHEDULE_FILE:-/tmp/celerybeat-schedule} \
+    --pidfile=
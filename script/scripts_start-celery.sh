@@ -1,8 +1,16 @@
 #!/bin/sh
 set -e
 
+# Metrics of previous worker processes must not carry over
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting Celery worker..."
 exec celery -A core worker \
     --loglevel=info \
+    --queues=${CELERY_QUEUES:-downloads,default} \
+    --pool=${CELERY_POOL:-prefork} \
     --concurrency=${CELERY_WORKERS:-4} \
     --max-tasks-per-child=${CELERY_MAX_TASKS_PER_CHILD:-100}
\ No newline at end of file
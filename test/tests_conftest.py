@@ -1,5 +1,8 @@
 import os
+import zlib
+import hashlib
 import pytest
+from django.utils import timezone
 from django.conf import settings
 from rest_framework.test import APIClient
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -63,4 +66,35 @@ def create_test_download():
         }
         defaults.update(kwargs)
         return Download.objects.create(**defaults)
-    return _create_download
\ No newline at end of file
+    return _create_download
+
+@pytest.fixture
+def stored_download(create_test_download, temp_media_root):
+    """Create a completed download whose files exist under the temp media root"""
+    def _stored_download(name='downloads/a.jpg', data=b'x' * 1000, more_files=(), **kwargs):
+        # more_files: extra (name, data) pairs listed before the primary file
+        files = []
+        for file_name, content in [*more_files, (name, data)]:
+            path = os.path.join(temp_media_root, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            files.append({
+                'path': file_name,
+                'size': len(content),
+                'crc32': zlib.crc32(content),
+                'sha256': hashlib.sha256(content).hexdigest(),
+                'mime_type': 'image/jpeg',
+            })
+        defaults = {
+            'status': Download.Status.COMPLETED,
+            'file_path': name,
+            'file_size': sum(entry['size'] for entry in files),
+            'mime_type': 'image/jpeg',
+            'content_digest': files[-1]['sha256'],
+            'completed_at': timezone.now(),
+            'files': files,
+        }
+        defaults.update(kwargs)
+        return create_test_download(**defaults)
+    return _stored_download
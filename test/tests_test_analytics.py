@@ -0,0 +1,62 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from downloader.models import Download, DownloadRollup
+from downloader.services.analytics import (
+    get_stats,
+    rebuild_rollups,
+    record_outcome,
+    size_bucket,
+)
+
+pytestmark = pytest.mark.django_db
+
+class TestDownloadRollups:
+    """Test suite for incrementally maintained download rollups"""
+
+    @pytest.mark.parametrize('file_size,expected', [
+        (None, DownloadRollup.SizeBucket.UNKNOWN),
+        (512, DownloadRollup.SizeBucket.SMALL),
+        (5 * 1024 * 1024, DownloadRollup.SizeBucket.MEDIUM),
+        (20 * 1024 * 1024, DownloadRollup.SizeBucket.LARGE),
+        (80 * 1024 * 1024, DownloadRollup.SizeBucket.HUGE),
+    ])
+    def test_size_bucket(self, file_size, expected):
+        """Test file sizes map to the expected buckets"""
+        assert size_bucket(file_size) == expected
+
+    def test_record_outcome_increments_hour_and_day(self, create_test_download):
+        """Test each finished download is counted once per granularity"""
+        for _ in range(3):
+            record_outcome(create_test_download(
+                status=Download.Status.COMPLETED,
+                completed_at=timezone.now(),
+                file_size=2048
+            ))
+
+        for granularity in DownloadRollup.Granularity.values:
+            rollup = DownloadRollup.objects.get(granularity=granularity)
+            assert rollup.count == 3
+            assert rollup.total_bytes == 3 * 2048
+
+    def test_pending_downloads_are_not_counted(self, create_test_download):
+        """Test non-terminal downloads are ignored"""
+        record_outcome(create_test_download())
+        assert not DownloadRollup.objects.exists()
+
+    def test_rebuild_matches_incremental(self, create_test_download):
+        """Test a rebuild produces the same totals as incremental updates"""
+        now = timezone.now()
+        for status in (Download.Status.COMPLETED, Download.Status.FAILED):
+            record_outcome(create_test_download(
+                status=status,
+                completed_at=now if status == Download.Status.COMPLETED else None,
+                file_size=1024
+            ))
+        incremental = get_stats(DownloadRollup.Granularity.DAY, now - timedelta(days=1))
+
+        rebuild_rollups(now - timedelta(days=1), now + timedelta(days=1), log=lambda msg: None)
+        rebuilt = get_stats(DownloadRollup.Granularity.DAY, now - timedelta(days=1))
+
+        assert rebuilt == incremental
+        assert rebuilt[0]['total'] == 2
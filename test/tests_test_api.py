@@ -1,9 +1,11 @@
 import pytest
 from rest_framework import status
 from django.urls import reverse
+from django.utils import timezone
 from downloader.models import Download
 from unittest.mock import patch
 import json
+import base64
 
 pytestmark = pytest.mark.django_db
 
@@ -13,7 +15,7 @@ class TestDownloadAPI:
     @pytest.fixture
     def download_url(self):
         """Get download API endpoint URL"""
-        return reverse('api:download-create')
+        return reverse('download')
 
     def test_create_download_success(self, api_client, download_url, mock_successful_download):
         """Test successful download creation"""
@@ -58,7 +60,7 @@ class TestDownloadAPI:
     def test_download_status_check(self, api_client, create_test_download):
         """Test download status retrieval"""
         download = create_test_download()
-        status_url = reverse('api:download-detail', kwargs={'pk': download.pk})
+        status_url = reverse('download-detail', kwargs={'pk': download.pk})
         
         response = api_client.get(status_url)
         
@@ -119,4 +121,160 @@ class TestDownloadAPI:
         while not results.empty():
             status_codes.append(results.get())
         
-        assert all(code == status.HTTP_202_ACCEPTED for code in status_codes)
\ No newline at end of file
+        assert all(code == status.HTTP_202_ACCEPTED for code in status_codes)
+
+class TestDownloadHistoryAPI:
+    """Test suite for keyset-paginated download history"""
+
+    @pytest.fixture
+    def history_url(self):
+        """Get history API endpoint URL"""
+        return reverse('history-list')
+
+    def test_history_pages_do_not_overlap(self, api_client, history_url, create_test_download):
+        """Test walking next cursors returns every row exactly once"""
+        created = [create_test_download(ip_address='127.0.0.1') for _ in range(7)]
+        
+        seen = []
+        url = f'{history_url}?page_size=3'
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        
+        assert len(seen) == len(created)
+        assert set(seen) == {str(d.id) for d in created}
+
+    def test_history_previous_cursor(self, api_client, history_url, create_test_download):
+        """Test the previous cursor returns the first page again"""
+        for _ in range(4):
+            create_test_download(ip_address='127.0.0.1')
+        
+        first = api_client.get(f'{history_url}?page_size=2')
+        second = api_client.get(first.data['next'])
+        back = api_client.get(second.data['previous'])
+        
+        assert back.data['results'] == first.data['results']
+        assert first.data['previous'] is None
+
+    def test_history_invalid_cursor(self, api_client, history_url):
+        """Test a malformed cursor is rejected"""
+        response = api_client.get(f'{history_url}?cursor=not-a-cursor')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_history_cursor_with_invalid_pk(self, api_client, history_url):
+        """Test a well-formed cursor carrying a non-UUID key is rejected"""
+        cursor = base64.urlsafe_b64encode(b'n|2024-01-01T00:00:00+00:00|1 OR 1=1').decode('ascii')
+        response = api_client.get(f'{history_url}?cursor={cursor}')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_history_ignores_client_supplied_forwarded_for(
+        self, api_client, history_url, create_test_download
+    ):
+        """Test a spoofed leftmost X-Forwarded-For entry cannot read another IP's history"""
+        create_test_download(ip_address='198.51.100.7')
+        
+        response = api_client.get(
+            history_url,
+            HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.50'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == []
+
+
+class TestDownloadStatusCache:
+    """Test suite for cached download status responses"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty cache"""
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_status_returns_etag(self, api_client, create_test_download):
+        """Test status responses carry an ETag"""
+        download = create_test_download()
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        
+        response = api_client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag']
+
+    def test_matching_etag_returns_304(self, api_client, create_test_download):
+        """Test an unchanged poll gets an empty 304"""
+        download = create_test_download()
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        etag = api_client.get(url)['ETag']
+        
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_cache_hit_skips_database(
+        self, api_client, create_test_download, django_assert_num_queries
+    ):
+        """Test a cached status poll runs no queries"""
+        download = create_test_download()
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        api_client.get(url)
+        
+        with django_assert_num_queries(0):
+            response = api_client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_transition_overwrites_cached_status(
+        self, api_client, create_test_download, django_capture_on_commit_callbacks
+    ):
+        """Test a status change is visible immediately with a new ETag"""
+        download = create_test_download()
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        before = api_client.get(url)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            download.status = Download.Status.COMPLETED
+            download.save()
+        after = api_client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        
+        assert after.status_code == status.HTTP_200_OK
+        assert after.data['status'] == Download.Status.COMPLETED
+        assert after['ETag'] != before['ETag']
+
+    def test_poll_across_completion(
+        self, api_client, create_test_download, django_capture_on_commit_callbacks
+    ):
+        """Test pollers see COMPLETED as soon as the worker saves it"""
+        download = create_test_download(status=Download.Status.DOWNLOADING)
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            download.status = Download.Status.COMPLETED
+            download.completed_at = timezone.now()
+            download.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == Download.Status.COMPLETED
+        assert response.data['duration'] is not None
+
+    def test_failed_refresh_drops_cached_status(
+        self, api_client, create_test_download, django_capture_on_commit_callbacks
+    ):
+        """Test a status that cannot be re-cached is read from the database"""
+        download = create_test_download()
+        url = reverse('download-detail', kwargs={'pk': download.pk})
+        etag = api_client.get(url)['ETag']
+        
+        with patch('downloader.signals.cache_status', side_effect=ValueError('boom')), \
+                django_capture_on_commit_callbacks(execute=True):
+            download.status = Download.Status.DOWNLOADING
+            download.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == Download.Status.DOWNLOADING
@@ -0,0 +1,112 @@
+import io
+import os
+import zlib
+import zipfile
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from downloader.models import Download
+from downloader.services.eviction import leased_media
+from downloader.services.integrity import remember_verified
+from downloader.utils.zipstream import ZipEntry, ZipTooLarge, iter_zip, zip_size
+
+pytestmark = pytest.mark.django_db
+
+
+class TestZipStream:
+    """Test suite for store-only ZIP streaming"""
+
+    def test_output_matches_precomputed_size_and_reads_back(self):
+        """Test the streamed archive has the exact size and valid contents"""
+        files = {'01-a.jpg': os.urandom(200000), '02-é.mp4': b'', '03-c.txt': b'hello'}
+        entries = [
+            ZipEntry(name, len(data), zlib.crc32(data), 1700000000.0)
+            for name, data in files.items()
+        ]
+
+        data = b''.join(iter_zip(entries, lambda e: io.BytesIO(files[e.name]), chunk_size=4096))
+
+        assert len(data) == zip_size(entries)
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == files
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+    def test_changed_file_is_rejected(self):
+        """Test a file that no longer matches its recorded size aborts the stream"""
+        entries = [ZipEntry('a.bin', 10, 0)]
+
+        with pytest.raises(ValueError):
+            list(iter_zip(entries, lambda e: io.BytesIO(b'short')))
+
+    def test_archives_beyond_zip32_are_refused(self):
+        """Test bundles that would need ZIP64 are refused before streaming"""
+        entries = [ZipEntry('big.mp4', 0xFFFFFFFF, 0)]
+
+        with pytest.raises(ZipTooLarge):
+            next(iter_zip(entries, lambda e: io.BytesIO()))
+
+
+class TestBundleView:
+    """Test suite for the download bundle endpoint"""
+
+    def test_streams_all_files_with_exact_length(self, api_client, stored_download):
+        """Test every file is bundled under its original name"""
+        first = os.urandom(5000)
+        second = os.urandom(7000)
+        download = stored_download(
+            'downloads/ab/cd/' + 'b' * 32 + '-two.jpg',
+            second,
+            more_files=[('downloads/ab/cd/' + 'a' * 32 + '-one.jpg', first)]
+        )
+        remember_verified(download)
+
+        response = api_client.get(reverse('download-bundle', kwargs={'pk': download.pk}))
+        body = b''.join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/zip'
+        assert int(response['Content-Length']) == len(body)
+        archive = zipfile.ZipFile(io.BytesIO(body))
+        assert archive.namelist() == ['01-one.jpg', '02-two.jpg']
+        assert archive.read('01-one.jpg') == first
+        assert archive.read('02-two.jpg') == second
+
+    def test_lease_is_held_while_streaming(self, api_client, stored_download):
+        """Test the file stays leased until the last chunk has gone out"""
+        download = stored_download()
+        remember_verified(download)
+
+        response = api_client.get(reverse('download-bundle', kwargs={'pk': download.pk}))
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        assert leased_media([download.pk]) == {str(download.pk)}
+
+        b''.join(chunks)
+        assert leased_media([download.pk]) == set()
+
+    def test_backfills_checksums_for_older_rows(self, api_client, stored_download):
+        """Test rows without recorded files are checksummed once and saved"""
+        data = os.urandom(3000)
+        download = stored_download(
+            'downloads/old.jpg', data, files=[], content_digest='', completed_at=None
+        )
+
+        response = api_client.get(reverse('download-bundle', kwargs={'pk': download.pk}))
+        body = b''.join(response.streaming_content)
+
+        assert zipfile.ZipFile(io.BytesIO(body)).read('01-old.jpg') == data
+        download.refresh_from_db()
+        assert download.files[0]['crc32'] == zlib.crc32(data)
+
+    def test_evicted_download_is_gone(self, api_client, create_test_download):
+        """Test evicted downloads cannot be bundled"""
+        download = create_test_download(
+            status=Download.Status.COMPLETED,
+            file_path='downloads/gone.jpg',
+            evicted_at=timezone.now()
+        )
+
+        response = api_client.get(reverse('download-bundle', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 410
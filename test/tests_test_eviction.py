@@ -0,0 +1,133 @@
+import os
+import pytest
+from downloader.models import Download
+from downloader.services.counters import get_redis
+from downloader.services.eviction import (
+    BYTES_KEY,
+    LEASE_KEY,
+    LRU_KEY,
+    SIZES_KEY,
+    MediaLease,
+    evict_media,
+    leased_media,
+    media_lease,
+    rebuild_index,
+    touch_media,
+    track_media,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def media_index(settings):
+    settings.MEDIA_QUOTA_HIGH_WATERMARK = 0.9
+    settings.MEDIA_QUOTA_LOW_WATERMARK = 0.5
+    settings.MEDIA_EVICTION_MIN_IDLE = 0
+    settings.MEDIA_EVICTION_BATCH_SIZE = 2
+    redis = get_redis()
+    redis.delete(LRU_KEY, SIZES_KEY, BYTES_KEY)
+    yield redis
+    redis.delete(LRU_KEY, SIZES_KEY, BYTES_KEY)
+
+
+class TestMediaEviction:
+    """Test suite for the LRU media eviction engine"""
+
+    def _tracked(self, stored_download, name, size=100):
+        download = stored_download(f'downloads/{name}', b'x' * size)
+        track_media(download.id, size)
+        return download
+
+    def test_nothing_evicted_under_high_watermark(self, stored_download, media_index):
+        """Test usage under the high watermark leaves files alone"""
+        self._tracked(stored_download, 'a.jpg')
+
+        result = evict_media(quota=1000)
+
+        assert result == {'usage': 100, 'freed': 0, 'evicted': 0}
+
+    def test_least_recently_used_evicted_first(self, stored_download, media_index):
+        """Test eviction follows access recency down to the low watermark"""
+        downloads = [
+            self._tracked(stored_download, f'{n}.jpg')
+            for n in range(4)
+        ]
+        touch_media(downloads[0].id)
+
+        result = evict_media(quota=400)
+
+        assert result['evicted'] == 2
+        assert result['freed'] == 200
+        evicted = set(Download.objects.filter(evicted_at__isnull=False).values_list('pk', flat=True))
+        assert evicted == {downloads[1].pk, downloads[2].pk}
+        assert not os.path.exists(downloads[1].get_download_path())
+        assert os.path.exists(downloads[0].get_download_path())
+        assert int(media_index.get(BYTES_KEY)) == 200
+
+    def test_leased_file_is_never_evicted(self, stored_download, media_index):
+        """Test files held by a lease are skipped"""
+        first = self._tracked(stored_download, 'a.jpg')
+        second = self._tracked(stored_download, 'b.jpg')
+
+        with media_lease(first.id) as available:
+            assert available
+            result = evict_media(quota=200)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert result['evicted'] == 1
+        assert not first.is_evicted
+        assert second.is_evicted
+        assert os.path.exists(first.get_download_path())
+
+    def test_overrunning_lease_does_not_release_others(self, create_test_download, media_index):
+        """Test a holder outliving its TTL neither pins the file nor drops a newer lease"""
+        download = create_test_download()
+        slow, fresh = media_lease(download.id), media_lease(download.id)
+
+        slow.__enter__()
+        # The slow holder's lease expires while it is still reading
+        media_index.delete(LEASE_KEY.format(download.id))
+        fresh.__enter__()
+        slow.__exit__(None, None, None)
+        assert leased_media([download.id]) == {str(download.id)}
+
+        fresh.__exit__(None, None, None)
+        assert leased_media([download.id]) == set()
+
+    def test_lease_is_renewed_after_a_third_of_its_ttl(self, create_test_download, media_index):
+        """Test a long reader re-takes its lease, but not on every call"""
+        download = create_test_download()
+        lease = MediaLease(download.id, ttl=60)
+        assert lease.acquire()
+        # As if the entry had lapsed
+        media_index.zrem(lease.key, lease.token)
+
+        lease.renew()
+        assert leased_media([download.id]) == set()
+        lease._renewed_at -= 20
+        lease.renew()
+        assert leased_media([download.id]) == {str(download.id)}
+
+        lease.release()
+        assert leased_media([download.id]) == set()
+
+    def test_recently_touched_file_is_not_evicted(self, stored_download, media_index, settings):
+        """Test files inside the idle window are protected"""
+        settings.MEDIA_EVICTION_MIN_IDLE = 3600
+        download = self._tracked(stored_download, 'a.jpg')
+
+        result = evict_media(quota=100)
+
+        download.refresh_from_db()
+        assert result['evicted'] == 0
+        assert not download.is_evicted
+
+    def test_index_rebuilt_from_database(self, stored_download, media_index):
+        """Test a lost index is reseeded from completed rows"""
+        self._tracked(stored_download, 'a.jpg', size=300)
+        media_index.delete(LRU_KEY, SIZES_KEY, BYTES_KEY)
+
+        assert rebuild_index() == 1
+        assert int(media_index.get(BYTES_KEY)) == 300
@@ -0,0 +1,143 @@
+import io
+import os
+import struct
+import pytest
+from downloader.services.postprocess import faststart_mp4
+from downloader.utils.faststart import (
+    FaststartError,
+    _patch_offsets,
+    faststart,
+    iter_atoms,
+    needs_faststart,
+    read_chunk_offsets,
+)
+
+SAMPLES = [
+    [b'A' * 10, b'B' * 7, b'C' * 33],  # video track
+    [b'x' * 5, b'y' * 9],  # audio track
+]
+
+
+def atom(kind, payload):
+    return struct.pack('>I4s', len(payload) + 8, kind) + payload
+
+
+def offsets_atom(offsets, kind=b'stco'):
+    fmt = '>%dI' if kind == b'stco' else '>%dQ'
+    return atom(kind, b'\0' * 4 + struct.pack('>I', len(offsets)) + struct.pack(fmt % len(offsets), *offsets))
+
+
+def build_mp4(samples=SAMPLES, moov_last=True, kind=b'stco', extra=b''):
+    """Minimal ISO BMFF file: ftyp, mdat with the samples, moov pointing at them."""
+    ftyp = atom(b'ftyp', b'isom\0\0\0\x01isom')
+
+    def moov_for(offsets):
+        traks = b''.join(
+            atom(b'trak', atom(b'mdia', atom(b'minf', atom(b'stbl', offsets_atom(track, kind)))))
+            for track in offsets
+        )
+        return atom(b'moov', atom(b'mvhd', b'\0' * 100) + traks)
+
+    def layout(mdat_start):
+        payload, offsets = b'', []
+        for track in samples:
+            offsets.append([])
+            for sample in track:
+                offsets[-1].append(mdat_start + 8 + len(payload))
+                payload += sample
+        return atom(b'mdat', payload), offsets
+
+    if moov_last:
+        mdat, offsets = layout(len(ftyp))
+        return ftyp + mdat + moov_for(offsets) + extra
+
+    moov_size = len(moov_for(layout(0)[1]))
+    mdat, offsets = layout(len(ftyp) + moov_size)
+    return ftyp + moov_for(offsets) + mdat + extra
+
+
+def played_samples(data):
+    """Read every track's samples back through its chunk offset table."""
+    moov = next(a for a in iter_atoms(io.BytesIO(data)) if a.type == b'moov')
+    tracks = read_chunk_offsets(data[moov.offset:moov.offset + moov.size])
+    return [
+        [data[offset:offset + len(sample)] for offset, sample in zip(offsets, track)]
+        for offsets, track in zip(tracks, SAMPLES)
+    ]
+
+
+class TestFaststart:
+    """Test suite for the moov-to-front MP4 remux"""
+
+    @pytest.mark.parametrize('kind', [b'stco', b'co64'])
+    def test_moov_moved_and_samples_still_resolve(self, kind):
+        """Test the rewritten file plays the same samples in the same order"""
+        data = build_mp4(kind=kind)
+        output = io.BytesIO()
+
+        assert faststart(io.BytesIO(data), output)
+
+        result = output.getvalue()
+        assert [a.type for a in iter_atoms(io.BytesIO(result))] == [b'ftyp', b'moov', b'mdat']
+        assert len(result) == len(data)
+        assert played_samples(result) == SAMPLES
+
+    def test_atoms_after_moov_are_kept(self):
+        """Test trailing atoms survive the rewrite"""
+        data = build_mp4(extra=atom(b'free', b'\0' * 16))
+        output = io.BytesIO()
+
+        faststart(io.BytesIO(data), output)
+
+        assert [a.type for a in iter_atoms(io.BytesIO(output.getvalue()))] == [
+            b'ftyp', b'moov', b'mdat', b'free'
+        ]
+        assert played_samples(output.getvalue()) == SAMPLES
+
+    def test_already_faststart_is_untouched(self):
+        """Test files with moov first are not rewritten"""
+        data = build_mp4(moov_last=False)
+        output = io.BytesIO()
+
+        assert not needs_faststart(io.BytesIO(data))
+        assert not faststart(io.BytesIO(data), output)
+        assert output.getvalue() == b''
+        assert played_samples(data) == SAMPLES
+
+    def test_fragmented_file_is_untouched(self):
+        """Test fragmented MP4s are left alone"""
+        data = build_mp4(extra=atom(b'moof', b'\0' * 8))
+        assert not needs_faststart(io.BytesIO(data))
+
+    def test_stco_upgraded_when_offsets_overflow(self):
+        """Test 32-bit offset tables become co64 when shifted past 4GB"""
+        data = build_mp4(moov_last=False)
+        moov = next(a for a in iter_atoms(io.BytesIO(data)) if a.type == b'moov')
+
+        patched = _patch_offsets(data[moov.offset:moov.offset + moov.size], lambda o: o + 2 ** 32)
+
+        assert b'co64' in patched and b'stco' not in patched
+        assert read_chunk_offsets(patched)[0][0] == read_chunk_offsets(
+            data[moov.offset:moov.offset + moov.size]
+        )[0][0] + 2 ** 32
+
+    def test_truncated_file_is_rejected(self):
+        """Test atoms running past the end of the file raise"""
+        data = build_mp4()[:-10]
+        with pytest.raises(FaststartError):
+            needs_faststart(io.BytesIO(data))
+
+    def test_stored_file_rewritten_in_place(self, temp_media_root):
+        """Test post-processing swaps the remuxed file into place"""
+        name = 'downloads/ab/cd/video.mp4'
+        path = os.path.join(temp_media_root, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(build_mp4())
+
+        assert faststart_mp4(name)
+
+        with open(path, 'rb') as f:
+            result = f.read()
+        assert played_samples(result) == SAMPLES
+        assert not faststart_mp4(name)
@@ -0,0 +1,79 @@
+import time
+import threading
+import pytest
+from unittest.mock import patch
+from django.test import RequestFactory
+from downloader.services import health
+from downloader.views import liveness
+
+class TestHealthChecks:
+    """Test suite for liveness and readiness probes"""
+
+    @pytest.fixture(autouse=True)
+    def reset_cache(self, settings):
+        """Fast timeouts and an empty readiness cache"""
+        settings.HEALTH_CHECK_TIMEOUT = 0.2
+        settings.HEALTH_CHECK_CACHE_TTL = 60
+        health._cached = (0.0, {})
+
+    def test_liveness_does_no_io(self):
+        """Test liveness answers without running any check"""
+        with patch.object(health, 'run_checks') as mock_run:
+            response = liveness(RequestFactory().get('/health/live/'))
+        
+        assert response.status_code == 200
+        mock_run.assert_not_called()
+
+    def test_checks_run_concurrently_with_timeouts(self):
+        """Test a hanging check fails alone without delaying the others"""
+        checks = {
+            'fast': lambda: {'ok': True},
+            'slow': lambda: time.sleep(1) or {'ok': True},
+        }
+        with patch.dict(health.CHECKS, checks, clear=True):
+            started = time.monotonic()
+            report = health.run_checks()
+        
+        assert time.monotonic() - started < 0.5
+        assert report['checks']['fast']['ok']
+        assert 'timed out' in report['checks']['slow']['error']
+        assert report['status'] == 'unhealthy'
+
+    def test_hung_check_is_not_submitted_again(self):
+        """Test a check stuck since the last probe holds one thread, not one per probe"""
+        release = threading.Event()
+        calls = []
+
+        def hung():
+            calls.append(1)
+            release.wait(5)
+            return {'ok': True}
+
+        checks = {'hung': hung, 'healthy': lambda: {'ok': True}}
+        try:
+            with patch.dict(health.CHECKS, checks, clear=True):
+                reports = [health.run_checks() for _ in range(6)]
+        finally:
+            release.set()
+
+        assert len(calls) == 1
+        assert 'still running' in reports[-1]['checks']['hung']['error']
+        assert all(report['checks']['healthy']['ok'] for report in reports)
+
+    def test_failing_check_is_reported(self):
+        """Test exceptions are reported as failed checks"""
+        def broken():
+            raise ConnectionError('refused')
+        
+        with patch.dict(health.CHECKS, {'redis': broken}, clear=True):
+            report = health.run_checks()
+        
+        assert report['checks']['redis'] == {'ok': False, 'error': 'refused'}
+
+    def test_readiness_is_cached(self):
+        """Test a probe storm runs the checks only once per TTL"""
+        with patch.object(health, 'run_checks', return_value={'status': 'healthy'}) as mock_run:
+            for _ in range(10):
+                health.get_readiness()
+        
+        assert mock_run.call_count == 1
@@ -0,0 +1,176 @@
+import io
+import os
+import zlib
+import hashlib
+import pytest
+from unittest.mock import patch
+from django.urls import reverse
+from django.utils import timezone
+from downloader.models import Download
+from downloader.services.counters import get_redis
+from downloader.services.integrity import (
+    SCRUB_STATS_KEY,
+    VERIFIED_KEY,
+    VERIFY_QUEUED_KEY,
+    check_integrity,
+    remember_verified,
+    scrub_media,
+    verify_media,
+)
+from downloader.utils.digest import StreamDigest, digest_file
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def integrity_state():
+    redis = get_redis()
+    redis.delete(VERIFIED_KEY, SCRUB_STATS_KEY)
+    yield redis
+    redis.delete(VERIFIED_KEY, SCRUB_STATS_KEY)
+
+
+class TestStreamDigest:
+    """Test suite for single-pass stream digests"""
+
+    def test_chunked_digest_matches_whole_file(self):
+        """Test feeding chunks gives the same length, CRC and SHA-256"""
+        data = os.urandom(300000)
+
+        digest = digest_file(io.BytesIO(data), chunk_size=7000)
+
+        assert digest.size == len(data)
+        assert digest.crc32 == zlib.crc32(data)
+        assert digest.sha256 == hashlib.sha256(data).hexdigest()
+
+    def test_empty_stream(self):
+        """Test an empty stream has the digests of no bytes"""
+        digest = StreamDigest()
+
+        assert (digest.size, digest.crc32) == (0, 0)
+        assert digest.sha256 == hashlib.sha256(b'').hexdigest()
+
+
+class TestIntegrityChecks:
+    """Test suite for serve-time checks and full verification"""
+
+    def test_unchanged_file_is_verified_from_metadata(self, stored_download, integrity_state):
+        """Test a file untouched since hashing passes without being read"""
+        download = stored_download()
+        remember_verified(download)
+
+        with patch('downloader.services.integrity.digest_file') as mock_digest:
+            assert check_integrity(download) is True
+        mock_digest.assert_not_called()
+
+    def test_size_change_is_flagged_at_once(self, stored_download, integrity_state):
+        """Test a truncated file is flagged corrupt by the stat alone"""
+        download = stored_download()
+        path = download.get_download_path()
+        remember_verified(download)
+        with open(path, 'r+b') as f:
+            f.truncate(10)
+
+        assert check_integrity(download) is False
+        download.refresh_from_db()
+        assert download.is_corrupt
+
+    def test_missing_file_on_stale_row_is_not_flagged(self, stored_download, integrity_state):
+        """Test a file moved away after the row was loaded is left to verification"""
+        download = stored_download()
+        path = download.get_download_path()
+        remember_verified(download)
+        Download.objects.filter(pk=download.pk).update(storage_tier=Download.StorageTier.COLD)
+        os.remove(path)
+
+        assert check_integrity(download) is None
+        download.refresh_from_db()
+        assert not download.is_corrupt
+
+    def test_missing_file_is_flagged_by_verification(self, stored_download, integrity_state):
+        """Test a file gone while its row still points at it is flagged"""
+        download = stored_download()
+        path = download.get_download_path()
+        os.remove(path)
+
+        assert verify_media(download.pk) is False
+        download.refresh_from_db()
+        assert download.is_corrupt
+
+    def test_touched_file_needs_rehash(self, stored_download, integrity_state):
+        """Test a new mtime with the same size asks for verification"""
+        download = stored_download()
+        path = download.get_download_path()
+        remember_verified(download)
+        os.utime(path, (1, 1))
+
+        assert check_integrity(download) is None
+
+    def test_same_size_tampering_is_caught_by_verification(self, stored_download, integrity_state):
+        """Test a flipped byte fails the digest comparison"""
+        download = stored_download()
+        path = download.get_download_path()
+        with open(path, 'r+b') as f:
+            f.seek(500)
+            f.write(b'y')
+
+        assert verify_media(download.pk) is False
+        download.refresh_from_db()
+        assert download.corrupted_at is not None
+
+    def test_intact_file_is_verified(self, stored_download, integrity_state):
+        """Test verification stamps the row and caches the fingerprint"""
+        download = stored_download()
+
+        assert verify_media(download.pk) is True
+        download.refresh_from_db()
+        assert download.verified_at is not None
+        assert check_integrity(download) is True
+
+
+class TestScrubber:
+    """Test suite for the background integrity scrubber"""
+
+    def test_least_recently_verified_first_within_batch(self, stored_download, integrity_state):
+        """Test a run is bounded and picks never-verified files first"""
+        verified = stored_download('downloads/old.jpg', verified_at=timezone.now())
+        fresh = stored_download('downloads/new.jpg')
+
+        result = scrub_media(batch_size=1, max_bytes=0)
+
+        assert result == {'checked': 1, 'corrupt': 0, 'bytes': 1000}
+        fresh.refresh_from_db()
+        verified.refresh_from_db()
+        assert fresh.verified_at > verified.verified_at
+
+    def test_corrupt_files_are_counted(self, stored_download, integrity_state):
+        """Test damaged files are flagged and reported"""
+        download = stored_download()
+        path = download.get_download_path()
+        with open(path, 'wb') as f:
+            f.write(b'z' * 1000)
+
+        result = scrub_media(batch_size=10, max_bytes=0)
+
+        assert result['corrupt'] == 1
+        assert Download.objects.get(pk=download.pk).is_corrupt
+
+    def test_corrupt_download_is_not_served(self, api_client, stored_download, integrity_state):
+        """Test the file endpoint refuses files that failed verification"""
+        download = stored_download(corrupted_at=timezone.now())
+
+        response = api_client.get(reverse('download-file', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 410
+
+    def test_unverified_download_is_served_while_broker_is_down(
+        self, api_client, stored_download, integrity_state
+    ):
+        """Test a failed rehash publish serves the file and can be retried"""
+        download = stored_download()
+
+        with patch('downloader.views.verify_media.delay', side_effect=ConnectionError):
+            response = api_client.get(reverse('download-file', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 302
+        assert not integrity_state.exists(VERIFY_QUEUED_KEY.format(download.pk))
@@ -0,0 +1,77 @@
+import pytest
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from downloader.services.metrics import STAGE_SECONDS, error_class, stage
+
+pytestmark = pytest.mark.django_db
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    """Test suite for Prometheus instrumentation"""
+
+    def test_stage_records_duration(self):
+        """Test a timed block lands in the stage histogram"""
+        before = sample('downloader_stage_seconds_count', stage='parse')
+
+        with stage('parse'):
+            pass
+
+        assert sample('downloader_stage_seconds_count', stage='parse') == before + 1
+
+    def test_stage_counts_errors_by_class(self):
+        """Test a failing stage is timed and counted under its exception class"""
+        before = sample('downloader_stage_errors_total', stage='transfer', error_class='TimeoutError')
+
+        with pytest.raises(TimeoutError):
+            with stage('transfer'):
+                raise TimeoutError()
+
+        assert sample(
+            'downloader_stage_errors_total', stage='transfer', error_class='TimeoutError'
+        ) == before + 1
+        assert error_class(None) == ''
+
+    def test_requests_are_labelled_by_url_name(self, api_client):
+        """Test API latency is recorded per URL name and status class"""
+        labels = {'view': 'health-live', 'method': 'GET', 'status': '2xx'}
+        before = sample('downloader_http_request_seconds_count', **labels)
+
+        api_client.get(reverse('health-live'))
+
+        assert sample('downloader_http_request_seconds_count', **labels) == before + 1
+
+    def test_unknown_methods_share_one_label(self, api_client):
+        """Test arbitrary request methods cannot add label values"""
+        labels = {'view': 'health-live', 'method': 'other', 'status': '2xx'}
+        before = sample('downloader_http_request_seconds_count', **labels)
+
+        api_client.generic('PROPFIND', reverse('health-live'))
+
+        assert sample('downloader_http_request_seconds_count', **labels) == before + 1
+        assert sample(
+            'downloader_http_request_seconds_count', view='health-live', method='PROPFIND', status='2xx'
+        ) == 0
+
+    def test_endpoint_serves_prometheus_text(self, api_client):
+        """Test the scrape endpoint returns the text exposition format"""
+        STAGE_SECONDS.labels('page_fetch').observe(0.2)
+
+        response = api_client.get(reverse('metrics'))
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        assert b'downloader_stage_seconds_bucket{' in response.content
+
+    def test_endpoint_requires_token_when_configured(self, api_client, settings):
+        """Test scrapes must present METRICS_TOKEN once one is set"""
+        settings.METRICS_TOKEN = 'scrape-secret'
+
+        denied = api_client.get(reverse('metrics'))
+        allowed = api_client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+
+        assert denied.status_code == 403
+        assert allowed.status_code == 200
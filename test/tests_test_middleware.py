@@ -0,0 +1,85 @@
+import json
+import hashlib
+import logging
+import pytest
+from unittest.mock import Mock
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+from downloader.middleware import RateLimitMiddleware, parse_rate
+
+class TestRateLimitMiddleware:
+    """Test suite for the sliding-window rate-limit middleware"""
+
+    @pytest.fixture
+    def middleware(self, settings):
+        """Middleware with a stubbed Lua script"""
+        settings.RATE_LIMIT_ENABLED = True
+        settings.RATE_LIMITS = {'default': '2/minute'}
+        middleware = RateLimitMiddleware(lambda request: HttpResponse())
+        middleware._script = Mock()
+        return middleware
+
+    def _request(self, **extra):
+        request = RequestFactory().get('/api/stats/', **extra)
+        request.resolver_match = resolve('/api/stats/')
+        return request
+
+    @pytest.mark.parametrize('rate,expected', [
+        ('10/minute', (10, 60)),
+        ('5/s', (5, 1)),
+        ('1000/hour', (1000, 3600)),
+        ('100/day', (100, 86400)),
+    ])
+    def test_parse_rate(self, rate, expected):
+        """Test DRF-style rates are parsed"""
+        assert parse_rate(rate) == expected
+
+    def test_allowed_request_passes(self, middleware):
+        """Test requests within budget reach the view"""
+        middleware._script.return_value = [1, 1, 0]
+        request = self._request()
+        
+        assert middleware.process_view(request, None, (), {}) is None
+        assert request.rate_limit == (2, 1)
+
+    def test_rejected_request_has_retry_after(self, middleware):
+        """Test over-budget requests get a 429 with an exact retry_after"""
+        middleware._script.return_value = [0, 2, 12500]
+        
+        response = middleware.process_view(self._request(), None, (), {})
+        
+        assert response.status_code == 429
+        assert response['Retry-After'] == '13'
+
+    def test_rejection_is_not_logged_as_error(self, middleware, caplog):
+        """Test a 429 is logged below ERROR so floods do not fill the error log"""
+        middleware._script.return_value = [0, 2, 1000]
+        
+        with caplog.at_level(logging.INFO):
+            response = middleware.process_view(self._request(), None, (), {})
+        
+        assert json.loads(response.content)['error']['code'] == 'RATE_LIMIT_EXCEEDED'
+        assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+
+    def test_identity_prefers_api_key(self, middleware, settings):
+        """Test issued API keys take precedence over the client IP"""
+        settings.RATE_LIMIT_API_KEYS = [hashlib.sha256(b'secret').hexdigest()]
+        request = self._request(HTTP_X_API_KEY='secret')
+        
+        identity = middleware.get_identity(request)
+        
+        assert identity.startswith('key:')
+        assert 'secret' not in identity
+
+    def test_unknown_api_key_is_charged_by_ip(self, middleware, settings):
+        """Test random keys cannot mint fresh budgets"""
+        settings.RATE_LIMIT_API_KEYS = []
+        request = self._request(HTTP_X_API_KEY='random', REMOTE_ADDR='203.0.113.9')
+        
+        assert middleware.get_identity(request) == 'ip:203.0.113.9'
+
+    def test_identity_falls_back_to_ip(self, middleware):
+        """Test anonymous clients are keyed by IP"""
+        request = self._request(REMOTE_ADDR='203.0.113.9')
+        assert middleware.get_identity(request) == 'ip:203.0.113.9'
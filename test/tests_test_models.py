@@ -1,6 +1,12 @@
 import pytest
 from django.core.exceptions import ValidationError
 from downloader.models import Download
+from downloader.services.counters import (
+    FLUSHING_KEY,
+    flush_download_counts,
+    get_redis,
+    pending_download_counts,
+)
 from django.utils import timezone
 import os
 
@@ -43,10 +49,28 @@ class TestDownloadModel:
         initial_count = download.download_count
         
         download.increment_download_count()
+        assert download.live_download_count == initial_count + 1
+        
+        flush_download_counts()
         download.refresh_from_db()
         
         assert download.download_count == initial_count + 1
 
+    def test_flush_drops_hash_left_after_commit(self, create_test_download):
+        """Test a flush that crashed after committing is not counted twice"""
+        download = create_test_download()
+        download.increment_download_count()
+        flush_download_counts()
+        # As if the previous flush died before deleting its hash
+        get_redis().hset(FLUSHING_KEY, str(download.pk), 1)
+
+        flush_download_counts()
+        download.refresh_from_db()
+
+        assert download.download_count == 1
+        assert pending_download_counts([download.pk]) == {}
+        assert download.live_download_count == 1
+
     def test_status_properties(self, create_test_download):
         """Test status-related properties"""
         download = create_test_download()
@@ -92,5 +116,6 @@ class TestDownloadModel:
         for _ in range(5):
             download.increment_download_count()
         
+        flush_download_counts()
         download.refresh_from_db()
         assert download.download_count == 5
\ No newline at end of file
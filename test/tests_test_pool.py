@@ -0,0 +1,92 @@
+import pytest
+from core.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    """Minimal DB-API connection stand-in"""
+
+    def __init__(self):
+        self.closed = False
+        self.autocommit = True
+        self.pings = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, sql):
+                if connection.closed:
+                    raise RuntimeError('connection closed')
+                connection.pings += 1
+
+        return Cursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class TestConnectionPool:
+    """Test suite for the per-process DB connection pool"""
+
+    def test_connections_are_reused(self):
+        """Test a returned connection is handed out again"""
+        pool = ConnectionPool(max_size=2)
+        first = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        
+        assert pool.getconn(FakeConnection) is first
+        assert pool.stats()['connections_created'] == 1
+
+    def test_pool_blocks_then_times_out(self):
+        """Test checkout fails after the timeout when the pool is exhausted"""
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.getconn(FakeConnection)
+        
+        with pytest.raises(PoolTimeout):
+            pool.getconn(FakeConnection)
+        
+        stats = pool.stats()
+        assert stats['timeouts'] == 1
+        assert stats['saturated_checkouts'] == 1
+        assert stats['saturation'] == 1.0
+
+    def test_stale_connection_is_health_checked(self):
+        """Test idle connections are pinged and dead ones replaced"""
+        pool = ConnectionPool(max_size=1, health_check_after=0)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+        connection.closed = True
+        
+        replacement = pool.getconn(FakeConnection)
+        
+        assert replacement is not connection
+        assert pool.stats()['connections_discarded'] == 1
+
+    def test_expired_connection_is_recycled(self):
+        """Test connections past their lifetime are closed on return"""
+        pool = ConnectionPool(max_size=1, max_lifetime=0)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+        
+        assert connection.closed
+        assert pool.stats()['idle'] == 0
+
+    def test_foreign_connection_is_ignored(self):
+        """Test returning a connection the pool never handed out is a no-op"""
+        pool = ConnectionPool(max_size=1)
+        inherited = FakeConnection()
+
+        pool.putconn(inherited)
+
+        assert not inherited.closed
+        stats = pool.stats()
+        assert stats['connections_discarded'] == 0
+        assert stats['idle'] == 0
+        pool.getconn(FakeConnection)
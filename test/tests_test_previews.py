@@ -0,0 +1,96 @@
+import io
+import os
+import time
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from django.urls import reverse
+from downloader.models import Download
+from downloader.services.counters import get_redis
+from downloader.services.previews import (
+    PREVIEW_QUEUED_KEY,
+    generate_previews,
+    get_pool,
+    preview_name,
+    render_preview,
+    run_in_pool,
+)
+from downloader.services.storage import get_storage
+
+pytestmark = pytest.mark.django_db
+
+
+def jpeg_bytes(width=2000, height=1500):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+class TestPreviews:
+    """Test suite for preview rendering"""
+
+    @pytest.mark.parametrize('draft', [True, False])
+    def test_render_fits_requested_size(self, draft):
+        """Test previews keep aspect ratio inside the bounding box"""
+        data = render_preview(jpeg_bytes(), (160, 160), draft=draft)
+
+        preview = Image.open(io.BytesIO(data))
+        assert preview.format == 'JPEG'
+        assert preview.size == (160, 120)
+
+    def test_eager_variants_generated(self, stored_download, settings):
+        """Test eager variants are stored under the content hash"""
+        settings.MEDIA_PREVIEW_EAGER = ['small']
+        download = stored_download('downloads/ab/cd/a.jpg', jpeg_bytes())
+
+        result = generate_previews(download.pk)
+
+        download.refresh_from_db()
+        assert result == {'small': preview_name(download.preview_hash, 'small')}
+        assert get_storage().exists(result['small'])
+
+    def test_identical_content_shares_previews(self, stored_download):
+        """Test previews are cached by content, not by download"""
+        first = stored_download('downloads/ab/cd/a.jpg', jpeg_bytes())
+        second = stored_download('downloads/ef/01/b.jpg', jpeg_bytes())
+
+        assert generate_previews(first.pk) == generate_previews(second.pk)
+
+    def test_missing_variant_is_queued_not_rendered_inline(self, api_client, stored_download):
+        """Test a lazy variant is rendered by a worker and redirected to once stored"""
+        download = stored_download('downloads/ab/cd/a.jpg', jpeg_bytes())
+        get_redis().delete(PREVIEW_QUEUED_KEY.format(download.pk, 'large'))
+        url = reverse('download-preview', kwargs={'pk': download.pk, 'variant': 'large'})
+
+        with patch('downloader.views.generate_previews.delay') as mock_delay:
+            first = api_client.get(url)
+            second = api_client.get(url)
+
+        assert first.status_code == second.status_code == 202
+        mock_delay.assert_called_once_with(str(download.pk), ['large'])
+
+        generate_previews(download.pk, ['large'])
+        response = api_client.get(url)
+
+        download.refresh_from_db()
+        assert response.status_code == 302
+        assert response['Location'].endswith(preview_name(download.preview_hash, 'large'))
+
+    def test_broken_pool_is_replaced(self):
+        """Test a pool whose child died is rebuilt instead of failing every render"""
+        get_pool().submit(os._exit, 1)
+        time.sleep(0.5)
+
+        data = run_in_pool(render_preview, jpeg_bytes(), (160, 160))
+
+        assert Image.open(io.BytesIO(data)).size == (160, 120)
+
+    def test_unknown_variant_not_found(self, api_client, create_test_download):
+        """Test only configured sizes are served"""
+        download = create_test_download(status=Download.Status.COMPLETED)
+
+        response = api_client.get(
+            reverse('download-preview', kwargs={'pk': download.pk, 'variant': 'huge'})
+        )
+
+        assert response.status_code == 404
@@ -0,0 +1,124 @@
+import io
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from django.test import RequestFactory
+from django.urls import reverse
+from downloader.services.counters import get_redis
+from downloader.services.integrity import remember_verified
+from downloader.services.profiles import (
+    PROFILE_QUEUED_KEY,
+    SKIPPED_KEY,
+    STATS_KEY,
+    encode_profile,
+    profile_stats,
+    render_profile,
+    select_profile,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def clean_profile_stats(settings):
+    redis = get_redis()
+    keys = [STATS_KEY.format(p) for p in settings.MEDIA_DELIVERY_PROFILES] + [SKIPPED_KEY]
+    redis.delete(*keys)
+    yield
+    redis.delete(*keys)
+
+
+def photo_bytes(width=2400, height=1600):
+    image = Image.effect_noise((width, height), 40).convert('RGB')
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=95)
+    return output.getvalue()
+
+
+class TestDeliveryProfiles:
+    """Test suite for image re-encoding profiles"""
+
+    def test_encode_respects_max_edge_and_format(self):
+        """Test profiles set the output format and bound the long edge"""
+        data, cpu_seconds = encode_profile(
+            photo_bytes(), {'format': 'WEBP', 'quality': 70, 'max_edge': 1200}
+        )
+
+        image = Image.open(io.BytesIO(data))
+        assert image.format == 'WEBP'
+        assert max(image.size) == 1200
+        assert cpu_seconds >= 0
+
+    @pytest.mark.parametrize('query,accept,mime_type,expected', [
+        ({'profile': 'mobile'}, '', 'image/jpeg', 'mobile'),
+        ({'profile': 'original'}, 'image/webp,*/*', 'image/jpeg', None),
+        ({}, 'image/avif,image/webp,*/*', 'image/jpeg', 'webp'),
+        ({}, 'image/png,*/*', 'image/jpeg', None),
+        ({'profile': 'mobile'}, 'image/webp,*/*', 'image/gif', None),
+        ({'profile': 'mobile'}, '', 'video/mp4', None),
+    ])
+    def test_select_profile(self, settings, query, accept, mime_type, expected):
+        """Test profile selection by query parameter and Accept header"""
+        settings.MEDIA_WEBP_ACCEPT_PROFILE = 'webp'
+        request = RequestFactory().get('/', query, HTTP_ACCEPT=accept)
+        assert select_profile(request, mime_type) == expected
+
+    def test_accept_header_ignored_by_default(self):
+        """Test browsers advertising WebP still get the original unless configured"""
+        request = RequestFactory().get('/', HTTP_ACCEPT='image/avif,image/webp,*/*')
+        assert select_profile(request, 'image/jpeg') is None
+
+    def test_animated_images_are_not_reencoded(self):
+        """Test multi-frame images are left alone instead of losing frames"""
+        frames = [Image.new('RGB', (64, 64), color) for color in ('red', 'blue')]
+        output = io.BytesIO()
+        frames[0].save(output, 'GIF', save_all=True, append_images=frames[1:])
+
+        data, _ = encode_profile(output.getvalue(), {'format': 'WEBP', 'quality': 80})
+
+        assert data is None
+
+    def test_render_cached_and_reported(self, stored_download, clean_profile_stats):
+        """Test renders are cached per content hash and profile"""
+        download = stored_download('downloads/ab/cd/photo.jpg', photo_bytes())
+
+        name = render_profile(download.pk, 'mobile')
+
+        assert name.endswith('/mobile.webp')
+        assert render_profile(download.pk, 'mobile') == name
+        stats = profile_stats()['mobile']
+        assert stats['renders'] == 1
+        assert 0 < stats['size_reduction'] < 1
+        assert stats['cpu_ms_per_render'] > 0
+
+    def test_file_view_serves_rendered_profile(self, api_client, stored_download, clean_profile_stats):
+        """Test the original is served until the profile exists, then the profile"""
+        download = stored_download('downloads/ab/cd/photo.jpg', photo_bytes())
+        remember_verified(download)
+        url = reverse('download-file', kwargs={'pk': download.pk})
+
+        with patch('downloader.views.render_profile.delay') as mock_render:
+            first = api_client.get(url, {'profile': 'mobile'})
+            api_client.get(url, {'profile': 'mobile'})
+        mock_render.assert_called_once_with(str(download.pk), 'mobile')
+        assert first['Location'].endswith('/photo.jpg')
+
+        render_profile(download.pk, 'mobile')
+        second = api_client.get(url, {'profile': 'mobile'})
+
+        assert second['Location'].endswith('/mobile.webp')
+        assert second['Vary'] == 'Accept'
+
+    def test_broker_outage_still_serves_original(self, api_client, stored_download, clean_profile_stats):
+        """Test a failed publish serves the original and leaves the render unclaimed"""
+        download = stored_download('downloads/ab/cd/photo.jpg', photo_bytes())
+        remember_verified(download)
+
+        with patch('downloader.views.render_profile.delay', side_effect=ConnectionError):
+            response = api_client.get(
+                reverse('download-file', kwargs={'pk': download.pk}), {'profile': 'mobile'}
+            )
+
+        assert response.status_code == 302
+        assert response['Location'].endswith('/photo.jpg')
+        assert not get_redis().exists(PROFILE_QUEUED_KEY.format(download.pk, 'mobile'))
@@ -0,0 +1,75 @@
+import os
+import time
+import pytest
+from unittest.mock import patch
+from django.urls import reverse
+from downloader.services.profiling import SamplingProfiler, prune_profiles, write_profile
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_SAMPLE_RATE = 0
+    settings.PROFILING_TOKEN = 'secret'
+    settings.PROFILING_INTERVAL = 0.001
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_MAX_FILES = 3
+    return tmp_path
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+class TestSamplingProfiler:
+    """Test suite for the on-demand sampling profiler"""
+
+    def test_samples_collapse_to_the_running_stack(self, profiling):
+        """Test samples are counted per outer-to-leaf stack"""
+        with SamplingProfiler() as profiler:
+            spin(0.2)
+
+        assert profiler.samples > 0
+        top_stack, _ = profiler.stacks.most_common(1)[0]
+        assert top_stack.split(';')[-1].startswith('spin ')
+
+    def test_profiles_are_written_collapsed_and_bounded(self, profiling):
+        """Test only the newest PROFILING_MAX_FILES profiles are kept"""
+        for n in range(5):
+            with SamplingProfiler() as profiler:
+                spin(0.02)
+            path = write_profile(profiler, 'task', f'job-{n}')
+            os.utime(path, (n, n))
+
+        files = sorted(os.listdir(profiling))
+        assert len(files) == 3
+        assert all(name.endswith('.collapsed') for name in files)
+        stack, count = open(path).readline().rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+        assert prune_profiles(str(profiling), 1) == 2
+
+    def test_requests_are_profiled_only_with_the_token(self, api_client, profiling):
+        """Test the X-Profile header opts a request in when it carries the token"""
+        url = reverse('health-live')
+
+        with patch('downloader.middleware.write_profile', return_value='/tmp/x.collapsed') as mock_write:
+            plain = api_client.get(url, HTTP_X_PROFILE='wrong')
+            assert not mock_write.called
+            profiled = api_client.get(url, HTTP_X_PROFILE='secret')
+
+        assert 'X-Profile-File' not in plain
+        assert profiled['X-Profile-File'] == 'x.collapsed'
+        assert mock_write.call_args[0][1:] == ('request', 'GET-health-live')
+
+    def test_disabled_by_default(self, api_client, settings, profiling):
+        """Test nothing is profiled while PROFILING_ENABLED is off"""
+        settings.PROFILING_ENABLED = False
+
+        response = api_client.get(reverse('health-live'), HTTP_X_PROFILE='secret')
+
+        assert 'X-Profile-File' not in response
+        assert os.listdir(profiling) == []
@@ -0,0 +1,72 @@
+import pytest
+from datetime import date, timedelta
+from django.utils import timezone
+from downloader.models import Download
+from downloader.services.retention import (
+    add_months,
+    parent_index_statements,
+    partition_name,
+    purge_expired_rows,
+    _partition_month,
+)
+
+pytestmark = pytest.mark.django_db
+
+class TestRetention:
+    """Test suite for download retention and partition helpers"""
+
+    @pytest.mark.parametrize('start,months,expected', [
+        (date(2024, 1, 1), 1, date(2024, 2, 1)),
+        (date(2024, 12, 1), 1, date(2025, 1, 1)),
+        (date(2024, 1, 1), -1, date(2023, 12, 1)),
+        (date(2024, 6, 1), 14, date(2025, 8, 1)),
+    ])
+    def test_add_months(self, start, months, expected):
+        """Test month arithmetic across year boundaries"""
+        assert add_months(start, months) == expected
+
+    def test_partition_name_round_trip(self):
+        """Test partition names parse back to their month"""
+        name = partition_name(date(2024, 3, 1))
+        assert name.endswith('_p202403')
+        assert _partition_month(name) == date(2024, 3, 1)
+        assert _partition_month('downloader_download_legacy') is None
+
+    def test_parent_indexes_follow_the_model(self):
+        """Test the partitioned parent gets every index the model declares"""
+        statements = parent_index_statements()
+
+        for index in Download._meta.indexes:
+            assert any(f'"{index.name}"' in statement for statement in statements)
+        inflight = next(s for s in statements if '"download_inflight_idx"' in s)
+        assert 'INCLUDE' in inflight
+        assert 'WHERE' in inflight
+        assert any('"created_at"' in s and 'INDEX ON' in s for s in statements)
+
+    def test_purge_expired_rows_in_batches(self, create_test_download):
+        """Test only expired rows are deleted, batch by batch"""
+        old = timezone.now() - timedelta(days=200)
+        for _ in range(5):
+            download = create_test_download()
+            Download.objects.filter(pk=download.pk).update(created_at=old)
+        fresh = create_test_download()
+
+        deleted = purge_expired_rows(
+            timezone.now() - timedelta(days=90),
+            batch_size=2,
+            pause=0
+        )
+
+        assert deleted == 5
+        assert list(Download.objects.values_list('pk', flat=True)) == [fresh.pk]
+
+    def test_recent_queryset(self, create_test_download):
+        """Test the hot-window queryset excludes old rows"""
+        old = create_test_download()
+        Download.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+        fresh = create_test_download()
+
+        assert list(Download.objects.recent(days=30)) == [fresh]
+        assert list(Download.objects.expired(days=90)) == [Download.objects.get(pk=old.pk)]
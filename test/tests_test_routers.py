@@ -0,0 +1,87 @@
+import pytest
+from contextvars import copy_context
+from django.http import HttpResponse
+from django.test import RequestFactory
+from core.routers import (
+    ReplicaPinningMiddleware,
+    ReplicaRouter,
+    replica_reads,
+    use_primary,
+)
+from downloader.models import Download
+
+class TestReplicaRouter:
+    """Test suite for read-replica routing"""
+
+    @pytest.fixture
+    def router(self, settings):
+        """Router with a single replica that is never lagging"""
+        settings.DATABASE_REPLICAS = ['replica_0']
+        settings.REPLICA_ROUTED_APPS = ['downloader']
+        settings.REPLICA_MAX_LAG_SECONDS = 0
+        return ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self, router):
+        """Test reads outside a request stay on the primary"""
+        assert router.db_for_read(Download) == 'default'
+
+    def test_reads_use_replica_when_enabled(self, router):
+        """Test safe reads go to the replica"""
+        with replica_reads():
+            assert router.db_for_read(Download) == 'replica_0'
+
+    def test_write_pins_to_primary(self, router):
+        """Test reads after a write in the same block use the primary"""
+        with replica_reads():
+            assert router.db_for_read(Download) == 'replica_0'
+            assert router.db_for_write(Download) == 'default'
+            assert router.db_for_read(Download) == 'default'
+
+        with replica_reads():
+            assert router.db_for_read(Download) == 'replica_0'
+
+    def test_earlier_write_does_not_pin_later_blocks(self, router):
+        """Test a write outside any scope does not keep a worker on the primary"""
+        def task():
+            router.db_for_write(Download)
+            with replica_reads():
+                return router.db_for_read(Download)
+
+        # The unscoped pin outlives the call, so keep it out of the other tests
+        assert copy_context().run(task) == 'replica_0'
+
+    def test_use_primary_forces_primary(self, router):
+        """Test use_primary() overrides replica reads"""
+        with replica_reads(), use_primary():
+            assert router.db_for_read(Download) == 'default'
+        with use_primary(), replica_reads():
+            assert router.db_for_read(Download) == 'default'
+
+    def test_migrations_only_on_primary(self, router):
+        """Test replicas are never migrated"""
+        assert router.allow_migrate('default', 'downloader')
+        assert not router.allow_migrate('replica_0', 'downloader')
+
+    def test_middleware_sets_pin_cookie_after_write(self, router, settings):
+        """Test a writing request pins the client to the primary"""
+        def view(request):
+            router.db_for_write(Download)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(RequestFactory().post('/api/download/'))
+
+        assert settings.REPLICA_PIN_COOKIE in response.cookies
+
+    def test_middleware_pinned_client_reads_primary(self, router, settings):
+        """Test a client holding the pin cookie reads from the primary"""
+        seen = {}
+
+        def view(request):
+            seen['alias'] = router.db_for_read(Download)
+            return HttpResponse()
+
+        request = RequestFactory().get('/api/history/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        ReplicaPinningMiddleware(view)(request)
+
+        assert seen['alias'] == 'default'
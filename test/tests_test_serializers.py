@@ -0,0 +1,65 @@
+import json
+import pytest
+from datetime import datetime
+from django.utils import timezone
+from downloader.models import Download
+from downloader.serializers import (
+    DOWNLOAD_ROW_FIELDS,
+    DownloadSerializer,
+    download_row,
+    format_file_size,
+    serialize_download_row,
+)
+from downloader.utils.renderers import FastJSONRenderer
+
+pytestmark = pytest.mark.django_db
+
+class TestFastSerialization:
+    """Test suite for the read-optimised serialization path"""
+
+    @pytest.mark.parametrize('size,expected', [
+        (None, None),
+        (0, None),
+        (512, '512.0 B'),
+        (2048, '2.0 KB'),
+        (5 * 1024 * 1024, '5.0 MB'),
+    ])
+    def test_format_file_size(self, size, expected):
+        """Test human-readable sizes"""
+        assert format_file_size(size) == expected
+
+    def test_formatting_has_no_side_effects(self, create_test_download):
+        """Test serializing twice does not corrupt file_size"""
+        download = create_test_download(file_size=4096)
+        
+        DownloadSerializer(download).data
+        data = DownloadSerializer(download).data
+        
+        assert download.file_size == 4096
+        assert data['file_size'] == 4096
+
+    def test_fast_path_matches_serializer(self, create_test_download):
+        """Test the .values() path renders the same payload"""
+        download = create_test_download(
+            file_path='downloads/image.jpg',
+            file_size=3000,
+            status=Download.Status.COMPLETED,
+            completed_at=timezone.now()
+        )
+        row = Download.objects.values(*DOWNLOAD_ROW_FIELDS).get(pk=download.pk)
+        
+        fast = json.loads(FastJSONRenderer().render(serialize_download_row(row)))
+        expected = json.loads(json.dumps(DownloadSerializer(download).data, default=str))
+        
+        assert fast == expected
+
+    def test_naive_datetimes_are_rendered_as_utc(self, create_test_download):
+        """Test in-memory naive datetimes are rendered as UTC instead of raising"""
+        download = create_test_download(status=Download.Status.COMPLETED)
+        download.created_at = datetime(2024, 1, 1, 12, 0, 0)
+        download.completed_at = timezone.make_aware(datetime(2024, 1, 1, 12, 0, 30))
+        
+        data = serialize_download_row(download_row(download))
+        
+        assert data['created_at'] == '2024-01-01T12:00:00Z'
+        assert data['duration'] == 30.0
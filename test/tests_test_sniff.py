@@ -0,0 +1,31 @@
+import io
+import pytest
+from PIL import Image
+from downloader.utils.sniff import sniff_mime_type, sniff_supported
+
+SUPPORTED = ['image/jpeg', 'image/png', 'video/mp4']
+
+
+def image_head(fmt):
+    output = io.BytesIO()
+    Image.new('RGB', (64, 64), 'red').save(output, fmt)
+    return output.getvalue()[:2048]
+
+
+class TestContentSniffing:
+    """Test suite for detecting media types from the first bytes"""
+
+    @pytest.mark.parametrize('fmt,expected', [('JPEG', 'image/jpeg'), ('PNG', 'image/png')])
+    def test_images_are_recognised(self, fmt, expected):
+        """Test common image formats are sniffed from their header"""
+        assert sniff_mime_type(image_head(fmt)) == expected
+
+    def test_mp4_is_recognised_from_ftyp(self):
+        """Test an MP4 is sniffed from its leading ftyp box"""
+        ftyp = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2'
+        assert sniff_supported(ftyp + b'\x00' * 64, SUPPORTED) == 'video/mp4'
+
+    def test_html_labelled_as_media_is_rejected(self):
+        """Test an error page served with a media Content-Type is refused"""
+        head = b'<!DOCTYPE html><html><head><title>Login</title></head><body></body></html>'
+        assert sniff_supported(head, SUPPORTED) is None
@@ -0,0 +1,227 @@
+import os
+import asyncio
+import pytest
+from django.urls import reverse
+from downloader.models import Download
+from downloader.services.storage import (
+    LocalMediaStorage,
+    MediaStorage,
+    S3MediaStorage,
+    is_sharded,
+    shard_flat_files,
+)
+
+MB = 1024 * 1024
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class TestMediaStorage:
+    """Test suite for the storage backend interface"""
+
+    def test_incomplete_backend_cannot_be_instantiated(self):
+        """Test a backend missing part of the interface fails up front"""
+        class PartialStorage(MediaStorage):
+            def open(self, name):
+                return None
+
+        with pytest.raises(TypeError):
+            PartialStorage()
+
+
+class TestLocalMediaStorage:
+    """Test suite for the local filesystem storage backend"""
+
+    def test_commit_moves_partial_into_place(self, temp_media_root):
+        """Test a committed transfer ends up at its final name"""
+        storage = LocalMediaStorage()
+        writer = storage.open_writer('downloads/image.jpg', download_id='abc')
+
+        async def write():
+            await writer.write(b'hello ')
+            await writer.write(b'world')
+            await writer.commit()
+        run(write())
+
+        assert storage.exists('downloads/image.jpg')
+        assert storage.size('downloads/image.jpg') == 11
+        assert not os.path.exists(writer.part_path)
+
+    def test_abort_removes_partial(self, temp_media_root):
+        """Test an aborted transfer leaves nothing behind"""
+        storage = LocalMediaStorage()
+        writer = storage.open_writer('downloads/image.jpg', download_id='abc')
+
+        async def write():
+            await writer.write(b'data')
+            await writer.abort()
+        run(write())
+
+        assert not storage.exists('downloads/image.jpg')
+        assert not os.path.exists(writer.part_path)
+
+    def test_remove_partials_only_touches_own_download(self, temp_media_root):
+        """Test partial cleanup is scoped to one download id"""
+        storage = LocalMediaStorage()
+        mine = storage.partial_path('abc', 'downloads/a.jpg')
+        other = storage.partial_path('xyz', 'downloads/b.jpg')
+        open(mine, 'wb').close()
+        open(other, 'wb').close()
+
+        assert storage.remove_partials('abc') == 1
+        assert not os.path.exists(mine)
+        assert os.path.exists(other)
+
+    def test_url_uses_media_url(self, temp_media_root, settings):
+        """Test local files are served from MEDIA_URL"""
+        settings.MEDIA_URL = '/media/'
+        assert LocalMediaStorage().url('downloads/a.jpg') == '/media/downloads/a.jpg'
+
+
+class TestS3MediaStorage:
+    """Test suite for the S3 storage backend, against moto"""
+
+    @pytest.fixture
+    def storage(self):
+        moto = pytest.importorskip('moto')
+        with moto.mock_aws():
+            storage = S3MediaStorage(
+                bucket='media',
+                region_name='us-east-1',
+                access_key='test',
+                secret_key='test',
+                part_size=5 * MB,
+                max_concurrency=2
+            )
+            storage.client.create_bucket(Bucket='media')
+            yield storage
+
+    def test_large_body_uses_multipart(self, storage):
+        """Test bodies over one part are uploaded in ordered parts"""
+        writer = storage.open_writer('downloads/video.mp4', content_type='video/mp4')
+        chunk = os.urandom(MB)
+
+        async def write():
+            for _ in range(12):
+                await writer.write(chunk)
+            await writer.commit()
+        run(write())
+
+        assert writer._upload_id is not None
+        assert [p['PartNumber'] for p in sorted(writer._parts, key=lambda p: p['PartNumber'])] == [1, 2, 3]
+        assert storage.size('downloads/video.mp4') == 12 * MB
+        body = storage.client.get_object(Bucket='media', Key='downloads/video.mp4')['Body'].read()
+        assert body == chunk * 12
+
+    def test_small_body_uses_single_put(self, storage):
+        """Test bodies under one part skip the multipart API"""
+        writer = storage.open_writer('downloads/image.jpg')
+
+        async def write():
+            await writer.write(b'small')
+            await writer.commit()
+        run(write())
+
+        assert writer._upload_id is None
+        assert storage.exists('downloads/image.jpg')
+
+    def test_abort_cancels_multipart_upload(self, storage):
+        """Test an aborted transfer leaves no object or open upload"""
+        writer = storage.open_writer('downloads/video.mp4')
+
+        async def write():
+            await writer.write(os.urandom(6 * MB))
+            await writer.abort()
+        run(write())
+
+        assert not storage.exists('downloads/video.mp4')
+        uploads = storage.client.list_multipart_uploads(Bucket='media')
+        assert not uploads.get('Uploads')
+
+    def test_presigned_url(self, storage):
+        """Test clients get a signed, expiring URL"""
+        url = storage.url('downloads/image.jpg', expires=60)
+
+        assert 'downloads/image.jpg' in url
+        assert 'Signature' in url or 'X-Amz-Signature' in url
+
+
+@pytest.mark.django_db
+class TestDownloadFileView:
+    """Test suite for the file redirect endpoint"""
+
+    def test_redirects_to_storage_url(self, api_client, create_test_download, temp_media_root):
+        """Test completed downloads redirect to the storage URL"""
+        download = create_test_download(
+            status=Download.Status.COMPLETED,
+            file_path='downloads/image.jpg'
+        )
+
+        response = api_client.get(reverse('download-file', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 302
+        assert response['Location'].endswith('/downloads/image.jpg')
+
+    def test_pending_download_is_not_found(self, api_client, create_test_download):
+        """Test unfinished downloads have no file to serve"""
+        download = create_test_download(status=Download.Status.PENDING)
+
+        response = api_client.get(reverse('download-file', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestShardedLayout:
+    """Test suite for hashed directory fan-out"""
+
+    def test_generated_names_are_sharded_and_unique(self):
+        """Test new names fan out two levels deep without probing"""
+        storage = LocalMediaStorage()
+        first = storage.generate_name('image.jpg')
+        second = storage.generate_name('image.jpg')
+
+        assert is_sharded(first)
+        assert first != second
+        assert first.endswith('-image.jpg')
+
+    def test_flat_files_are_moved_and_rows_updated(self, create_test_download, temp_media_root):
+        """Test the migration moves files and is safe to re-run"""
+        os.makedirs(os.path.join(temp_media_root, 'downloads'))
+        flat = os.path.join(temp_media_root, 'downloads', 'image.jpg')
+        with open(flat, 'wb') as f:
+            f.write(b'data')
+        download = create_test_download(status=Download.Status.COMPLETED, file_path=flat)
+
+        result = shard_flat_files(batch_size=1)
+        download.refresh_from_db()
+
+        assert result == {'moved': 1, 'relinked': 0, 'missing': 0}
+        assert is_sharded(download.file_path)
+        assert not os.path.exists(flat)
+        with open(download.get_download_path(), 'rb') as f:
+            assert f.read() == b'data'
+        assert shard_flat_files() == {'moved': 0, 'relinked': 0, 'missing': 0}
+
+    def test_interrupted_move_is_relinked(self, create_test_download, temp_media_root):
+        """Test a file moved before a crash only gets its row fixed"""
+        download = create_test_download(
+            status=Download.Status.COMPLETED,
+            file_path='downloads/image.jpg'
+        )
+        os.makedirs(os.path.join(temp_media_root, 'downloads'))
+        with open(os.path.join(temp_media_root, 'downloads', 'image.jpg'), 'wb') as f:
+            f.write(b'data')
+        shard_flat_files()
+        download.refresh_from_db()
+        expected = download.file_path
+
+        # Simulate the row update having been lost
+        Download.objects.filter(pk=download.pk).update(file_path='downloads/image.jpg')
+        result = shard_flat_files()
+        download.refresh_from_db()
+
+        assert result['relinked'] == 1
+        assert download.file_path == expected
@@ -1,6 +1,11 @@
+import os
 import pytest
-from downloader.tasks import process_download
+from datetime import timedelta
+from django.utils import timezone
+from downloader.tasks import enqueue_download, process_download
 from downloader.models import Download
+from downloader.services.reaper import reap_stuck_downloads
+from downloader.services.storage import get_storage
 from unittest.mock import patch
 from celery.exceptions import Retry
 
@@ -50,4 +55,90 @@ class TestDownloadTasks:
             
             assert not result.successful()
             download.refresh_from_db()
-            assert download.status == Download.Status.FAILED
\ No newline at end of file
+            assert download.status == Download.Status.FAILED
+
+class TestStuckDownloadReaper:
+    """Test suite for the stuck-download reaper"""
+
+    def _make_stuck(self, download, seconds=7200):
+        Download.objects.filter(pk=download.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def test_stuck_download_is_requeued(
+        self, create_test_download, temp_media_root, settings,
+        django_capture_on_commit_callbacks
+    ):
+        """Test a stuck download is reset to pending and re-enqueued"""
+        settings.DOWNLOAD_STUCK_DEADLINES = {'DOWNLOADING': 3600}
+        download = create_test_download(status=Download.Status.DOWNLOADING)
+        self._make_stuck(download)
+        part = get_storage().partial_path(download.id, 'downloads/image.jpg')
+        open(part, 'wb').close()
+        
+        with patch('downloader.tasks.enqueue_download') as mock_enqueue, \
+                django_capture_on_commit_callbacks(execute=True):
+            result = reap_stuck_downloads()
+        
+        download.refresh_from_db()
+        assert result['requeued'] == 1
+        assert download.status == Download.Status.PENDING
+        assert download.reaped_count == 1
+        assert not os.path.exists(part)
+        mock_enqueue.assert_called_once()
+        assert mock_enqueue.call_args.args[0].pk == download.pk
+
+    def test_repeatedly_stuck_download_fails(self, create_test_download, temp_media_root, settings):
+        """Test a download past the requeue limit is marked failed"""
+        settings.DOWNLOAD_STUCK_DEADLINES = {'DOWNLOADING': 3600}
+        settings.DOWNLOAD_REAPER_MAX_REQUEUES = 1
+        download = create_test_download(status=Download.Status.DOWNLOADING, reaped_count=1)
+        self._make_stuck(download)
+        
+        result = reap_stuck_downloads()
+        
+        download.refresh_from_db()
+        assert result['failed'] == 1
+        assert download.status == Download.Status.FAILED
+
+    def test_recent_download_is_left_alone(self, create_test_download, temp_media_root, settings):
+        """Test rows inside their deadline are not touched"""
+        settings.DOWNLOAD_STUCK_DEADLINES = {'DOWNLOADING': 3600}
+        download = create_test_download(status=Download.Status.DOWNLOADING)
+        
+        result = reap_stuck_downloads()
+        
+        download.refresh_from_db()
+        assert result == {'requeued': 0, 'failed': 0, 'partials_removed': 0}
+        assert download.status == Download.Status.DOWNLOADING
+
+    def test_queued_backlog_extends_pending_deadline(self, create_test_download, temp_media_root, settings):
+        """Test PENDING rows still waiting behind the rate limit are not requeued"""
+        settings.DOWNLOAD_STUCK_DEADLINES = {'PENDING': 3600}
+        download = create_test_download(status=Download.Status.PENDING)
+        self._make_stuck(download)
+        
+        # 1200 queued tasks at 10/m take two hours to drain
+        with patch('downloader.services.reaper.queue_depth', return_value=1200), \
+                patch('downloader.tasks.enqueue_download') as mock_enqueue:
+            result = reap_stuck_downloads()
+        
+        download.refresh_from_db()
+        assert result['requeued'] == 0
+        assert download.reaped_count == 0
+        mock_enqueue.assert_not_called()
+
+
+class TestEnqueueDownload:
+    """Test suite for queuing downloads"""
+
+    def test_results_are_not_stored_by_default(self, create_test_download):
+        """Test the task result is discarded unless requested"""
+        download = create_test_download()
+        
+        with patch('downloader.tasks.process_download.apply_async') as mock_apply:
+            enqueue_download(download)
+            enqueue_download(download, store_result=True)
+        
+        assert mock_apply.call_args_list[0].kwargs['ignore_result'] is True
+        assert mock_apply.call_args_list[1].kwargs['ignore_result'] is False
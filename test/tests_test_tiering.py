@@ -0,0 +1,187 @@
+import os
+import time
+import pytest
+from unittest.mock import patch
+from django.urls import reverse
+from downloader.models import Download
+from downloader.services.counters import get_redis
+from downloader.services.eviction import BYTES_KEY, LRU_KEY, SIZES_KEY, media_lease, track_media
+from downloader.services.integrity import remember_verified
+from downloader.services.storage import get_cold_storage
+from downloader.services.tiering import (
+    HITS_KEY,
+    PENDING_DELETE_KEY,
+    PROMOTE_QUEUED_KEY,
+    RESIDENCY_KEY,
+    demote_idle_media,
+    move_media,
+    promote_media,
+    purge_released_sources,
+    record_tier_hit,
+    refresh_residency,
+    tier_stats,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def cold_root(settings, temp_media_root, tmp_path):
+    settings.MEDIA_COLD_STORAGE = {
+        'BACKEND': 'downloader.services.storage.LocalMediaStorage',
+        'OPTIONS': {'location': str(tmp_path / 'cold'), 'base_url': '/media-cold/'},
+    }
+    get_cold_storage.cache_clear()
+    redis = get_redis()
+    redis.delete(LRU_KEY, SIZES_KEY, BYTES_KEY, HITS_KEY, PENDING_DELETE_KEY, RESIDENCY_KEY)
+    yield str(tmp_path / 'cold')
+    get_cold_storage.cache_clear()
+    redis.delete(LRU_KEY, SIZES_KEY, BYTES_KEY, HITS_KEY, PENDING_DELETE_KEY, RESIDENCY_KEY)
+
+
+class TestStorageTiering:
+    """Test suite for hot/cold media tiering"""
+
+    def _tracked(self, stored_download, name='downloads/ab/cd/a.jpg'):
+        download = stored_download(name, b'data')
+        track_media(download.id, 4)
+        return download
+
+    def test_idle_file_is_demoted(self, stored_download, cold_root):
+        """Test files idle past the threshold move to the cold tier"""
+        download = self._tracked(stored_download)
+        hot_path = download.get_download_path()
+        get_redis().zadd(LRU_KEY, {str(download.id): time.time() - 40 * 86400})
+
+        result = demote_idle_media(days=30)
+
+        download.refresh_from_db()
+        assert result['demoted'] == 1
+        assert download.storage_tier == Download.StorageTier.COLD
+        assert download.get_download_path().startswith(cold_root)
+        assert os.path.exists(download.get_download_path())
+        assert not os.path.exists(hot_path)
+        assert get_redis().zscore(LRU_KEY, str(download.id)) is None
+
+    def test_recent_file_stays_hot(self, stored_download, cold_root):
+        """Test recently served files are not demoted"""
+        download = self._tracked(stored_download)
+
+        assert demote_idle_media(days=30)['demoted'] == 0
+        download.refresh_from_db()
+        assert download.storage_tier == Download.StorageTier.HOT
+
+    def test_promotion_round_trip(self, stored_download, cold_root):
+        """Test a cold file is promoted back and re-indexed"""
+        download = self._tracked(stored_download)
+        assert move_media(download.id, Download.StorageTier.COLD)
+
+        assert promote_media(download.id)
+
+        download.refresh_from_db()
+        assert download.storage_tier == Download.StorageTier.HOT
+        with open(download.get_download_path(), 'rb') as f:
+            assert f.read() == b'data'
+        assert not os.path.exists(os.path.join(cold_root, download.file_path))
+        assert get_redis().zscore(LRU_KEY, str(download.id)) is not None
+
+    def test_move_abandoned_when_file_path_changes(self, stored_download, cold_root):
+        """Test a concurrent file_path change wins over a tier move"""
+        download = self._tracked(stored_download)
+        storage = get_cold_storage()
+        original_save = storage.save
+
+        def save_then_race(name, content):
+            original_save(name, content)
+            Download.objects.filter(pk=download.pk).update(file_path='downloads/ef/01/b.jpg')
+        storage.save = save_then_race
+        try:
+            assert not move_media(download.id, Download.StorageTier.COLD)
+        finally:
+            del storage.save
+
+        download.refresh_from_db()
+        assert download.storage_tier == Download.StorageTier.HOT
+        assert not os.path.exists(os.path.join(cold_root, 'downloads/ab/cd/a.jpg'))
+
+    def test_source_kept_while_leased(self, stored_download, cold_root):
+        """Test a reader leasing mid-move keeps its copy until it lets go"""
+        download = self._tracked(stored_download)
+        hot_path = download.get_download_path()
+
+        with media_lease(download.id):
+            assert move_media(download.id, Download.StorageTier.COLD)
+            assert os.path.exists(hot_path)
+            assert purge_released_sources() == 0
+
+        assert purge_released_sources() == 1
+        assert not os.path.exists(hot_path)
+        assert os.path.exists(os.path.join(cold_root, download.file_path))
+
+    def test_gone_rows_do_not_skip_candidates(self, stored_download, cold_root):
+        """Test untracked entries do not push later candidates past the window"""
+        gone = self._tracked(stored_download, 'downloads/ab/cd/gone.jpg')
+        download = self._tracked(stored_download)
+        get_redis().zadd(LRU_KEY, {
+            str(gone.id): time.time() - 50 * 86400,
+            str(download.id): time.time() - 40 * 86400,
+        })
+        Download.objects.filter(pk=gone.pk).delete()
+
+        result = demote_idle_media(days=30, batch_size=1, max_batches=2)
+
+        download.refresh_from_db()
+        assert result['demoted'] == 1
+        assert download.storage_tier == Download.StorageTier.COLD
+
+    def test_tier_stats(self, stored_download, cold_root):
+        """Test residency and hit ratio reporting"""
+        self._tracked(stored_download)
+        record_tier_hit(Download.StorageTier.HOT)
+        record_tier_hit(Download.StorageTier.HOT)
+        record_tier_hit(Download.StorageTier.COLD)
+
+        stats = tier_stats()
+
+        assert stats['residency']['HOT'] == {'files': 1, 'bytes': 4}
+        assert stats['residency']['COLD'] == {'files': 0, 'bytes': 0}
+        assert stats['hot_hit_ratio'] == pytest.approx(2 / 3)
+
+    def test_residency_counts_every_file_and_is_cached(
+        self, stored_download, cold_root, django_assert_num_queries
+    ):
+        """Test bytes cover all files of a post and requests do not rescan"""
+        stored_download('downloads/ab/cd/b.jpg', b'12345', more_files=[('downloads/ab/cd/a.jpg', b'123')])
+        refresh_residency()
+
+        with django_assert_num_queries(0):
+            stats = tier_stats()
+
+        assert stats['residency']['HOT'] == {'files': 1, 'bytes': 8}
+
+    def test_cold_serve_queues_one_promotion(self, api_client, stored_download, cold_root):
+        """Test repeated cold serves publish a single promotion"""
+        download = self._tracked(stored_download)
+        assert move_media(download.id, Download.StorageTier.COLD)
+        download.refresh_from_db()
+        remember_verified(download)
+        url = reverse('download-file', kwargs={'pk': download.pk})
+
+        with patch('downloader.views.promote_media.delay') as mock_promote:
+            api_client.get(url)
+            api_client.get(url)
+
+        mock_promote.assert_called_once_with(str(download.pk))
+
+    def test_cold_serve_survives_broker_outage(self, api_client, stored_download, cold_root):
+        """Test a failed promotion publish still serves the cold file"""
+        download = self._tracked(stored_download)
+        assert move_media(download.id, Download.StorageTier.COLD)
+        download.refresh_from_db()
+        remember_verified(download)
+
+        with patch('downloader.views.promote_media.delay', side_effect=ConnectionError):
+            response = api_client.get(reverse('download-file', kwargs={'pk': download.pk}))
+
+        assert response.status_code == 302
+        assert not get_redis().exists(PROMOTE_QUEUED_KEY.format(download.pk))
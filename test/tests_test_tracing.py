@@ -0,0 +1,140 @@
+import json
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from core.celery import inject_trace_context
+from downloader.services import tracing
+from downloader.services.tracing import FileSpanExporter, continue_trace, parse_traceparent, start_span
+
+pytestmark = pytest.mark.django_db
+
+TRACEPARENT = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+
+
+@pytest.fixture
+def trace_file(settings, tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    settings.TRACING_ENABLED = True
+    settings.TRACING_SAMPLE_RATE = 1.0
+    settings.TRACING_SLOW_SECONDS = 0
+    settings.TRACING_TAIL_WINDOW = 0
+    settings.TRACING_EXPORTER = {
+        'BACKEND': 'downloader.services.tracing.FileSpanExporter',
+        'OPTIONS': {'path': str(path)},
+    }
+    tracing.get_exporter.cache_clear()
+    yield path
+    tracing.get_exporter.cache_clear()
+
+
+def read_spans(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestTracing:
+    """Test suite for trace propagation and export"""
+
+    def test_parse_traceparent(self):
+        """Test W3C trace context headers are validated"""
+        assert parse_traceparent(TRACEPARENT) == (
+            '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True
+        )
+        assert parse_traceparent('00-xyz-00f067aa0ba902b7-01') is None
+        assert parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01') is None
+        assert parse_traceparent(None) is None
+
+    def test_child_spans_are_exported_with_their_root(self, trace_file):
+        """Test a trace is written once its local root finishes"""
+        with start_span('task') as root:
+            with start_span('extract'):
+                pass
+            assert read_spans(trace_file) == []
+
+        spans = {span['name']: span for span in read_spans(trace_file)}
+        assert spans['extract']['parent_id'] == root.span_id
+        assert spans['extract']['trace_id'] == spans['task']['trace_id']
+
+    def test_errors_are_recorded(self, trace_file):
+        """Test a failing span carries the exception class"""
+        with pytest.raises(ValueError):
+            with start_span('task'):
+                raise ValueError('boom')
+
+        assert read_spans(trace_file)[0]['error'] == 'ValueError: boom'
+
+    def test_unsampled_traces_are_dropped_unless_slow(self, trace_file, settings):
+        """Test sampling, with slow traces kept regardless"""
+        settings.TRACING_SAMPLE_RATE = 0
+        with start_span('fast'):
+            pass
+        assert read_spans(trace_file) == []
+
+        settings.TRACING_SLOW_SECONDS = 1e-9
+        with start_span('slow'):
+            pass
+        assert [span['name'] for span in read_spans(trace_file)] == ['slow']
+
+    def test_db_writes_get_spans(self, trace_file, create_test_download):
+        """Test SQL statements inside a trace become child spans"""
+        with start_span('task'):
+            create_test_download()
+
+        assert 'db.write' in {span['name'] for span in read_spans(trace_file)}
+
+    def test_context_is_injected_into_task_headers(self, trace_file):
+        """Test tasks published inside a span continue its trace"""
+        headers = {}
+        with start_span('request') as span:
+            inject_trace_context(headers=headers)
+
+        with continue_trace('task', headers['traceparent']) as task_span:
+            pass
+        assert task_span.trace_id == span.trace_id
+        assert task_span.parent_id == span.span_id
+
+    def test_requests_join_incoming_traces(self, api_client, trace_file):
+        """Test the API continues a caller's trace and reports its id"""
+        response = api_client.get(reverse('health-live'), HTTP_TRACEPARENT=TRACEPARENT)
+
+        assert response['X-Trace-Id'] == '4bf92f3577b34da6a3ce929d0e0e4736'
+        assert read_spans(trace_file)[-1]['name'] == 'GET health-live'
+
+    def test_client_sampled_flag_is_not_trusted(self, api_client, trace_file, settings):
+        """Test callers cannot force their requests to be exported"""
+        settings.TRACING_SAMPLE_RATE = 0
+        
+        response = api_client.get(reverse('health-live'), HTTP_TRACEPARENT=TRACEPARENT)
+        
+        assert response['X-Trace-Id'] == '4bf92f3577b34da6a3ce929d0e0e4736'
+        assert read_spans(trace_file) == []
+        
+        settings.TRACING_TRUST_INCOMING_SAMPLED = True
+        api_client.get(reverse('health-live'), HTTP_TRACEPARENT=TRACEPARENT)
+        assert read_spans(trace_file)[-1]['name'] == 'GET health-live'
+
+    def test_trace_file_is_rotated(self, tmp_path):
+        """Test the file exporter keeps its disk use bounded"""
+        path = tmp_path / 'traces.jsonl'
+        exporter = FileSpanExporter(str(path), max_bytes=100, backups=2)
+        
+        for n in range(10):
+            exporter.export([{'name': 'x' * 60, 'n': n}])
+        
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'traces.jsonl', 'traces.jsonl.1', 'traces.jsonl.2'
+        ]
+        assert all(p.stat().st_size < 200 for p in tmp_path.iterdir())
+
+    def test_report_explains_slowest_traces(self, trace_file, capsys):
+        """Test the report prints the span tree of the slowest trace"""
+        with start_span('task downloader.tasks.process_download'):
+            with start_span('media.fetch', bytes=10):
+                pass
+
+        call_command('trace_report', file=str(trace_file))
+
+        output = capsys.readouterr().out
+        assert 'media.fetch' in output
+        assert 'bytes=10' in output